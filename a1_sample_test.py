@@ -17,8 +17,42 @@ please see
 Note: this file is for support purposes only, and is not part of your
 submission.
 """
+import gc
+import http.client
+import json
+import pickle
+import random
+import subprocess
+import sys
+import threading
+import pytest
+
 from algorithms import PushyPassenger, RandomAlgorithm, ShortSighted, RandomArrivals, FileArrivals
+from algorithms import CachedAlgorithm, Direction
+from anger import AngerIndex, AngriestFirst
+from batch_simulation import BatchSimulation
+from entities import Elevator, Person
+from demand import DemandEstimator, ParkingAlgorithm
+from elevator_env import ElevatorEnv, PolicyAlgorithm, VectorElevatorEnv
+from destination_dispatch import DestinationDispatch, DestinationDispatcher
+from dispatch_service import DispatchServer, Dispatcher, \
+    _PendingDecision
+from experiments import _replication_config, confidence_interval, \
+    run_replications
+from frame_skip import FrameSkippingVisualizer
+from fuzz import Case, Trace, TraceArrivals, check, fuzz, run_reference
+from registry import build_config, load_spec
+import result_cache
+from result_cache import ResultCache
+from offline_solver import PlanAlgorithm, gap_report, solve, wait_cost
+from run_log import RunLog, RunLogWriter
+from generate_trace import MAX_BINARY_FLOOR, PAIR_TABLE_FLOORS, \
+    BinaryFileArrivals, pair_table, write_trace
+from shared_arrivals import SharedFileArrivals
 from simulation import Simulation
+from wait_stats import WaitHistogram, merge_all
+from waiting import WaitingQueues
+from zones import ZonedPushyPassenger, ZonedShortSighted, ZoneTable
 
 
 def test_random_arrival_generator_zero() -> None:
@@ -776,6 +810,1144 @@ def  test_short_sighted_moving_algorithm_10() -> None:
     assert results['min_time'] == 1
     assert results['avg_time'] == 6
 
+
+def test_cached_algorithm_same_stats() -> None:
+    """Test that caching the decisions of the deterministic algorithms does
+    not change the simulation statistics, including with elevators that move
+    several floors per round towards their target floors.
+    """
+    for algorithm in [PushyPassenger, ShortSighted]:
+        for extra in [{}, {'elevator_speed': 3}]:
+            results = []
+            for moving_algorithm in [algorithm(),
+                                     CachedAlgorithm(algorithm(), 8)]:
+                config = {
+                    'num_floors': 5,
+                    'num_elevators': 2,
+                    'elevator_capacity': 1,
+                    'num_people_per_round': 2,
+                    'arrival_generator': FileArrivals(5,
+                                                      'sample_arrivals.csv'),
+                    'moving_algorithm': moving_algorithm,
+                    'visualize': False
+                }
+                config.update(extra)
+                results.append(Simulation(config).run(30))
+            assert results[0] == results[1]
+            assert moving_algorithm.hits > 0
+            assert moving_algorithm.hits + moving_algorithm.misses == 30
+
+    # The same people waiting give the same key, whichever floor filled
+    # first.
+    elevators = [Elevator(3)]
+    first, second = WaitingQueues(), WaitingQueues()
+    first.add(4, [Person(4, 1)])
+    first.add(2, [Person(2, 5)])
+    second.add(2, [Person(2, 5)])
+    second.add(4, [Person(4, 1)])
+    for algorithm in [PushyPassenger(), ShortSighted()]:
+        assert algorithm.decision_key(elevators, first, 5) == \
+            algorithm.decision_key(elevators, second, 5)
+
+
+def test_batch_moves_match_reference() -> None:
+    """Test that the batched decisions of PushyPassenger and ShortSighted are
+    the same as the per-elevator reference implementation on random states
+    that the simulation can reach.
+    """
+    rng = random.Random(148)
+    for _ in range(200):
+        max_floor = rng.randint(2, 30)
+        waiting = {floor: [] for floor in range(1, max_floor + 1)}
+        for _ in range(rng.randint(0, 10)):
+            start, target = rng.sample(range(1, max_floor + 1), 2)
+            waiting[start].append(Person(start, target))
+        elevators = []
+        for _ in range(rng.randint(1, 20)):
+            elevator = Elevator(3)
+            elevator.location = rng.randint(1, max_floor)
+            for _ in range(rng.randint(0, 3)):
+                # Someone who boarded on their target floor has a target
+                # equal to the elevator's location.
+                target = rng.randint(1, max_floor)
+                elevator.passengers.append(Person(elevator.location, target))
+            if elevator.passengers == [] and waiting[elevator.location] != []:
+                # This elevator would have boarded someone.
+                continue
+            elevators.append(elevator)
+        for algorithm in [PushyPassenger(), ShortSighted()]:
+            expected = algorithm.move_elevators(elevators, waiting, max_floor)
+            actual = algorithm.move_elevators_batch(elevators, waiting,
+                                                    max_floor)
+            assert actual == expected
+
+
+def test_replications_stop_early() -> None:
+    """Test that the replication runner stops once the confidence intervals
+    are narrow enough, and that seeded replications are reproducible.
+    """
+    config = {
+        'num_floors': 6,
+        'num_elevators': 3,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': RandomArrivals(6, 2),
+        'moving_algorithm': RandomAlgorithm(),
+        'visualize': False
+    }
+    wide = run_replications(config, 20, max_replications=50,
+                            target_width=1000, processes=2)
+    assert wide['replications'] == 10
+    assert wide['stopped_early']
+    wide = run_replications(config, 20, max_replications=50,
+                            target_width=1000, processes=2,
+                            min_replications=2)
+    assert wide['replications'] == 2
+
+    first = run_replications(config, 20, max_replications=6, processes=1)
+    second = run_replications(config, 20, max_replications=6, processes=1)
+    assert first == second
+    assert first['replications'] == 6
+    assert first['people_completed']['n'] == 6
+    # Replications run on copies, so the algorithm keeps no state from them.
+    cached = dict(config, moving_algorithm=CachedAlgorithm(ShortSighted()))
+    run_replications(cached, 20, max_replications=2, processes=1)
+    assert len(cached['moving_algorithm']._cache) == 0
+    # The parsed arrivals of a file are shared by every replication.
+    from_file = dict(config, arrival_generator=FileArrivals(
+        6, 'sample_arrivals.csv'))
+    copied = _replication_config(from_file)
+    assert copied['arrival_generator'] is from_file['arrival_generator']
+    assert copied['moving_algorithm'] is not from_file['moving_algorithm']
+
+    interval = confidence_interval([0, 2])
+    assert round(interval['half_width'], 3) == 12.706
+    assert round(confidence_interval([0, 2], 0.96)['half_width'], 3) == \
+        15.895
+
+
+def test_shared_file_arrivals() -> None:
+    """Test that SharedFileArrivals, including a pickled copy attached to
+    the same segment, generates the same people as FileArrivals.
+    """
+    shared = SharedFileArrivals(5, 'sample_arrivals.csv')
+    attached = pickle.loads(pickle.dumps(shared))
+    file_generator = FileArrivals(5, 'sample_arrivals.csv')
+    try:
+        for round_num in range(10):
+            expected = file_generator.generate(round_num)
+            for generator in [shared, attached]:
+                actual = generator.generate(round_num)
+                for floor, people in expected.items():
+                    assert [(p.start, p.target) for p in people] == \
+                           [(p.start, p.target) for p in actual[floor]]
+        # A copy dropped without being closed detaches without errors.
+        dropped = pickle.loads(pickle.dumps(shared))
+        dropped.generate(0)
+        errors = []
+        hook, sys.unraisablehook = sys.unraisablehook, errors.append
+        try:
+            del dropped
+            gc.collect()
+        finally:
+            sys.unraisablehook = hook
+        assert errors == []
+    finally:
+        attached.close()
+        shared.unlink()
+
+
+def test_batch_simulation_matches_simulation() -> None:
+    """Test that stepping many simulations together gives the same
+    statistics as running each one with Simulation.
+    """
+    configs = []
+    for filename in ['sample_arrivals.csv', 'short_sighted_3.csv',
+                     'lower_first.csv']:
+        for algorithm in [PushyPassenger, ShortSighted]:
+            for num_elevators, capacity in [(1, 1), (2, 1), (2, 2), (6, 3)]:
+                configs.append({
+                    'num_floors': 5,
+                    'num_elevators': num_elevators,
+                    'elevator_capacity': capacity,
+                    'num_people_per_round': 2,
+                    'arrival_generator': FileArrivals(5, filename),
+                    'moving_algorithm': algorithm(),
+                    'visualize': False
+                })
+    expected = [Simulation(config).run(15) for config in configs]
+    assert BatchSimulation(configs).run(15) == expected
+
+    # Features BatchSimulation does not model are refused, not ignored.
+    BatchSimulation([dict(configs[0], elevator_speed=1, zones=None)])
+    for extra in [{'zones': [[1, 2, 3, 4, 5]]}, {'boarding': 'balanced'},
+                  {'patience': 5}, {'door_dwell': 1}, {'visualize': True},
+                  {'dispatcher': DestinationDispatcher()}]:
+        with pytest.raises(ValueError):
+            BatchSimulation([dict(configs[0], **extra)])
+
+
+def test_generated_traces(tmp_path) -> None:
+    """Test that the CSV and binary traces written with the same seed hold
+    the same valid arrivals, for buildings small enough to draw their trips
+    from a table of every pair of floors and for larger ones.
+    """
+    csv_path = str(tmp_path / 'trace.csv')
+    binary_path = str(tmp_path / 'trace.bin')
+    for num_floors in [7, PAIR_TABLE_FLOORS + 1]:
+        with open(csv_path, 'wb') as out:
+            people = write_trace(out, 500, num_floors, [(0, 1.0), (200, 4.0)],
+                                 'lobby', 148, False)
+        with open(binary_path, 'wb') as out:
+            write_trace(out, 500, num_floors, [(0, 1.0), (200, 4.0)],
+                        'lobby', 148, True)
+
+        from_csv = FileArrivals(num_floors, csv_path)
+        from_binary = BinaryFileArrivals(num_floors, binary_path)
+        assert from_csv.arrival_dict == from_binary.arrival_dict
+        assert sum(len(v) for v in from_csv.arrival_dict.values()) \
+            == 2 * people
+        for round_num in range(500):
+            for floor, arrivals in from_binary.generate(round_num).items():
+                for p in arrivals:
+                    assert p.start == floor
+                    assert 1 <= p.target <= num_floors
+                    assert p.start != p.target
+
+    pairs, cum_weights = pair_table([1.0, 2.0, 1.0])
+    assert pairs == [(1, 2), (1, 3), (2, 1), (2, 3), (3, 1), (3, 2)]
+    # Floor 2 starts half the trips, and goes to floors 1 and 3 equally.
+    assert cum_weights[3] - cum_weights[1] == pytest.approx(2.0)
+    assert cum_weights[-1] == pytest.approx(sum([1.0, 2.0, 1.0]))
+
+    with open(binary_path, 'wb') as out:
+        with pytest.raises(ValueError):
+            write_trace(out, 10, MAX_BINARY_FLOOR + 1, [(0, 1.0)],
+                        'uniform', 148, True)
+        assert out.tell() == 0
+
+
+def test_fast_elevators_with_dwell() -> None:
+    """Test that elevators moving several floors per round reach their
+    targets sooner, slowing down in time to stop there and starting from
+    rest when they turn around, and that stops hold an elevator for the
+    dwell time.
+    """
+    elevator = Elevator(3, speed=4, acceleration=2)
+    assert elevator.rounds_to(12) == 4
+    moves = [elevator.move_towards(12) for _ in range(5)]
+    assert moves == [2, 4, 3, 2, 0]
+    assert elevator.location == 12
+
+    elevator = Elevator(3, speed=4, acceleration=2)
+    assert [elevator.move_towards(20) for _ in range(3)] == [2, 4, 4]
+    assert elevator.rounds_to(2) == 4
+    moves = [elevator.move_towards(2) for _ in range(5)]
+    assert moves == [-2, -4, -2, -1, 0]
+    assert elevator.location == 2
+
+    elevator = Elevator(3, dwell_time=1, boarding_time=0.5)
+    elevator.stop(3)
+    assert elevator.rounds_to(3) == 5
+    assert [elevator.move_towards(3) for _ in range(4)] == [0, 0, 0, 1]
+
+    results = []
+    for speed in [1, 3]:
+        config = {
+            'num_floors': 5,
+            'num_elevators': 2,
+            'elevator_capacity': 2,
+            'num_people_per_round': 2,
+            'arrival_generator': FileArrivals(5, 'short_sighted_3.csv'),
+            'moving_algorithm': ShortSighted(),
+            'elevator_speed': speed,
+            'visualize': False
+        }
+        results.append(Simulation(config).run(15))
+    assert results[0]['people_completed'] == results[1]['people_completed']
+    assert results[1]['max_time'] < results[0]['max_time']
+
+
+def test_balanced_boarding() -> None:
+    """Test that balanced boarding groups people by direction of travel
+    over the elevators on their floor.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 3,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'boarding': 'balanced',
+        'visualize': False
+    }
+    sim = Simulation(config)
+    sim.elevators[1].passengers.append(Person(3, 1))
+    for elevator in sim.elevators:
+        elevator.location = 3
+    for target in [5, 1, 4, 2, 5]:
+        sim.waiting[3].append(Person(3, target))
+    sim._handle_boarding()
+
+    targets = [[p.target for p in e.passengers] for e in sim.elevators]
+    # The last person rides down first, since both cars going up are full.
+    assert targets == [[5, 4], [1, 1], [2, 5]]
+    assert sim.waiting[3] == []
+    assert [e.remaining_capacity() for e in sim.elevators] == [0, 0, 0]
+
+
+def test_destination_dispatch() -> None:
+    """Test that people only board the elevator their group was assigned,
+    and that everyone in sample_arrivals.csv completes their ride.
+    """
+    dispatcher = DestinationDispatcher()
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': DestinationDispatch(dispatcher),
+        'dispatcher': dispatcher,
+        'visualize': False
+    }
+    sim = Simulation(config)
+    for round_num in range(20):
+        sim._generate_arrivals(round_num)
+        sim._handle_leaving()
+        before = [list(e.passengers) for e in sim.elevators]
+        assigned = {id(p): dispatcher.assigned_to(p)
+                    for people in sim.waiting.values() for p in people}
+        sim._handle_boarding()
+        for index, elevator in enumerate(sim.elevators):
+            for p in elevator.passengers[len(before[index]):]:
+                assert assigned[id(p)] == index
+        sim._move_elevators()
+    assert sim._calculate_stats(20)['people_completed'] == 4
+    assert dispatcher.groups == {}
+
+
+def test_parking_idle_elevators() -> None:
+    """Test that the demand estimator decays old arrivals, only reports
+    floors with enough demand and forgets the others, and that idle
+    elevators are parked at the floors with the most recent arrivals.
+    """
+    estimator = DemandEstimator(half_life=1)
+    estimator.observe(0, {3: [Person(3, 1), Person(3, 2)]})
+    estimator.observe(1, {5: [Person(5, 1), Person(5, 2)]})
+    assert estimator.demand(1, 3) == 1.0
+    assert estimator.demand(2, 5) == 1.0
+    assert estimator.hot_floors(2, 2) == [5, 3]
+    # Floor 3's demand fell to 0.0625, below min_demand.
+    assert estimator.hot_floors(5, 2) == [5]
+    assert estimator.hot_floors(20, 2) == []
+    assert estimator._floors == {} and estimator._counts == {}
+
+    estimator = DemandEstimator(half_life=3)
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ParkingAlgorithm(ShortSighted(), estimator),
+        'demand_estimator': estimator,
+        'visualize': False
+    }
+    sim = Simulation(config)
+    results = sim.run(30)
+    assert results['people_completed'] == 4
+    # Floors 4 and 1 had the most recent arrivals in the file.
+    assert sorted(e.location for e in sim.elevators) == [1, 4]
+
+
+def test_elevator_env_matches_simulation() -> None:
+    """Test that an episode of ElevatorEnv gives the same statistics as a
+    Simulation running the same policy, that resets start over, and that the
+    rewards add up to minus the total wait time.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': None,
+        'visualize': False
+    }
+
+    def policy(observation):
+        # Go up until there are passengers heading below, then go down.
+        downward = sum(observation[-5:-2])
+        return [Direction.DOWN if downward else Direction.UP] * 2
+
+    env = ElevatorEnv(config, 12)
+    vector = VectorElevatorEnv([env])
+    first = list(vector.reset()[0])
+    total_reward = 0
+    done = False
+    observation = first
+    while not done:
+        observations, rewards, dones, infos = vector.step([policy(observation)])
+        observation = observations[0]
+        total_reward += rewards[0]
+        done = dones[0]
+    assert observation == first
+    # The finished episode was reset by the vector.
+    assert env.simulation.rounds_run == env.round_num == 0
+    env.step(policy(observation))
+    assert env.simulation.rounds_run == env.round_num == 1
+    stats = infos[0]['stats']
+
+    config['moving_algorithm'] = PolicyAlgorithm(policy)
+    sim = Simulation(config)
+    assert sim.run(12) == stats
+    everyone = sim.all_finished + [p for e in sim.elevators
+                                   for p in e.passengers]
+    for floor in sim.waiting:
+        everyone.extend(sim.waiting[floor])
+    assert total_reward == -sum(p.wait_time for p in everyone)
+
+
+def test_offline_solver_beats_online_algorithms() -> None:
+    """Test that the offline solver's plans cost what they claim when
+    replayed, and are never worse than the online algorithms.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': None,
+        'visualize': False
+    }
+    for objective in ['total', 'max']:
+        exact = solve(config, 10, objective, beam_width=None, processes=2)
+        assert exact.optimal
+        beam = solve(config, 10, objective, beam_width=10, processes=1)
+        assert beam.cost >= exact.cost
+
+        replay = dict(config)
+        replay['moving_algorithm'] = PlanAlgorithm(exact)
+        sim = Simulation(replay)
+        sim.run(10)
+        assert wait_cost(sim, objective) == exact.cost
+
+        report = gap_report(config, 10, objective, beam_width=None,
+                            processes=1)
+        assert report['best'] == exact.cost
+        for result in report['online'].values():
+            assert result['gap'] >= 0
+
+
+def test_anger_index_matches_anger_levels() -> None:
+    """Test that the anger index buckets everyone by their anger level, and
+    that AngriestFirst delivers everyone in the sample arrivals.
+    """
+    person = Person(1, 2)
+    levels = []
+    for wait_time in range(11):
+        person.wait_time = wait_time
+        levels.append(person.get_anger_level())
+    assert levels == [0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4]
+
+    for num_rounds in [4, 7, 9, 12]:
+        index = AngerIndex(history_length=8)
+        config = {
+            'num_floors': 5,
+            'num_elevators': 1,
+            'elevator_capacity': 1,
+            'num_people_per_round': None,
+            'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+            'moving_algorithm': PushyPassenger(),
+            'anger_index': index,
+            'visualize': False
+        }
+        sim = Simulation(config)
+        sim.run(num_rounds)
+        people = [p for e in sim.elevators for p in e.passengers]
+        for floor in sim.waiting:
+            people.extend(sim.waiting[floor])
+        assert len(index.history) == min(num_rounds, 8)
+        assert list(index.history)[-1] == index.counts()
+        for level in range(5):
+            expected = {p for p in people if p.get_anger_level() == level}
+            assert index.people_at(level) == expected
+            assert index.count(level) == len(expected)
+
+    index = AngerIndex()
+    config['anger_index'] = index
+    config['num_elevators'] = 2
+    config['moving_algorithm'] = AngriestFirst(index, min_level=0)
+    results = Simulation(config).run(15)
+    assert results['people_completed'] == 4
+    assert index.counts() == [0, 0, 0, 0, 0]
+
+
+def test_headless_runs_skip_visual_stack() -> None:
+    """Test that importing simulation and running it without visualization
+    never imports the visualizer, the sprites or pygame.
+    """
+    probe = ('import sys, algorithms, entities, simulation\n'
+             'config = {"num_floors": 5, "num_elevators": 2,\n'
+             '          "elevator_capacity": 2, "num_people_per_round": 2,\n'
+             '          "arrival_generator": algorithms.RandomArrivals(5, 2),\n'
+             '          "moving_algorithm": algorithms.ShortSighted(),\n'
+             '          "visualize": False}\n'
+             'simulation.Simulation(config).run(5)\n'
+             'print(entities.sprites_enabled(),\n'
+             '      sorted({"visualizer", "sprites", "pygame"}\n'
+             '             & set(sys.modules)))\n')
+    output = subprocess.run([sys.executable, '-c', probe],
+                            capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False []'
+
+
+def test_run_log_replay(tmp_path) -> None:
+    """Test that replaying a run log, from any round, gives the same
+    statistics and state as running the simulation.
+    """
+    def make_config() -> dict:
+        random.seed(7)
+        return {
+            'num_floors': 8,
+            'num_elevators': 3,
+            'elevator_capacity': 2,
+            'num_people_per_round': 2,
+            'arrival_generator': RandomArrivals(8, 2),
+            'moving_algorithm': ShortSighted(),
+            'boarding': 'balanced',
+            'visualize': False
+        }
+    filename = str(tmp_path / 'run.log')
+    config = make_config()
+    with RunLogWriter(filename, keyframe_interval=5) as writer:
+        config['run_log'] = writer
+        sim = Simulation(config)
+        results = sim.run(40)
+    log = RunLog(filename)
+    assert log.num_rounds == 40
+    assert len(log.keyframes) == 8
+
+    replay = log.replay(40)
+    assert replay.stats() == results
+    assert [e.location for e in replay.elevators] == \
+        [e.location for e in sim.elevators]
+    for floor in sim.waiting:
+        assert [(p.target, p.wait_time) for p in replay.waiting[floor]] == \
+            [(p.target, p.wait_time) for p in sim.waiting[floor]]
+
+    for num_rounds in [1, 5, 12, 39]:
+        assert log.replay(num_rounds).stats() == \
+            Simulation(make_config()).run(num_rounds)
+
+    # A log closed before any round can be read, but not replayed.
+    empty = str(tmp_path / 'empty.log')
+    RunLogWriter(empty).close()
+    assert RunLog(empty).num_rounds == 0
+    with pytest.raises(ValueError):
+        RunLog(empty).replay()
+
+
+class _RecordingVisualizer:
+    """A visualizer that keeps track of what it would be showing."""
+
+    def __init__(self) -> None:
+        self.waiting = set()
+        self.riding = set()
+        self.frames = 0
+
+    def render_header(self, round_num) -> None:
+        self.frames += 1
+
+    def show_arrivals(self, arrivals) -> None:
+        for people in arrivals.values():
+            self.waiting.update(people)
+
+    def show_boarding(self, person, elevator) -> None:
+        self.waiting.remove(person)
+        self.riding.add((person, elevator))
+
+    def show_disembarking(self, person, elevator) -> None:
+        self.riding.remove((person, elevator))
+
+    def show_elevator_moves(self, elevators, directions) -> None:
+        pass
+
+    def wait(self, duration) -> None:
+        assert duration == 0
+
+
+def test_frame_skipping_visualizer() -> None:
+    """Test that skipping frames only draws every Nth round, and that the
+    frames drawn always match the simulation's state.
+    """
+    random.seed(3)
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': RandomArrivals(6, 2),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    recorder = _RecordingVisualizer()
+    sim.visualizer = FrameSkippingVisualizer(recorder, render_every=7)
+    sim.run(30)
+    # Rounds 7, 14, 21 and 28, then the final state.
+    assert recorder.frames == 5
+    assert recorder.waiting == {p for floor in sim.waiting
+                                for p in sim.waiting[floor]}
+    assert recorder.riding == {(p, e) for e in sim.elevators
+                               for p in e.passengers}
+
+
+def test_registry_builds_configs_from_specs(tmp_path) -> None:
+    """Test that specs loaded from JSON and TOML build the same simulation as
+    a configuration written in code, and that trace files are parsed once.
+    """
+    json_file = tmp_path / 'job.json'
+    json_file.write_text(
+        '{"num_floors": 5, "num_elevators": 2, "elevator_capacity": 2,'
+        ' "num_people_per_round": null, "visualize": false,'
+        ' "arrival_generator": {"name": "FileArrivals",'
+        '                       "filename": "sample_arrivals.csv"},'
+        ' "moving_algorithm": {"name": "CachedAlgorithm",'
+        '                      "algorithm": "ShortSighted"}}')
+    toml_file = tmp_path / 'job.toml'
+    toml_file.write_text(
+        'num_floors = 5\nnum_elevators = 2\nelevator_capacity = 2\n'
+        'visualize = false\nmoving_algorithm = "DestinationDispatch"\n'
+        '[arrival_generator]\nname = "FileArrivals"\n'
+        'filename = "sample_arrivals.csv"\n')
+
+    first = build_config(load_spec(str(json_file)))
+    second = build_config(load_spec(str(toml_file)))
+    assert first['arrival_generator'] is second['arrival_generator']
+    assert isinstance(first['moving_algorithm'], CachedAlgorithm)
+    assert isinstance(second['dispatcher'], DestinationDispatcher)
+    assert build_config(first) == first
+
+    expected = Simulation({
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }).run(12)
+    assert Simulation(first).run(12) == expected
+
+    spec = load_spec(str(json_file))
+    summary = run_replications(spec, 12, max_replications=2, processes=2)
+    assert summary['people_completed']['mean'] == \
+        expected['people_completed']
+
+
+def test_result_cache(tmp_path) -> None:
+    """Test that cached results match fresh runs, that traces are keyed by
+    content, and that old entries are evicted."""
+    trace = tmp_path / 'trace.csv'
+    trace.write_text(open('sample_arrivals.csv').read())
+    spec = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': {'name': 'FileArrivals',
+                              'filename': str(trace)},
+        'moving_algorithm': 'ShortSighted',
+        'visualize': False
+    }
+    cache = ResultCache(str(tmp_path / 'cache'))
+    metrics = {'still_waiting': lambda sim: sum(
+        len(people) for people in sim.waiting.values())}
+    first = cache.run(spec, 10, 0, metrics)
+    assert cache.run(spec, 10, 0, metrics) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first['still_waiting'] == 0
+    del first['still_waiting']
+    assert first == Simulation(build_config(spec)).run(10)
+
+    # A copy of the trace under another name has the same key.
+    copy = tmp_path / 'copy.csv'
+    copy.write_text(trace.read_text())
+    spec['arrival_generator'] = {'name': 'FileArrivals',
+                                 'filename': str(copy)}
+    cache.run(spec, 10, 0, metrics)
+    assert cache.hits == 2
+
+    # Entries of other code versions are kept until pruned or evicted.
+    old = tmp_path / 'cache' / 'v-old' / 'ab' / 'ab.json'
+    old.parent.mkdir(parents=True)
+    old.write_text('{}')
+    assert ResultCache(str(tmp_path / 'cache')).run(spec, 10, 0) == first
+    assert old.exists()
+    cache.prune()
+    assert not old.parent.parent.exists() and len(cache) == 2
+    old.parent.mkdir(parents=True)
+    old.write_text('{}')
+
+    spec['arrival_generator'] = 'RandomArrivals'
+    small = ResultCache(str(tmp_path / 'cache'), max_bytes=1000)
+    for seed in range(20):
+        small.run(spec, 10, seed)
+    assert 0 < len(small) < 20
+    assert not old.exists()
+    summary = run_replications(spec, 10, max_replications=4, processes=2,
+                               cache=small)
+    assert summary['replications'] == 4
+
+
+def test_result_cache_size(tmp_path, monkeypatch) -> None:
+    """Test that replacing an entry does not count its size twice, and that
+    a cache sees the entries another process stored once it recounts."""
+    first = ResultCache(str(tmp_path / 'cache'), max_bytes=1000)
+    first.put('ab' * 32, {'x': 1})
+    size = first._size
+    first.put('ab' * 32, {'x': 1})
+    assert first._size == size
+
+    second = ResultCache(str(tmp_path / 'cache'), max_bytes=1000)
+    for n in range(20):
+        second.put('{:02x}'.format(n) * 32, {'x': n})
+    monkeypatch.setattr(result_cache, 'RECOUNT_EVERY', 1)
+    first.max_bytes = 10 * size
+    first.put('cd' * 32, {'x': 1})
+    assert first._size <= result_cache.TRIM_TO * first.max_bytes
+    assert len(first) < 22
+
+
+def test_resumed_runs_match_single_run() -> None:
+    """Test that running a simulation in several parts, or through
+    checkpoints, gives the same statistics as running it all at once.
+    """
+    def make_sim() -> Simulation:
+        random.seed(11)
+        return Simulation({
+            'num_floors': 7,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': 2,
+            'arrival_generator': RandomArrivals(7, 2),
+            'moving_algorithm': ShortSighted(),
+            'visualize': False
+        })
+    expected = {rounds: make_sim().run(rounds) for rounds in [5, 20, 50]}
+
+    sim = make_sim()
+    assert sim.run(5) == expected[5]
+    assert sim.run(15) == expected[20]
+    assert sim.stats() == expected[20]
+    assert sim.run(30) == expected[50]
+
+    assert make_sim().run_checkpoints([50, 5, 20]) == expected
+
+    sim = make_sim()
+    sim.run(8)
+    assert sim.run_checkpoints([20, 50]) == {20: expected[20],
+                                             50: expected[50]}
+
+
+def test_sparse_waiting_queues() -> None:
+    """Test that a simulation of a very tall building only stores the floors
+    where someone is waiting, keeps count of everyone waiting, and gives the
+    same statistics as before."""
+    queues = WaitingQueues()
+    assert queues[7] == [] and len(queues) == 0
+    queues.add(7, [Person(7, 1), Person(7, 2)])
+    queues.add(3, [Person(3, 1)])
+    assert queues.total == 3 and sorted(queues) == [3, 7]
+    assert [p.target for p in queues.take(7, 5)] == [1, 2]
+    assert list(queues) == [3] and queues.total == 1
+    queues[3] = []
+    assert len(queues) == 0 and queues.total == 0
+    # Lists of empty floors are stored once someone is added to them.
+    queues[5].append(Person(5, 1))
+    queues[5] += [Person(5, 2)]
+    assert list(queues) == [5] and queues.total == 2
+    queues[5].pop(0)
+    del queues[5][:]
+    assert len(queues) == 0 and queues.total == 0
+
+    config = {
+        'num_floors': 5000,
+        'num_elevators': 3,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(5000, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    for _ in range(4):
+        sim.run(2)
+        assert set(sim.waiting) == {floor for floor, people
+                                    in sim.waiting.items() if people}
+        assert sim.waiting.total == sum(len(people) for people
+                                        in sim.waiting.values())
+    config['num_floors'] = 5
+    config['arrival_generator'] = FileArrivals(5, 'sample_arrivals.csv')
+    assert Simulation(config).run(8) == sim.stats()
+
+
+def test_wait_histogram() -> None:
+    """Test that a wait histogram gives the same statistics as keeping the
+    finished people, exact percentiles and breakdowns, and merges."""
+    stats = []
+    histograms = []
+    finished = []
+    for keep_finished in [True, False]:
+        random.seed(47)
+        histogram = WaitHistogram()
+        sim = Simulation({
+            'num_floors': 8,
+            'num_elevators': 3,
+            'elevator_capacity': 3,
+            'num_people_per_round': 3,
+            'arrival_generator': RandomArrivals(8, 3),
+            'moving_algorithm': ShortSighted(),
+            'wait_histogram': histogram,
+            'keep_finished': keep_finished,
+            'visualize': False
+        })
+        stats.append(sim.run(60))
+        histograms.append(histogram)
+        finished.append(sim.all_finished)
+    assert stats[0] == stats[1]
+    assert finished[1] == []
+    times = sorted(p.wait_time for p in finished[0])
+    histogram = histograms[0]
+    assert histogram.count == len(times)
+    for p in [0, 10, 50, 90, 99, 100]:
+        rank = max(1, -(-p * len(times) // 100))
+        assert histogram.percentile(p) == times[rank - 1]
+    from_one = [p.wait_time for p in finished[0] if p.start == 1]
+    assert histogram.breakdown('start')[(1,)]['count'] == len(from_one)
+    assert histogram.percentile(100, start=1) == max(from_one)
+
+    merged = merge_all(histograms)
+    assert merged.count == 2 * histogram.count
+    assert merged.counts() == [2 * n for n in histogram.counts()]
+    assert merged.percentile(50) == histogram.percentile(50)
+    assert WaitHistogram().percentile(50) == -1
+
+
+def test_fuzz_engines_match_simulation() -> None:
+    """Test that every engine behaves like Simulation on random cases, and
+    that a broken engine's counterexample is shrunk."""
+    assert fuzz(300, seed=148, processes=1) is None
+    # Someone going to the floor they are on used to make move_elevators
+    # skip a direction.
+    assert check(Case(5, 2, 1, 'ShortSighted', 4,
+                      {0: [(2, 4)], 1: [(4, 4), (5, 1)]})) is None
+
+    def smaller_elevators(case: Case) -> Trace:
+        """Run <case> with one less seat per elevator."""
+        return run_reference(case.replace(capacity=max(1, case.capacity - 1)))
+
+    result = fuzz(300, seed=148, processes=1,
+                  engines={'smaller': smaller_elevators})
+    assert result is not None
+    case, difference = result
+    assert difference.startswith('smaller: ')
+    assert case.capacity == 2 and case.num_elevators == 1
+    assert case.num_people() == 2
+    assert check(case, {'smaller': smaller_elevators}) == difference
+
+
+def test_overload_mode() -> None:
+    """Test that backlogged queues behave like full ones, and that balking
+    and abandoning people are counted exactly while the queues stay small.
+    """
+    # One person per floor per round, so the backlog keeps their order.
+    rng = random.Random(49)
+    arrivals = {r: [(start, rng.choice([f for f in range(1, 7)
+                                        if f != start]))
+                    for start in rng.sample(range(1, 7), 3)]
+                for r in range(40)}
+    results = []
+    for threshold in [None, 2]:
+        results.append(Simulation({
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': None,
+            'arrival_generator': TraceArrivals(6, arrivals),
+            'moving_algorithm': ShortSighted(),
+            'backlog_threshold': threshold,
+            'visualize': False
+        }).run(60))
+    assert results[0] == results[1]
+    assert 'people_balked' not in results[1]
+
+    random.seed(49)
+    sim = Simulation({
+        'num_floors': 5,
+        'num_elevators': 1,
+        'elevator_capacity': 2,
+        'num_people_per_round': 10,
+        'arrival_generator': RandomArrivals(5, 10),
+        'moving_algorithm': RandomAlgorithm(),
+        'keep_finished': False,
+        'backlog_threshold': 4,
+        'balk_at': 60,
+        'patience': 30,
+        'visualize': False
+    })
+    for _ in range(5):
+        stats = sim.run(100)
+        assert all(len(people) <= 4 for people in sim.waiting.values())
+        assert all(sim.waiting.size(floor) <= 60 for floor in sim.waiting)
+        assert stats['people_balked'] > 0 and stats['people_abandoned'] > 0
+        assert stats['total_people'] == 10 * stats['num_iterations']
+        assert stats['total_people'] == (
+            stats['people_completed'] + stats['people_balked']
+            + stats['people_abandoned'] + sim.waiting.total
+            + len(sim.elevators[0].passengers))
+    with pytest.raises(ValueError):
+        Simulation({
+            'num_floors': 5,
+            'num_elevators': 1,
+            'elevator_capacity': 2,
+            'num_people_per_round': 10,
+            'arrival_generator': RandomArrivals(5, 10),
+            'moving_algorithm': AngriestFirst(AngerIndex()),
+            'anger_index': AngerIndex(),
+            'patience': 30,
+            'visualize': False
+        })
+
+
+def test_zoned_elevators() -> None:
+    """Test that zoned algorithms match the unzoned ones when every elevator
+    serves every floor, and that with separate banks everyone reaches their
+    target, transferring at the lobby when needed."""
+    for name in ['PushyPassenger', 'ShortSighted']:
+        results = []
+        for moving_algorithm, zones in [(name, None),
+                                        ('Zoned' + name, [range(1, 9)] * 3)]:
+            random.seed(50)
+            spec = {
+                'num_floors': 8,
+                'num_elevators': 3,
+                'elevator_capacity': 3,
+                'num_people_per_round': 2,
+                'arrival_generator': 'RandomArrivals',
+                'moving_algorithm': moving_algorithm,
+                'zones': zones,
+                'visualize': False
+            }
+            results.append(Simulation(build_config(spec)).run(50))
+        assert results[0] == results[1]
+
+    low, high = [1, 2, 3, 4, 5], [1, 5, 6, 7, 8, 9, 10]
+    table = ZoneTable([low, low, high], 10)
+    assert table.candidates[3] == (0, 1) and table.candidates[5] == (0, 1, 2)
+    assert table.destination(0, 9) == 5 and table.destination(2, 9) == 9
+    assert table.boarders(3, 9) == {0, 1}
+    assert table.boarders(5, 9) == {2}
+    with pytest.raises(ValueError):
+        ZoneTable([[1, 2], [3, 4]], 4)
+    for moving_algorithm in [ShortSighted(),
+                             ZonedShortSighted(ZoneTable([low, high], 10))]:
+        with pytest.raises(ValueError):
+            Simulation({
+                'num_floors': 10,
+                'num_elevators': 3,
+                'elevator_capacity': 2,
+                'num_people_per_round': 2,
+                'arrival_generator': RandomArrivals(10, 2),
+                'moving_algorithm': moving_algorithm,
+                'zones': table,
+                'visualize': False
+            })
+    for algorithm in [ZonedPushyPassenger, ZonedShortSighted]:
+        arrivals = {0: [(3, 9), (9, 2), (1, 4)], 1: [(7, 1), (2, 6)]}
+        sim = Simulation({
+            'num_floors': 10,
+            'num_elevators': 3,
+            'elevator_capacity': 2,
+            'num_people_per_round': None,
+            'arrival_generator': TraceArrivals(10, arrivals),
+            'moving_algorithm': algorithm(table),
+            'zones': table,
+            'visualize': False
+        })
+        stats = sim.run(60)
+        assert stats['people_completed'] == stats['total_people'] == 5
+
+
+def test_dispatcher_batches_and_errors() -> None:
+    """Test that the dispatcher answers a batch, rejects a malformed request
+    without dying, and answers requests with an error once stopped."""
+    dispatcher = Dispatcher()
+    dispatcher.create('b', {'max_floor': 6, 'num_elevators': 2,
+                            'elevator_capacity': 4,
+                            'moving_algorithm': 'ShortSighted'})
+    result = dispatcher.decide('b', {
+        'elevators': [{'location': 1, 'targets': [4]},
+                      {'location': 6, 'targets': []}],
+        'new_calls': [[3, 1]]
+    })
+    assert result == {'directions': [1, -1]}
+
+    bad = dispatcher.decide('b', {'new_calls': [[9, 1]]}, timeout=5)
+    assert 'floor out of range' in bad['error']
+    assert dispatcher.buildings['b'].waiting[3][0].target == 1
+    assert 'error' in dispatcher.decide('b', {'boarded': 'x'}, timeout=5)
+    assert dispatcher.decide('nowhere', {}, timeout=5) == \
+        {'error': 'unknown building'}
+    # The dispatcher thread survived the bad requests.
+    assert dispatcher.decide('b', {}, timeout=5) == {'directions': [1, -1]}
+
+    # Algorithms driven by simulation state are refused up front.
+    for algorithm in ['DestinationDispatch', 'ZonedShortSighted',
+                      {'name': 'CachedAlgorithm',
+                       'algorithm': 'AngriestFirst'}]:
+        with pytest.raises(ValueError):
+            dispatcher.create('c', {'max_floor': 6, 'num_elevators': 2,
+                                    'elevator_capacity': 4,
+                                    'moving_algorithm': algorithm})
+    assert 'c' not in dispatcher.buildings
+
+    dispatcher.stop()
+    assert dispatcher.decide('b', {}, timeout=5) == \
+        {'error': 'dispatcher stopped'}
+
+
+def test_simulation_reset(tmp_path) -> None:
+    """Test that a reset simulation runs exactly like a new one, including
+    the state shared with its anger index, demand estimator, dispatcher and
+    wait histogram, and that a simulation writing a run log refuses it."""
+    def make_config() -> dict:
+        return {
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': 2,
+            'arrival_generator': RandomArrivals(6, 2),
+            'moving_algorithm': CachedAlgorithm(ShortSighted()),
+            'anger_index': AngerIndex(history_length=50),
+            'demand_estimator': DemandEstimator(),
+            'wait_histogram': WaitHistogram(),
+            'visualize': False
+        }
+    fresh_config = make_config()
+    random.seed(37)
+    expected = Simulation(fresh_config).run(20)
+
+    config = make_config()
+    sim = Simulation(config)
+    random.seed(5)
+    sim.run(13)
+    sim.reset()
+    random.seed(37)
+    assert sim.run(20) == expected
+    assert config['anger_index'].history == fresh_config['anger_index'].history
+    assert config['wait_histogram'].counts() == \
+        fresh_config['wait_histogram'].counts()
+    assert config['demand_estimator'].last_round == 19
+    assert config['moving_algorithm'].misses == \
+        fresh_config['moving_algorithm'].misses
+
+    dispatched = dict(make_config(), dispatcher=DestinationDispatcher(),
+                      moving_algorithm=ShortSighted())
+    sim = Simulation(dispatched)
+    sim.run(10)
+    sim.reset()
+    assert dispatched['dispatcher'].groups == {}
+
+    with RunLogWriter(str(tmp_path / 'run.log')) as writer:
+        sim = Simulation(dict(make_config(), run_log=writer))
+        with pytest.raises(ValueError):
+            sim.reset()
+
+
+def test_balanced_boarding_heading() -> None:
+    """Test that with balanced boarding, an elevator heads the way most of
+    its passengers are going, not the way its first passenger is going.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 4,
+        'num_people_per_round': 2,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'boarding': 'balanced',
+        'visualize': False
+    }
+    sim = Simulation(config)
+    for elevator in sim.elevators:
+        elevator.location = 3
+    sim.elevators[0].passengers.extend(
+        [Person(3, 5), Person(3, 1), Person(3, 2)])
+    sim.waiting[3].extend([Person(3, 1), Person(3, 4)])
+    sim._handle_boarding()
+
+    targets = [[p.target for p in e.passengers] for e in sim.elevators]
+    assert targets == [[5, 1, 2, 1], [4]]
+
+    # As many passengers go up as down: the closest target, floor 2, wins.
+    for elevator in sim.elevators:
+        elevator.passengers.clear()
+    sim.elevators[0].passengers.extend([Person(3, 5), Person(3, 2)])
+    sim.elevators[1].passengers.append(Person(3, 5))
+    sim.waiting[3].append(Person(3, 1))
+    sim._handle_boarding()
+    assert [p.target for p in sim.elevators[0].passengers] == [5, 2, 1]
+
+
+def test_dispatch_service_bad_requests() -> None:
+    """Test that the dispatch server answers malformed bodies and unusable
+    buildings with status 400, and that two requests for one building in a
+    batch each get the decision for their own state."""
+    server = DispatchServer(('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        conn = http.client.HTTPConnection(*server.server_address)
+        for path, body in [('/buildings/b', b'{not json'),
+                           ('/buildings/b', b'[1, 2]'),
+                           ('/buildings/b/decide', b'\xff')]:
+            conn.request('POST', path, body)
+            response = conn.getresponse()
+            assert response.status == 400
+            assert 'error' in json.loads(response.read())
+        for config in [{'max_floor': 0, 'num_elevators': 1,
+                        'elevator_capacity': 4},
+                       {'max_floor': 6, 'num_elevators': 1,
+                        'elevator_capacity': -1},
+                       {'max_floor': 6, 'num_elevators': 0,
+                        'elevator_capacity': 4}]:
+            conn.request('POST', '/buildings/b', json.dumps(config))
+            response = conn.getresponse()
+            assert response.status == 400
+            assert 'at least' in json.loads(response.read())['error']
+        assert 'b' not in server.dispatcher.buildings
+        conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    dispatcher = Dispatcher()
+    dispatcher.create('b', {'max_floor': 6, 'num_elevators': 1,
+                            'elevator_capacity': 4})
+    batch = [_PendingDecision('b', {'elevators': [{'location': 1,
+                                                   'targets': [4]}]}),
+             _PendingDecision('b', {'elevators': [{'location': 4,
+                                                   'targets': [2]}]})]
+    dispatcher._handle_batch(batch)
+    assert [pending.result for pending in batch] == \
+        [{'directions': [1]}, {'directions': [-1]}]
+    dispatcher.stop()
+
+
 if __name__ == '__main__':
     import pytest
     pytest.main(['a1_sample_test.py'])
@@ -17,10 +17,12 @@ See the 'Arrival generation algorithms' and 'Elevator moving algorithsm'
 sections of the assignment handout for a complete description of each algorithm
 you are expected to implement in this file.
 """
+from collections import OrderedDict
+from bisect import bisect_left
 import csv
 from enum import Enum
 import random
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Hashable, List, Optional
 
 from entities import Person, Elevator
 
@@ -80,14 +82,12 @@ class RandomArrivals(ArrivalGenerator):
 
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         res = {}
-        for i in range(1, self.max_floor + 1):
-            res[i] = []
         for i in range(self.num_people):
             start = random.randint(1, self.max_floor)
             target = random.randint(1, self.max_floor)
             while start == target:
                 start = random.randint(1, self.max_floor)
-            res[start].append(Person(start, target))
+            res.setdefault(start, []).append(Person(start, target))
         return res
 
 
@@ -122,10 +122,10 @@ class FileArrivals(ArrivalGenerator):
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """Generate a Dict in which each floor index is corresponding to a list
         of person that arrived at this floor with the given file.
+
+        Floors where nobody arrived are left out.
         """
         res = {}
-        for floor in range(1, self.max_floor + 1):
-            res[floor] = []
         round_arrival = self.arrival_dict.get(round_num, [])
         for people in range(int(len(round_arrival)/2)):
             start = round_arrival[people*2]
@@ -169,6 +169,48 @@ class MovingAlgorithm:
         """
         raise NotImplementedError
 
+    def move_elevators_batch(self,
+                             elevators: List[Elevator],
+                             waiting: Dict[int, List[Person]],
+                             max_floor: int) -> List[Direction]:
+        """Return the same directions as move_elevators, with the work that
+        is shared between elevators done once for the whole fleet.
+
+        This is what the simulation calls. By default it simply calls
+        move_elevators, which remains the reference implementation. An
+        elevator that is already on the floor it is heading for gets
+        Direction.STAY.
+        """
+        return self.move_elevators(elevators, waiting, max_floor)
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the floor each elevator is heading for.
+
+        This is used by simulations where elevators can move more than one
+        floor per round. By default each elevator's target is the floor next
+        to it in the direction chosen by move_elevators_batch.
+        """
+        directions = self.move_elevators_batch(elevators, waiting, max_floor)
+        return [elevator.location + direction.value
+                for elevator, direction in zip(elevators, directions)]
+
+    def decision_key(self,
+                     elevators: List[Elevator],
+                     waiting: Dict[int, List[Person]],
+                     max_floor: int) -> Optional[Hashable]:
+        """Return a hashable key such that any two states with equal keys get
+        the same directions from move_elevators and the same floors from
+        target_floors, or None if this algorithm's decisions cannot be cached
+        (e.g. because they are random).
+
+        The key is computed for every decision of a CachedAlgorithm, so it
+        should be much cheaper to compute than the decision itself.
+        """
+        return None
+
 
 class RandomAlgorithm(MovingAlgorithm):
     """A moving algorithm that picks a random direction for each elevator.
@@ -216,7 +258,7 @@ class PushyPassenger(MovingAlgorithm):
 
         for elevator in elevators:
             if len(elevator.passengers) == 0:
-                if lowest == 0:
+                if lowest == 0 or elevator.location == lowest:
                     res.append(Direction.STAY)
                 elif elevator.location > lowest:
                     res.append(Direction.DOWN)
@@ -228,8 +270,53 @@ class PushyPassenger(MovingAlgorithm):
                     res.append(Direction.UP)
                 elif first_passenger.target < elevator.location:
                     res.append(Direction.DOWN)
+                else:
+                    res.append(Direction.STAY)
         return res
 
+    def move_elevators_batch(self,
+                             elevators: List[Elevator],
+                             waiting: Dict[int, List[Person]],
+                             max_floor: int) -> List[Direction]:
+        """Return the PushyPassenger directions for every elevator, finding
+        the lowest waiting floor once for the whole fleet."""
+        targets = self.target_floors(elevators, waiting, max_floor)
+        return [_direction_to(elevator.location, target)
+                for elevator, target in zip(elevators, targets)]
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the target of each elevator's first passenger, or the
+        lowest floor with people waiting for empty elevators."""
+        lowest = find_lowest(waiting, max_floor)
+        res = []
+        for elevator in elevators:
+            if len(elevator.passengers) != 0:
+                res.append(elevator.passengers[0].target)
+            elif lowest == 0:
+                res.append(elevator.location)
+            else:
+                res.append(lowest)
+        return res
+
+    def decision_key(self,
+                     elevators: List[Elevator],
+                     waiting: Dict[int, List[Person]],
+                     max_floor: int) -> Optional[Hashable]:
+        """Return the key of this state: the lowest floor with people
+        waiting, and the location and first passenger's target of each
+        elevator."""
+        cars = []
+        for elevator in elevators:
+            if len(elevator.passengers) == 0:
+                cars.append((elevator.location, None))
+            else:
+                cars.append((elevator.location,
+                             elevator.passengers[0].target))
+        return find_lowest(waiting, max_floor), tuple(cars)
+
 
 class ShortSighted(MovingAlgorithm):
     """A moving algorithm that preferences the closest possible choice.
@@ -263,8 +350,10 @@ class ShortSighted(MovingAlgorithm):
                     closest = _find_closest(elevator.location, waiting_floor)
                     if closest < elevator.location:
                         res.append(Direction.DOWN)
-                    if closest > elevator.location:
+                    elif closest > elevator.location:
                         res.append(Direction.UP)
+                    else:
+                        res.append(Direction.STAY)
             else:
                 target_floor = []
                 for passenger in elevator.passengers:
@@ -274,8 +363,171 @@ class ShortSighted(MovingAlgorithm):
                 closest = _find_closest(elevator.location, target_floor)
                 if closest < elevator.location:
                     res.append(Direction.DOWN)
-                if closest > elevator.location:
+                elif closest > elevator.location:
                     res.append(Direction.UP)
+                else:
+                    res.append(Direction.STAY)
+        return res
+
+    def move_elevators_batch(self,
+                             elevators: List[Elevator],
+                             waiting: Dict[int, List[Person]],
+                             max_floor: int) -> List[Direction]:
+        """Return the ShortSighted directions for every elevator.
+
+        The floors with people waiting are sorted once for the whole fleet,
+        and each empty elevator finds its closest one by binary search.
+        """
+        targets = self.target_floors(elevators, waiting, max_floor)
+        return [_direction_to(elevator.location, target)
+                for elevator, target in zip(elevators, targets)]
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the closest passenger target of each elevator, or the
+        closest floor with people waiting for empty elevators."""
+        occupied = sorted(floor for floor in waiting
+                          if len(waiting[floor]) != 0)
+        res = []
+        for elevator in elevators:
+            location = elevator.location
+            if len(elevator.passengers) != 0:
+                res.append(min((p.target for p in elevator.passengers),
+                               key=lambda t: (abs(t - location), t)))
+            elif len(occupied) == 0:
+                res.append(location)
+            else:
+                res.append(_nearest_floor(location, occupied))
+        return res
+
+    def decision_key(self,
+                     elevators: List[Elevator],
+                     waiting: Dict[int, List[Person]],
+                     max_floor: int) -> Optional[Hashable]:
+        """Return the key of this state: the set of floors with people
+        waiting, and the location and nearest passenger target of each
+        elevator.
+
+        The floors are a set, since the floors of a WaitingQueues are in the
+        order people first arrived on them, and sorting them would cost
+        about as much as the decision itself.
+        """
+        cars = []
+        for elevator in elevators:
+            location = elevator.location
+            nearest = None
+            for passenger in elevator.passengers:
+                target = passenger.target
+                if nearest is None \
+                        or abs(target - location) < abs(nearest - location) \
+                        or (target < nearest and abs(target - location)
+                            == abs(nearest - location)):
+                    nearest = target
+            cars.append((location, nearest))
+        occupied = frozenset([floor for floor in waiting
+                              if len(waiting[floor]) != 0])
+        return occupied, tuple(cars)
+
+
+class CachedAlgorithm(MovingAlgorithm):
+    """A moving algorithm that remembers the decisions of another one.
+
+    Decisions are stored in a least-recently-used cache keyed by the wrapped
+    algorithm's decision_key, so a state that recurs is answered without
+    running the wrapped algorithm again. Algorithms whose decision_key is None
+    are always run. Both move_elevators and target_floors are cached, so a
+    cached algorithm moves elevators exactly like the algorithm it wraps,
+    whichever of the two the simulation uses.
+
+    Computing the key costs a fraction of a decision, so the cache only
+    saves time when states recur often, as in small buildings; check
+    hit_rate before relying on it.
+
+    === Attributes ===
+    algorithm: the moving algorithm whose decisions are cached.
+    max_size: the maximum number of decisions kept, or None for no limit.
+    hits: the number of decisions answered from the cache.
+    misses: the number of decisions computed by the wrapped algorithm.
+
+    === Representation invariants ===
+    max_size is None or max_size >= 1
+    """
+    algorithm: MovingAlgorithm
+    max_size: Optional[int]
+    hits: int
+    misses: int
+    _cache: OrderedDict
+
+    def __init__(self, algorithm: MovingAlgorithm,
+                 max_size: Optional[int] = 4096) -> None:
+        """Initialize a new cache in front of <algorithm>."""
+        self.algorithm = algorithm
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return the wrapped algorithm's directions, from the cache when
+        this state has been seen before."""
+        return self._cached(self.algorithm.move_elevators_batch, elevators,
+                            waiting, max_floor)
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the wrapped algorithm's target floors, from the cache when
+        this state has been seen before."""
+        return self._cached(self.algorithm.target_floors, elevators,
+                            waiting, max_floor)
+
+    def decision_key(self,
+                     elevators: List[Elevator],
+                     waiting: Dict[int, List[Person]],
+                     max_floor: int) -> Optional[Hashable]:
+        """Return the wrapped algorithm's key."""
+        return self.algorithm.decision_key(elevators, waiting, max_floor)
+
+    def hit_rate(self) -> float:
+        """Return the fraction of decisions answered from the cache."""
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def clear(self) -> None:
+        """Forget every cached decision and reset the counters."""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, decide: Callable[[List[Elevator],
+                                        Dict[int, List[Person]], int], list],
+                elevators: List[Elevator],
+                waiting: Dict[int, List[Person]],
+                max_floor: int) -> list:
+        """Return the result of the wrapped algorithm's method <decide> for
+        this state, from the cache when it has been computed before."""
+        key = self.algorithm.decision_key(elevators, waiting, max_floor)
+        if key is None:
+            self.misses += 1
+            return decide(elevators, waiting, max_floor)
+        key = (decide.__name__, max_floor, key)
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return list(self._cache[key])
+        self.misses += 1
+        res = decide(elevators, waiting, max_floor)
+        self._cache[key] = tuple(res)
+        if self.max_size is not None and len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
         return res
 
 
@@ -283,7 +535,8 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-io': ['__init__'],
-        'extra-imports': ['entities', 'random', 'csv', 'enum'],
+        'extra-imports': ['entities', 'random', 'csv', 'enum', 'collections',
+                          'bisect'],
         'max-nested-blocks': 4,
         'disable': ['R0201']
     })
@@ -293,11 +546,10 @@ def find_lowest(waiting: Dict[int, List[Person]], max_floor: int) -> int:
     """find the lowest floor that has people waiting for elevators.
     """
     lowest = 0
-    floor = 1
-    while lowest == 0 and floor <= max_floor:
-        if len(waiting[floor]) > 0:
+    for floor in waiting:
+        if len(waiting[floor]) > 0 and floor <= max_floor \
+                and (lowest == 0 or floor < lowest):
             lowest = floor
-        floor += 1
     return lowest
 
 
@@ -318,3 +570,30 @@ def _find_closest(current, floor_has_people) -> int:
                 minimum = floor
                 distance = temp
     return minimum
+
+
+def _nearest_floor(current: int, sorted_floors: List[int]) -> int:
+    """Return the floor in the non-empty, sorted list <sorted_floors> that is
+    closest to <current>, preferring the lower floor on a tie (the same choice
+    as _find_closest).
+    """
+    i = bisect_left(sorted_floors, current)
+    if i == len(sorted_floors):
+        return sorted_floors[-1]
+    if i == 0 or sorted_floors[i] == current:
+        return sorted_floors[i]
+    below = sorted_floors[i - 1]
+    above = sorted_floors[i]
+    if current - below <= above - current:
+        return below
+    return above
+
+
+def _direction_to(current: int, floor: int) -> Direction:
+    """Return the direction an elevator at <current> moves to reach <floor>.
+    """
+    if floor > current:
+        return Direction.UP
+    elif floor < current:
+        return Direction.DOWN
+    return Direction.STAY
@@ -0,0 +1,224 @@
+"""CSC148 Assignment 1 - Anger Index
+
+=== Module Description ===
+Everyone waiting or riding gains one round of wait time per round, so a
+person's anger level only depends on the round they arrived in. This module
+contains:
+
+    - AngerIndex, which keeps the people in the simulation in one bucket per
+      anger level. People who arrived in the same round form a cohort; each
+      round, only the four cohorts that cross a threshold (see
+      entities.ANGER_THRESHOLDS) move to the next bucket, so the people and
+      the count at each level are available without scanning the floors
+      and elevators.
+    - AngriestFirst, a MovingAlgorithm that sends empty elevators to the
+      floors where the angriest people are waiting.
+
+A Simulation keeps the index given by the optional 'anger_index'
+configuration key up to date.
+"""
+from collections import deque
+from typing import Deque, Dict, List, Set
+
+from algorithms import Direction, MovingAlgorithm, ShortSighted, \
+    _direction_to
+from entities import ANGER_THRESHOLDS, Elevator, Person
+
+# The number of anger levels.
+NUM_LEVELS = len(ANGER_THRESHOLDS)
+
+
+class AngerIndex:
+    """The people in a simulation, bucketed by anger level.
+
+    === Attributes ===
+    round_num: the current round.
+    history_length: the number of rounds kept in history.
+    history: the number of people at each level at the end of each of the
+             last history_length rounds, oldest first.
+
+    === Representation invariants ===
+    Every person in the index is in exactly one level bucket.
+    history_length >= 0
+    len(history) <= history_length
+    """
+    round_num: int
+    history_length: int
+    history: Deque[List[int]]
+    _arrivals: Dict[Person, int]
+    _levels: List[Set[Person]]
+    _cohorts: Dict[int, Set[Person]]
+    _waiting: Set[Person]
+    _floors: List[Dict[int, int]]
+
+    def __init__(self, history_length: int = 0) -> None:
+        """Initialize a new, empty index at round 0, which keeps the counts
+        of the last <history_length> rounds (none by default).
+
+        Precondition: history_length >= 0
+        """
+        self.history_length = history_length
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget everyone and every round, going back to round 0."""
+        self.round_num = 0
+        self.history = deque(maxlen=self.history_length)
+        # person -> the round they arrived in
+        self._arrivals = {}
+        self._levels = [set() for _ in range(NUM_LEVELS)]
+        # arrival round -> the people who arrived then and have not reached
+        # the last level or left
+        self._cohorts = {}
+        self._waiting = set()
+        # level -> floor -> number of people waiting there at that level
+        self._floors = [{} for _ in range(NUM_LEVELS)]
+
+    def arrive(self, people: List[Person]) -> None:
+        """Add <people>, who arrived this round and are waiting on their
+        start floors."""
+        if len(people) == 0:
+            return
+        cohort = self._cohorts.setdefault(self.round_num, set())
+        for person in people:
+            self._arrivals[person] = self.round_num
+            cohort.add(person)
+            self._levels[0].add(person)
+            self._waiting.add(person)
+            _add_count(self._floors[0], person.start, 1)
+
+    def board(self, person: Person) -> None:
+        """Record that <person> boarded an elevator."""
+        self._waiting.discard(person)
+        _add_count(self._floors[self.level(person)], person.start, -1)
+
+    def leave(self, person: Person) -> None:
+        """Remove <person>, who reached their target floor."""
+        arrival = self._arrivals.pop(person)
+        level = self._level_at_age(self.round_num - arrival)
+        self._levels[level].discard(person)
+        if arrival in self._cohorts:
+            self._cohorts[arrival].discard(person)
+        if person in self._waiting:
+            self._waiting.discard(person)
+            _add_count(self._floors[level], person.start, -1)
+
+    def advance(self) -> None:
+        """Move to the next round, and record the count at each level if
+        history is kept."""
+        self.round_num += 1
+        for level in range(1, NUM_LEVELS):
+            arrival = self.round_num - ANGER_THRESHOLDS[level]
+            cohort = self._cohorts.get(arrival)
+            if cohort is None:
+                continue
+            for person in cohort:
+                self._levels[level - 1].discard(person)
+                self._levels[level].add(person)
+                if person in self._waiting:
+                    _add_count(self._floors[level - 1], person.start, -1)
+                    _add_count(self._floors[level], person.start, 1)
+            if level == NUM_LEVELS - 1 or len(cohort) == 0:
+                del self._cohorts[arrival]
+        if self.history_length > 0:
+            self.history.append(self.counts())
+
+    def level(self, person: Person) -> int:
+        """Return the anger level of <person>, who is in the index."""
+        return self._level_at_age(self.round_num - self._arrivals[person])
+
+    def people_at(self, level: int) -> Set[Person]:
+        """Return the people at anger level <level>. The set must not be
+        modified."""
+        return self._levels[level]
+
+    def count(self, level: int) -> int:
+        """Return the number of people at anger level <level>."""
+        return len(self._levels[level])
+
+    def counts(self) -> List[int]:
+        """Return the number of people at each anger level."""
+        return [len(bucket) for bucket in self._levels]
+
+    def angriest_floors(self, min_level: int = 0) -> List[int]:
+        """Return the floors where people at the highest anger level among
+        the people waiting are waiting, most people first, or [] if that
+        level is below <min_level>."""
+        for level in range(NUM_LEVELS - 1, min_level - 1, -1):
+            floors = self._floors[level]
+            if len(floors) != 0:
+                return sorted(floors, key=lambda f: (-floors[f], f))
+        return []
+
+    def _level_at_age(self, age: int) -> int:
+        """Return the anger level of someone who arrived <age> rounds ago."""
+        level = 0
+        while level + 1 < NUM_LEVELS and age >= ANGER_THRESHOLDS[level + 1]:
+            level += 1
+        return level
+
+
+def _add_count(counts: Dict[int, int], floor: int, change: int) -> None:
+    """Add <change> to counts[floor], removing the floor when it reaches 0."""
+    count = counts.get(floor, 0) + change
+    if count == 0:
+        del counts[floor]
+    else:
+        counts[floor] = count
+
+
+class AngriestFirst(MovingAlgorithm):
+    """A moving algorithm that serves the angriest waiting people first.
+
+    Elevators with passengers, and empty elevators once every angry floor
+    has one on its way, move like ShortSighted. Each floor returned by the
+    index's angriest_floors gets the closest empty elevator.
+
+    === Attributes ===
+    index: the anger index kept by the simulation.
+    min_level: the lowest anger level worth sending an elevator for.
+    """
+    index: AngerIndex
+    min_level: int
+    _short_sighted: ShortSighted
+
+    def __init__(self, index: AngerIndex, min_level: int = 1) -> None:
+        """Initialize a new algorithm using <index>."""
+        self.index = index
+        self.min_level = min_level
+        self._short_sighted = ShortSighted()
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return a list of directions for each elevator to move to according to
+        the AngriestFirst algorithm."""
+        targets = self.target_floors(elevators, waiting, max_floor)
+        return [_direction_to(elevator.location, target)
+                for elevator, target in zip(elevators, targets)]
+
+    def move_elevators_batch(self,
+                             elevators: List[Elevator],
+                             waiting: Dict[int, List[Person]],
+                             max_floor: int) -> List[Direction]:
+        """Return the same directions as move_elevators."""
+        return self.move_elevators(elevators, waiting, max_floor)
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return ShortSighted's targets, with empty elevators sent to the
+        angriest floors."""
+        res = self._short_sighted.target_floors(elevators, waiting, max_floor)
+        empty = [i for i, elevator in enumerate(elevators)
+                 if len(elevator.passengers) == 0]
+        for floor in self.index.angriest_floors(self.min_level):
+            if len(empty) == 0:
+                break
+            closest = min(empty,
+                          key=lambda i: abs(elevators[i].location - floor))
+            res[closest] = floor
+            empty.remove(closest)
+        return res
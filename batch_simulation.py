@@ -0,0 +1,291 @@
+"""CSC148 Assignment 1 - Batch Simulation
+
+=== Module Description ===
+This module contains BatchSimulation, which advances many small, independent
+simulations together, one round at a time.
+
+Each Simulation pays for its own Person and Elevator objects (and their
+sprites) and for a method call per stage per round. BatchSimulation instead
+stores the state of every simulation in plain lists indexed by simulation id:
+elevator locations, passengers as (target, arrival round) pairs, and waiting
+queues keyed by floor that only hold the floors where someone is waiting. The
+PushyPassenger and ShortSighted rules are applied directly to that state.
+
+The results are exactly those of running each configuration with
+Simulation.run: one statistics dictionary per simulation, in the same format
+as Simulation._calculate_stats.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+import algorithms
+from algorithms import _nearest_floor
+
+# The moving algorithms BatchSimulation can apply.
+_PUSHY = 0
+_SHORT_SIGHTED = 1
+
+# The configuration keys BatchSimulation handles, and the keys that do not
+# change the statistics of a run that is not visualized.
+_SUPPORTED_KEYS = {'num_floors', 'num_elevators', 'elevator_capacity',
+                   'num_people_per_round', 'arrival_generator',
+                   'moving_algorithm', 'visualize', 'render_every',
+                   'target_fps', 'keep_finished'}
+
+# The values of Simulation's other optional keys that leave their feature
+# off. Any other key may only be None.
+_OFF_VALUES = {'elevator_speed': 1, 'door_dwell': 0, 'boarding_time': 0}
+
+
+class BatchSimulation:
+    """Many independent simulations, stepped in lockstep.
+
+    Simulation s has num_floors[s] floors and len(locations[s]) elevators of
+    capacity capacity[s]. People are stored as (target, arrival round) pairs,
+    since a person's wait time is the number of rounds since they arrived.
+
+    === Attributes ===
+    num_floors: the number of floors of each simulation.
+    capacity: the elevator capacity of each simulation.
+    locations: the location of each elevator of each simulation.
+    passengers: the passengers of each elevator of each simulation.
+    waiting: the people waiting on each floor of each simulation; only floors
+             with at least one person waiting are keys.
+    rounds_run: the number of rounds every simulation has run.
+
+    === Representation invariants ===
+    All the lists above have one entry per simulation.
+    """
+    num_floors: List[int]
+    capacity: List[int]
+    locations: List[List[int]]
+    passengers: List[List[List[Tuple[int, int]]]]
+    waiting: List[Dict[int, Deque[Tuple[int, int]]]]
+    rounds_run: int
+    _algorithms: List[int]
+    _generators: List[algorithms.ArrivalGenerator]
+    _finished: List[List[int]]
+    _in_system: List[int]
+
+    def __init__(self, configs: List[Dict[str, Any]]) -> None:
+        """Initialize one simulation per configuration in <configs>.
+
+        The configurations are the same as Simulation's. Only the
+        PushyPassenger and ShortSighted moving algorithms are supported.
+
+        Raise ValueError if a configuration is visualized or turns on a
+        feature BatchSimulation does not model, such as an elevator model,
+        balanced boarding, a dispatcher, overload mode or zones, instead of
+        silently ignoring it.
+        """
+        self.num_floors = []
+        self.capacity = []
+        self.locations = []
+        self.passengers = []
+        self.waiting = []
+        self.rounds_run = 0
+        self._algorithms = []
+        self._generators = []
+        # [count, total, minimum, maximum] of the finished people's wait times
+        self._finished = []
+        # the number of people waiting or riding in each simulation
+        self._in_system = []
+        for config in configs:
+            _check_supported(config)
+            algorithm = config['moving_algorithm']
+            if isinstance(algorithm, algorithms.PushyPassenger):
+                self._algorithms.append(_PUSHY)
+            elif isinstance(algorithm, algorithms.ShortSighted):
+                self._algorithms.append(_SHORT_SIGHTED)
+            else:
+                raise ValueError('BatchSimulation only supports the '
+                                 'PushyPassenger and ShortSighted algorithms')
+            self.num_floors.append(config['num_floors'])
+            self.capacity.append(config['elevator_capacity'])
+            self.locations.append([1] * config['num_elevators'])
+            self.passengers.append([[] for _ in
+                                    range(config['num_elevators'])])
+            self.waiting.append({})
+            self._generators.append(config['arrival_generator'])
+            self._finished.append([0, 0, -1, -1])
+            self._in_system.append(0)
+
+    def run(self, num_rounds: int) -> List[Dict[str, int]]:
+        """Run every simulation for the given number of rounds, and return the
+        statistics of each one.
+
+        Precondition: num_rounds >= 1.
+        """
+        for _ in range(num_rounds):
+            self.step()
+        return [self.stats(s) for s in range(len(self.num_floors))]
+
+    def step(self) -> None:
+        """Run one round of every simulation."""
+        round_num = self.rounds_run
+        for s in range(len(self.num_floors)):
+            waiting = self.waiting[s]
+            self._generate_arrivals(s, round_num, waiting)
+            if self._in_system[s] == 0:
+                # Nobody to move: every elevator stays where it is.
+                continue
+            self._handle_leaving(s, round_num)
+            self._handle_boarding(s, waiting)
+            self._move_elevators(s, waiting)
+        self.rounds_run += 1
+
+    def stats(self, s: int) -> Dict[str, int]:
+        """Return the statistics of simulation <s> after the rounds run so
+        far, in the same format as Simulation._calculate_stats."""
+        count, total, minimum, maximum = self._finished[s]
+        num_people = count
+        for queue in self.waiting[s].values():
+            num_people += len(queue)
+        for passengers in self.passengers[s]:
+            num_people += len(passengers)
+        return {
+            'num_iterations': self.rounds_run,
+            'total_people': num_people,
+            'people_completed': count,
+            'max_time': maximum,
+            'min_time': minimum,
+            'avg_time': int(total / count) if count > 0 else -1
+        }
+
+    def snapshot(self, s: int) -> Tuple[Tuple[int, ...],
+                                        Tuple[Tuple[int, ...], ...],
+                                        Tuple[Tuple[int, Tuple[int, ...]],
+                                              ...]]:
+        """Return the elevator locations, passenger targets and waiting
+        targets (per non-empty floor) of simulation <s>."""
+        return (tuple(self.locations[s]),
+                tuple(tuple(t for t, _ in passengers)
+                      for passengers in self.passengers[s]),
+                tuple((floor, tuple(t for t, _ in queue))
+                      for floor, queue in sorted(self.waiting[s].items())))
+
+    def _generate_arrivals(self, s: int, round_num: int,
+                           waiting: Dict[int, Deque[Tuple[int, int]]]) -> None:
+        """Add the arrivals of this round to the queues of simulation <s>."""
+        generator = self._generators[s]
+        num_floors = self.num_floors[s]
+        if isinstance(generator, algorithms.FileArrivals):
+            flat = generator.arrival_dict.get(round_num, [])
+            arrivals = [(flat[i], flat[i + 1])
+                        for i in range(0, len(flat) - 1, 2)]
+        else:
+            arrivals = [(p.start, p.target)
+                        for people in generator.generate(round_num).values()
+                        for p in people]
+            # Simulation adds arrivals floor by floor.
+            arrivals.sort(key=lambda arrival: arrival[0])
+        for start, target in arrivals:
+            if 1 <= start <= num_floors:
+                if start not in waiting:
+                    waiting[start] = deque()
+                waiting[start].append((target, round_num))
+                self._in_system[s] += 1
+
+    def _handle_leaving(self, s: int, round_num: int) -> None:
+        """Remove the passengers of simulation <s> who reached their target.
+        """
+        finished = self._finished[s]
+        for location, passengers in zip(self.locations[s],
+                                        self.passengers[s]):
+            if len(passengers) == 0:
+                continue
+            staying = []
+            for target, arrived in passengers:
+                if target == location:
+                    self._in_system[s] -= 1
+                    wait_time = round_num - arrived
+                    finished[0] += 1
+                    finished[1] += wait_time
+                    if finished[2] == -1 or wait_time < finished[2]:
+                        finished[2] = wait_time
+                    if wait_time > finished[3]:
+                        finished[3] = wait_time
+                else:
+                    staying.append((target, arrived))
+            if len(staying) != len(passengers):
+                passengers[:] = staying
+
+    def _handle_boarding(self, s: int,
+                         waiting: Dict[int, Deque[Tuple[int, int]]]) -> None:
+        """Board the waiting people of simulation <s>, first come first
+        served, onto the elevators in order."""
+        capacity = self.capacity[s]
+        for location, passengers in zip(self.locations[s],
+                                        self.passengers[s]):
+            queue = waiting.get(location)
+            if queue is None:
+                continue
+            while len(passengers) < capacity and len(queue) > 0:
+                passengers.append(queue.popleft())
+            if len(queue) == 0:
+                del waiting[location]
+
+    def _move_elevators(self, s: int,
+                        waiting: Dict[int, Deque[Tuple[int, int]]]) -> None:
+        """Move the elevators of simulation <s> with its moving algorithm."""
+        locations = self.locations[s]
+        passengers = self.passengers[s]
+        if self._algorithms[s] == _PUSHY:
+            lowest = min(waiting, default=0)
+            for e, location in enumerate(locations):
+                if len(passengers[e]) != 0:
+                    goal = passengers[e][0][0]
+                else:
+                    goal = lowest or location
+                locations[e] = location + (goal > location) - (goal < location)
+        else:
+            occupied = sorted(waiting)
+            for e, location in enumerate(locations):
+                if len(passengers[e]) != 0:
+                    goal = min((t for t, _ in passengers[e]),
+                               key=lambda t: (abs(t - location), t))
+                elif len(occupied) != 0:
+                    goal = _nearest_floor(location, occupied)
+                else:
+                    goal = location
+                locations[e] = location + (goal > location) - (goal < location)
+
+
+def _check_supported(config: Dict[str, Any]) -> None:
+    """Raise ValueError if <config> uses a key BatchSimulation does not
+    handle."""
+    if config.get('visualize'):
+        raise ValueError('BatchSimulation cannot be visualized')
+    for key, value in config.items():
+        if key not in _SUPPORTED_KEYS and value is not None \
+                and value != _OFF_VALUES.get(key):
+            raise ValueError('BatchSimulation does not support the {!r} '
+                             'configuration key'.format(key))
+
+
+if __name__ == '__main__':
+    import time
+    from simulation import Simulation
+
+    def _configs(n: int) -> List[Dict[str, Any]]:
+        return [{
+            'num_floors': 6,
+            'num_elevators': 6,
+            'elevator_capacity': 3,
+            'num_people_per_round': 2,
+            'arrival_generator': algorithms.FileArrivals(
+                6, 'sample_arrivals.csv'),
+            'moving_algorithm': (algorithms.PushyPassenger() if i % 2 == 0
+                                 else algorithms.ShortSighted()),
+            'visualize': False
+        } for i in range(n)]
+
+    start_time = time.perf_counter()
+    expected = [Simulation(config).run(100) for config in _configs(1000)]
+    sequential = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    actual = BatchSimulation(_configs(1000)).run(100)
+    batched = time.perf_counter() - start_time
+    assert actual == expected
+    print('sequential: {:.3f}s, batched: {:.3f}s ({:.1f}x)'.format(
+        sequential, batched, sequential / batched))
@@ -0,0 +1,180 @@
+"""CSC148 Assignment 1 - Demand Prediction
+
+=== Module Description ===
+When nobody is waiting, PushyPassenger and ShortSighted leave idle elevators
+wherever they were last used. This module contains:
+
+    - DemandEstimator, which keeps an exponentially decaying count of recent
+      arrivals on each floor, separately for each time slot of a repeating
+      period (e.g. the morning rush of every simulated day).
+    - ParkingAlgorithm, a MovingAlgorithm that wraps another one and sends
+      its idle elevators towards the floors with the highest predicted
+      demand.
+
+A Simulation feeds its arrivals to the estimator given by the optional
+'demand_estimator' configuration key.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+from algorithms import Direction, MovingAlgorithm, _direction_to
+from entities import Elevator, Person
+
+# The decayed count below which a floor's count is forgotten.
+FORGET_BELOW = 1e-3
+
+
+class DemandEstimator:
+    """Predicts the arrivals on each floor from the recent ones.
+
+    Every count decays by a factor of <decay> per round. Decay is applied
+    lazily, when a count is next read or updated, so observing a round only
+    costs time proportional to its number of arrivals. Counts that decayed
+    below FORGET_BELOW are forgotten when hot_floors next looks at their
+    slot, so the floors kept per slot do not grow with the length of a run.
+
+    === Attributes ===
+    decay: the factor each count is multiplied by every round.
+    period: the number of rounds after which demand repeats, or None if it
+            does not.
+    slot_length: the number of rounds in each time slot of the period.
+    min_demand: the demand a floor needs to be returned by hot_floors.
+    last_round: the last round observed, or -1 if none was.
+
+    === Representation invariants ===
+    0 < decay < 1
+    period is None or period >= slot_length >= 1
+    min_demand >= 0
+    """
+    decay: float
+    period: Optional[int]
+    slot_length: int
+    min_demand: float
+    last_round: int
+    _counts: Dict[Tuple[int, int], Tuple[float, int]]
+    _floors: Dict[int, Set[int]]
+
+    def __init__(self, half_life: float = 20, period: Optional[int] = None,
+                 slot_length: int = 1, min_demand: float = 0.1) -> None:
+        """Initialize a new estimator whose counts halve every <half_life>
+        rounds.
+
+        Precondition: half_life > 0 and min_demand >= 0
+        """
+        self.decay = 0.5 ** (1 / half_life)
+        self.period = period
+        self.slot_length = slot_length
+        self.min_demand = min_demand
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget every arrival observed."""
+        self.last_round = -1
+        # (slot, floor) -> (count, round the count was last updated)
+        self._counts = {}
+        # slot -> the floors with a count in that slot
+        self._floors = {}
+
+    def observe(self, round_num: int,
+                arrivals: Dict[int, List[Person]]) -> None:
+        """Record the <arrivals> of round <round_num>."""
+        slot = self._slot(round_num)
+        for floor, people in arrivals.items():
+            if len(people) == 0:
+                continue
+            self._counts[(slot, floor)] = (
+                self.demand(round_num, floor) + len(people), round_num)
+            self._floors.setdefault(slot, set()).add(floor)
+        self.last_round = round_num
+
+    def demand(self, round_num: int, floor: int) -> float:
+        """Return the decayed arrival count of <floor> at round <round_num>.
+        """
+        count, updated = self._counts.get((self._slot(round_num), floor),
+                                          (0.0, round_num))
+        return count * self.decay ** (round_num - updated)
+
+    def hot_floors(self, round_num: int, num_floors: int) -> List[int]:
+        """Return up to <num_floors> floors with the highest demand at round
+        <round_num>, highest first, among the floors whose demand is at
+        least min_demand."""
+        slot = self._slot(round_num)
+        floors = self._floors.get(slot, set())
+        demands = {}
+        for floor in list(floors):
+            demand = self.demand(round_num, floor)
+            if demand < FORGET_BELOW:
+                floors.discard(floor)
+                del self._counts[(slot, floor)]
+            elif demand >= self.min_demand:
+                demands[floor] = demand
+        if len(floors) == 0:
+            self._floors.pop(slot, None)
+        ranked = sorted(demands, key=lambda f: -demands[f])
+        return ranked[:num_floors]
+
+    def _slot(self, round_num: int) -> int:
+        """Return the time slot of round <round_num>."""
+        if self.period is None:
+            return 0
+        return (round_num % self.period) // self.slot_length
+
+
+class ParkingAlgorithm(MovingAlgorithm):
+    """A moving algorithm that parks idle elevators near predicted demand.
+
+    Elevators that are empty and that the wrapped algorithm would leave where
+    they are are sent towards the floors with the highest predicted demand
+    for the next round, the closest idle elevator to each hot floor first.
+    Every other elevator moves as the wrapped algorithm decides.
+
+    === Attributes ===
+    algorithm: the moving algorithm for elevators that are not idle.
+    estimator: the demand estimator fed by the simulation.
+    """
+    algorithm: MovingAlgorithm
+    estimator: DemandEstimator
+
+    def __init__(self, algorithm: MovingAlgorithm,
+                 estimator: DemandEstimator) -> None:
+        """Initialize a new parking algorithm around <algorithm>."""
+        self.algorithm = algorithm
+        self.estimator = estimator
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return a list of directions for each elevator to move to according to
+        the ParkingAlgorithm."""
+        targets = self.target_floors(elevators, waiting, max_floor)
+        return [_direction_to(elevator.location, target)
+                for elevator, target in zip(elevators, targets)]
+
+    def move_elevators_batch(self,
+                             elevators: List[Elevator],
+                             waiting: Dict[int, List[Person]],
+                             max_floor: int) -> List[Direction]:
+        """Return the same directions as move_elevators."""
+        return self.move_elevators(elevators, waiting, max_floor)
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the wrapped algorithm's targets, with idle elevators sent
+        to the hot floors."""
+        res = self.algorithm.target_floors(elevators, waiting, max_floor)
+        idle = [i for i, elevator in enumerate(elevators)
+                if len(elevator.passengers) == 0
+                and res[i] == elevator.location]
+        if len(idle) == 0:
+            return res
+        hot = self.estimator.hot_floors(self.estimator.last_round + 1,
+                                        len(idle))
+        for floor in hot:
+            if 1 <= floor <= max_floor:
+                closest = min(idle,
+                              key=lambda i: abs(elevators[i].location - floor))
+                res[closest] = floor
+                idle.remove(closest)
+        return res
@@ -0,0 +1,224 @@
+"""CSC148 Assignment 1 - Destination Dispatch
+
+=== Module Description ===
+In a destination-dispatch building, people enter their target floor when they
+arrive, and are told which elevator to take. This module contains:
+
+    - DestinationDispatcher, which indexes the waiting people by (start floor,
+      target floor) and assigns each such group to one elevator as soon as
+      the group's first person arrives.
+    - DestinationDispatch, a MovingAlgorithm that sends each elevator to its
+      passengers' targets and to the floors of the groups assigned to it.
+
+A Simulation uses destination dispatch when its configuration has a
+'dispatcher' key. Only the people assigned to an elevator board it, so an
+elevator does not stop for people it was not sent to pick up.
+
+Run this module to compare DestinationDispatch with ShortSighted under heavy
+load.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from algorithms import Direction, MovingAlgorithm, _direction_to
+from entities import Elevator, Person
+
+
+class DestinationDispatcher:
+    """Assigns groups of waiting people to elevators.
+
+    Each elevator sweeps up and down the building like a collective elevator:
+    it keeps its heading while it has stops ahead of it. A new group is
+    assigned to the elevator that reaches its start floor soonest along that
+    sweep, counting the people already on or assigned to each elevator.
+
+    === Attributes ===
+    groups: the waiting people, by (start floor, target floor).
+    assignments: the index of the elevator assigned to each group in groups.
+    headings: the direction each elevator is sweeping in (1 for up, -1 for
+              down, 0 for idle).
+
+    === Representation invariants ===
+    groups and assignments have the same keys.
+    Every list in groups is non-empty.
+    """
+    groups: Dict[Tuple[int, int], List[Person]]
+    assignments: Dict[Tuple[int, int], int]
+    headings: List[int]
+
+    def __init__(self) -> None:
+        """Initialize a new dispatcher with nobody waiting."""
+        self.groups = {}
+        self.assignments = {}
+        self.headings = []
+
+    def clear(self) -> None:
+        """Forget everyone waiting and every heading."""
+        self.groups.clear()
+        self.assignments.clear()
+        self.headings.clear()
+
+    def register(self, people: List[Person],
+                 elevators: List[Elevator]) -> None:
+        """Record the arrival of <people>, assigning an elevator to each new
+        (start, target) group."""
+        for person in people:
+            key = (person.start, person.target)
+            if key in self.groups:
+                self.groups[key].append(person)
+            else:
+                self.groups[key] = [person]
+                self.assignments[key] = self._choose(key, elevators)
+
+    def assigned_to(self, person: Person) -> Optional[int]:
+        """Return the index of the elevator <person> should board."""
+        return self.assignments.get((person.start, person.target))
+
+    def board(self, person: Person) -> None:
+        """Record that <person> boarded their assigned elevator."""
+        key = (person.start, person.target)
+        group = self.groups[key]
+        group.remove(person)
+        if len(group) == 0:
+            del self.groups[key]
+            del self.assignments[key]
+
+    def reassign_left_behind(self, elevators: List[Elevator]) -> None:
+        """Assign a new elevator to every group that is still waiting on the
+        floor of its elevator after boarding, because the elevator is full.
+        """
+        for key, index in list(self.assignments.items()):
+            elevator = elevators[index]
+            if elevator.location == key[0] \
+                    and elevator.remaining_capacity() <= 0:
+                self.assignments[key] = self._choose(key, elevators, index)
+
+    def stops(self, num_elevators: int) -> List[List[int]]:
+        """Return the start floors of the groups assigned to each of the
+        <num_elevators> elevators."""
+        res = [[] for _ in range(num_elevators)]
+        for key, index in self.assignments.items():
+            res[index].append(key[0])
+        return res
+
+    def heading(self, index: int) -> int:
+        """Return the direction elevator <index> is sweeping in."""
+        if index < len(self.headings):
+            return self.headings[index]
+        return 0
+
+    def _choose(self, key: Tuple[int, int], elevators: List[Elevator],
+                exclude: Optional[int] = None) -> int:
+        """Return the index of the elevator that should serve group <key>."""
+        # the room each elevator has left once the groups assigned to it
+        # board
+        room = [elevator.remaining_capacity() for elevator in elevators]
+        for group_key, index in self.assignments.items():
+            room[index] -= len(self.groups[group_key])
+        best = None
+        best_cost = None
+        for index, elevator in enumerate(elevators):
+            if index == exclude and len(elevators) > 1:
+                continue
+            cost = self._sweep_distance(index, elevator, key[0]) \
+                + 1 - room[index] / elevator.capacity
+            if best_cost is None or cost < best_cost:
+                best = index
+                best_cost = cost
+        return best
+
+    def _sweep_distance(self, index: int, elevator: Elevator,
+                        floor: int) -> int:
+        """Return how many floors <elevator> travels to reach <floor> if it
+        finishes its current sweep first."""
+        location = elevator.location
+        heading = self.heading(index)
+        if heading == 0 or (floor - location) * heading >= 0:
+            if elevator.remaining_capacity() > 0 or floor != location:
+                return abs(floor - location)
+        # Finish the sweep at the furthest passenger target, then come back.
+        furthest = location
+        for passenger in elevator.passengers:
+            if (passenger.target - furthest) * heading > 0:
+                furthest = passenger.target
+        return abs(furthest - location) + abs(furthest - floor)
+
+
+class DestinationDispatch(MovingAlgorithm):
+    """A moving algorithm that follows a DestinationDispatcher's assignments.
+
+    Each elevator keeps moving in the direction it is sweeping in while it
+    has a stop ahead of it: a passenger's target, or the start floor of a
+    group assigned to it (full elevators only count their passengers'
+    targets). Otherwise it turns around towards its closest stop, or stays
+    still if there are none.
+
+    === Attributes ===
+    dispatcher: the dispatcher whose assignments are followed.
+    """
+    dispatcher: DestinationDispatcher
+
+    def __init__(self, dispatcher: DestinationDispatcher) -> None:
+        """Initialize a new algorithm following <dispatcher>."""
+        self.dispatcher = dispatcher
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return a list of directions for each elevator to move to according to
+        the DestinationDispatch algorithm."""
+        targets = self.target_floors(elevators, waiting, max_floor)
+        return [_direction_to(elevator.location, target)
+                for elevator, target in zip(elevators, targets)]
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the next stop of each elevator along its sweep, and update
+        the dispatcher's headings."""
+        assigned = self.dispatcher.stops(len(elevators))
+        headings = self.dispatcher.headings
+        while len(headings) < len(elevators):
+            headings.append(0)
+        res = []
+        for index, elevator in enumerate(elevators):
+            location = elevator.location
+            stops = assigned[index]
+            if elevator.remaining_capacity() <= 0:
+                stops = []
+            stops.extend(p.target for p in elevator.passengers)
+            ahead = [f for f in stops
+                     if (f - location) * headings[index] > 0]
+            if len(ahead) != 0:
+                target = min(ahead, key=lambda f: abs(f - location))
+            elif len(stops) != 0:
+                target = min(stops, key=lambda f: (abs(f - location), f))
+            else:
+                target = location
+            headings[index] = (target > location) - (target < location)
+            res.append(target)
+        return res
+
+
+if __name__ == '__main__':
+    import random
+    from algorithms import RandomArrivals, ShortSighted
+    from simulation import Simulation
+
+    for name in ['ShortSighted', 'DestinationDispatch']:
+        random.seed(148)
+        config = {
+            'num_floors': 20,
+            'num_elevators': 4,
+            'elevator_capacity': 8,
+            'num_people_per_round': 3,
+            'arrival_generator': RandomArrivals(20, 3),
+            'moving_algorithm': ShortSighted(),
+            'visualize': False
+        }
+        if name == 'DestinationDispatch':
+            config['dispatcher'] = DestinationDispatcher()
+            config['moving_algorithm'] = DestinationDispatch(
+                config['dispatcher'])
+        print(name, Simulation(config).run(500))
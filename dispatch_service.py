@@ -0,0 +1,448 @@
+"""CSC148 Assignment 1 - Dispatch Service
+
+=== Module Description ===
+This module runs the moving algorithms from algorithms.py as a live
+dispatcher. A long-running local HTTP server keeps the state of each building
+(elevator positions, passengers and hall calls) in memory, and answers each
+decision request with the list of directions returned by the building's
+MovingAlgorithm.
+
+Requests that arrive while a decision is being computed are queued and handled
+together in the next batch, by a single dispatcher thread. The requests of a
+batch are handled in the order they arrived: each one updates its building
+and is answered with the decision for the state it left the building in, so
+two requests for the same building in one batch each get their own answer.
+
+A request whose body is not a JSON object, or that does not fit its building,
+is answered with status 400 and an error message.
+
+Endpoints (all bodies are JSON):
+    POST /buildings/<name>         create or reset a building
+        {"max_floor": 10, "num_elevators": 2, "elevator_capacity": 4,
+         "moving_algorithm": "ShortSighted"}
+    POST /buildings/<name>/decide  update the building and get directions
+        {"elevators": [{"location": 3, "targets": [5, 7]}, ...],
+         "new_calls": [[start, target], ...],
+         "boarded": [[floor, num_people], ...]}
+        -> {"directions": [1, 0, -1, ...]}
+    GET /stats                     decision latency percentiles
+
+Run `python dispatch_service.py serve` to start the server, and
+`python dispatch_service.py load` to run the load generator against it.
+"""
+import argparse
+from collections import deque
+import http.client
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import algorithms
+from entities import Elevator, Person
+from registry import build_moving_algorithm
+
+# The number of most recent decision latencies kept for the percentiles.
+LATENCY_WINDOW = 10000
+
+# The number of seconds a caller waits for a decision before giving up.
+DECISION_TIMEOUT = 10.0
+
+# The HTTP status of each error that is not caused by a malformed request.
+_ERROR_STATUS = {'unknown building': 404, 'dispatcher stopped': 503,
+                 'timed out': 504}
+
+
+class BuildingState:
+    """The in-memory state of one building served by the dispatcher.
+
+    The waiting dictionary is kept between requests and only updated with the
+    hall calls and boardings reported in each request, instead of being
+    rebuilt from scratch.
+
+    === Attributes ===
+    max_floor: the maximum floor number of the building.
+    elevators: the elevators of the building.
+    waiting: a dictionary of people waiting for an elevator.
+             (keys are floor numbers, values are the list of waiting people)
+    moving_algorithm: the algorithm used to decide how to move elevators.
+
+    === Representation invariants ===
+    max_floor >= 2
+    len(elevators) >= 1
+    every elevator has a capacity >= 1
+    """
+    max_floor: int
+    elevators: List[Elevator]
+    waiting: Dict[int, List[Person]]
+    moving_algorithm: algorithms.MovingAlgorithm
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """Initialize a new building from the given configuration.
+
+        Raise ValueError if the building has fewer than two floors, no
+        elevators or elevators that cannot carry anyone, or if its moving
+        algorithm only works inside a Simulation, which keeps state the
+        dispatcher does not have.
+        """
+        for key, minimum in [('max_floor', 2), ('num_elevators', 1),
+                             ('elevator_capacity', 1)]:
+            value = config.get(key)
+            if not isinstance(value, int) or isinstance(value, bool) \
+                    or value < minimum:
+                raise ValueError('{} must be an integer of at least {}, '
+                                 'not {!r}'.format(key, minimum, value))
+        self.max_floor = config['max_floor']
+        self.elevators = []
+        for _ in range(config['num_elevators']):
+            self.elevators.append(Elevator(config['elevator_capacity']))
+        self.waiting = {}
+        for floor in range(1, self.max_floor + 1):
+            self.waiting[floor] = []
+        algorithm = config.get('moving_algorithm', 'ShortSighted')
+        self.moving_algorithm = build_moving_algorithm(
+            algorithm, dict(config), in_simulation=False)
+
+    def update(self, request: Dict[str, Any]) -> None:
+        """Apply the elevator positions, new hall calls and boardings
+        reported in <request> to this building.
+
+        Raise ValueError, without changing anything, if <request> names a
+        floor outside the building or is otherwise malformed.
+        """
+        self._validate(request)
+        for start, target in request.get('new_calls', []):
+            self.waiting[start].append(Person(start, target))
+        for floor, num_people in request.get('boarded', []):
+            del self.waiting[floor][:num_people]
+        reported = request.get('elevators', [])
+        for elevator, state in zip(self.elevators, reported):
+            elevator.location = state['location']
+            targets = state.get('targets', [])
+            if [p.target for p in elevator.passengers] != targets:
+                elevator.passengers = [Person(elevator.location, target)
+                                       for target in targets]
+
+    def _validate(self, request: Dict[str, Any]) -> None:
+        """Raise ValueError if <request> cannot be applied to this
+        building."""
+        try:
+            floors = []
+            for start, target in request.get('new_calls', []):
+                floors.extend([start, target])
+            for floor, num_people in request.get('boarded', []):
+                floors.append(floor)
+                if not isinstance(num_people, int) or num_people < 0:
+                    raise ValueError('invalid number of people boarded: '
+                                     '{!r}'.format(num_people))
+            reported = request.get('elevators', [])
+            if len(reported) > len(self.elevators):
+                raise ValueError('too many elevators reported')
+            for state in reported:
+                floors.append(state['location'])
+                floors.extend(state.get('targets', []))
+        except (TypeError, KeyError, AttributeError) as error:
+            raise ValueError('malformed request: {!r}'.format(error))
+        for floor in floors:
+            if not isinstance(floor, int) or not 1 <= floor <= self.max_floor:
+                raise ValueError('floor out of range: {!r}'.format(floor))
+
+    def decide(self) -> List[int]:
+        """Return the direction values chosen by this building's moving
+        algorithm for its current state.
+        """
+        directions = self.moving_algorithm.move_elevators(self.elevators,
+                                                          self.waiting,
+                                                          self.max_floor)
+        return [direction.value for direction in directions]
+
+
+class _PendingDecision:
+    """A decision request waiting to be handled by the dispatcher thread."""
+    building: str
+    request: Dict[str, Any]
+    created: float
+    done: threading.Event
+    result: Optional[Dict[str, Any]]
+
+    def __init__(self, building: str, request: Dict[str, Any]) -> None:
+        self.building = building
+        self.request = request
+        self.created = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+
+
+class Dispatcher:
+    """Owns every building and computes decisions in batches on one thread.
+
+    === Attributes ===
+    buildings: the buildings served, by name.
+    latencies: the most recent decision latencies, in seconds.
+    """
+    buildings: Dict[str, BuildingState]
+    latencies: Deque[float]
+    _pending: List[_PendingDecision]
+    _lock: threading.Condition
+    _stopped: bool
+
+    def __init__(self) -> None:
+        self.buildings = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._pending = []
+        self._lock = threading.Condition()
+        self._stopped = False
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def create(self, name: str, config: Dict[str, Any]) -> None:
+        """Create (or reset) the building called <name>.
+
+        Raise ValueError if <config> cannot be served.
+        """
+        building = BuildingState(config)
+        with self._lock:
+            self.buildings[name] = building
+
+    def decide(self, name: str, request: Dict[str, Any],
+               timeout: Optional[float] = DECISION_TIMEOUT
+               ) -> Dict[str, Any]:
+        """Queue a decision request for the building called <name> and block
+        until it has been answered, or for at most <timeout> seconds.
+
+        A request that cannot be answered gets a result with an 'error'.
+        """
+        pending = _PendingDecision(name, request)
+        with self._lock:
+            if self._stopped:
+                return {'error': 'dispatcher stopped'}
+            self._pending.append(pending)
+            self._lock.notify()
+        if not pending.done.wait(timeout):
+            return {'error': 'timed out'}
+        return pending.result
+
+    def stop(self) -> None:
+        """Stop the dispatcher thread, answering the requests it has not
+        handled yet with an error."""
+        with self._lock:
+            self._stopped = True
+            abandoned, self._pending = self._pending, []
+            self._lock.notify()
+        for pending in abandoned:
+            pending.result = {'error': 'dispatcher stopped'}
+            pending.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the p50 and p99 decision latencies in milliseconds."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) == 0:
+            return {'decisions': 0, 'p50_ms': None, 'p99_ms': None}
+        return {
+            'decisions': len(samples),
+            'p50_ms': 1000 * samples[int(0.50 * (len(samples) - 1))],
+            'p99_ms': 1000 * samples[int(0.99 * (len(samples) - 1))]
+        }
+
+    def _loop(self) -> None:
+        """Handle the pending requests in batches until stopped."""
+        while True:
+            with self._lock:
+                while len(self._pending) == 0 and not self._stopped:
+                    self._lock.wait()
+                if self._stopped:
+                    return
+                batch, self._pending = self._pending, []
+            self._handle_batch(batch)
+
+    def _handle_batch(self, batch: List[_PendingDecision]) -> None:
+        """Handle the requests in <batch> in order: apply each update, and
+        answer it with the decision for the state it leaves its building in.
+
+        A request that fails is answered with its error, and the others are
+        still handled.
+        """
+        for pending in batch:
+            building = self.buildings.get(pending.building)
+            if building is None:
+                pending.result = {'error': 'unknown building'}
+                pending.done.set()
+                continue
+            try:
+                building.update(pending.request)
+            except Exception as error:
+                pending.result = {'error': str(error)}
+                pending.done.set()
+                continue
+            try:
+                pending.result = {'directions': building.decide()}
+            except Exception as error:
+                pending.result = {
+                    'error': 'decision failed: {!r}'.format(error)}
+            with self._lock:
+                self.latencies.append(time.perf_counter() - pending.created)
+            pending.done.set()
+
+
+class _DispatchHandler(BaseHTTPRequestHandler):
+    """Routes the HTTP endpoints to the server's Dispatcher."""
+    server: 'DispatchServer'
+
+    def do_GET(self) -> None:
+        """Answer GET /stats."""
+        if self.path == '/stats':
+            self._reply(200, self.server.dispatcher.stats())
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        """Answer POST /buildings/<name> and POST /buildings/<name>/decide."""
+        parts = self.path.strip('/').split('/')
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as error:
+            self._reply(400, {'error': 'malformed JSON: {}'.format(error)})
+            return
+        if not isinstance(body, dict):
+            self._reply(400, {'error': 'the body must be a JSON object'})
+            return
+        dispatcher = self.server.dispatcher
+        if len(parts) == 2 and parts[0] == 'buildings':
+            try:
+                dispatcher.create(parts[1], body)
+            except (ValueError, KeyError, TypeError) as error:
+                self._reply(400, {'error': str(error)})
+            else:
+                self._reply(200, {'created': parts[1]})
+        elif len(parts) == 3 and parts[0] == 'buildings' \
+                and parts[2] == 'decide':
+            result = dispatcher.decide(parts[1], body)
+            if 'error' in result:
+                self._reply(_ERROR_STATUS.get(result['error'], 400), result)
+            else:
+                self._reply(200, result)
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def log_message(self, *args: Any) -> None:
+        """Do not log every request."""
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class DispatchServer(ThreadingHTTPServer):
+    """A local HTTP server answering dispatch decisions.
+
+    === Attributes ===
+    dispatcher: the dispatcher holding every building's state.
+    """
+    dispatcher: Dispatcher
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int]) -> None:
+        ThreadingHTTPServer.__init__(self, address, _DispatchHandler)
+        self.dispatcher = Dispatcher()
+
+    def server_close(self) -> None:
+        """Stop the dispatcher along with the server."""
+        ThreadingHTTPServer.server_close(self)
+        self.dispatcher.stop()
+
+
+###############################################################################
+# Load generator
+###############################################################################
+def _post(conn: http.client.HTTPConnection, path: str,
+          body: Dict[str, Any]) -> Dict[str, Any]:
+    conn.request('POST', path, json.dumps(body),
+                 {'Content-Type': 'application/json'})
+    return json.loads(conn.getresponse().read())
+
+
+def run_load(host: str, port: int, num_requests: int, concurrency: int,
+             max_floor: int = 20, num_elevators: int = 4) -> Dict[str, Any]:
+    """Drive the dispatch server at <host>:<port> with <concurrency> client
+    threads, each sending <num_requests> decision requests for its own
+    building, and return the server's latency stats along with the
+    client-side throughput.
+
+    Each client moves its building's elevators and passengers the way a
+    simulation would, using the directions it gets back.
+    """
+    conn = http.client.HTTPConnection(host, port)
+    for b in range(concurrency):
+        _post(conn, '/buildings/b{}'.format(b),
+              {'max_floor': max_floor, 'num_elevators': num_elevators,
+               'elevator_capacity': 4, 'moving_algorithm': 'ShortSighted'})
+    conn.close()
+
+    def client(index: int) -> None:
+        rng = random.Random(index)
+        client_conn = http.client.HTTPConnection(host, port)
+        path = '/buildings/b{}/decide'.format(index)
+        locations = [1] * num_elevators
+        passengers = [[] for _ in range(num_elevators)]
+        waiting = {floor: [] for floor in range(1, max_floor + 1)}
+        for _ in range(num_requests):
+            calls = []
+            for _ in range(rng.randint(0, 2)):
+                start, target = rng.sample(range(1, max_floor + 1), 2)
+                calls.append([start, target])
+                waiting[start].append(target)
+            boarded = []
+            for i, loc in enumerate(locations):
+                passengers[i] = [t for t in passengers[i] if t != loc]
+                num_boarding = min(4 - len(passengers[i]), len(waiting[loc]))
+                passengers[i].extend(waiting[loc][:num_boarding])
+                del waiting[loc][:num_boarding]
+                boarded.append([loc, num_boarding])
+            request = {
+                'elevators': [{'location': loc, 'targets': targets}
+                              for loc, targets in zip(locations, passengers)],
+                'new_calls': calls,
+                'boarded': boarded
+            }
+            result = _post(client_conn, path, request)
+            locations = [loc + d for loc, d
+                         in zip(locations, result['directions'])]
+        client_conn.close()
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    conn = http.client.HTTPConnection(host, port)
+    conn.request('GET', '/stats')
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    stats['requests_per_second'] = concurrency * num_requests / elapsed
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run the dispatch server or its load generator.')
+    parser.add_argument('mode', choices=['serve', 'load'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8148)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+    if args.mode == 'serve':
+        DispatchServer((args.host, args.port)).serve_forever()
+    else:
+        print(run_load(args.host, args.port, args.requests, args.concurrency))
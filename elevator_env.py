@@ -0,0 +1,227 @@
+"""CSC148 Assignment 1 - Learning Environment
+
+=== Module Description ===
+This module wraps Simulation in a gym-style environment for training dispatch
+policies:
+
+    - ElevatorEnv: reset() starts a new episode and returns the first
+      observation; step(actions) takes one Direction per elevator and returns
+      (observation, reward, done, info).
+    - VectorElevatorEnv: steps many ElevatorEnvs in one call, starting a new
+      episode in each one as soon as its episode ends.
+    - PolicyAlgorithm: a MovingAlgorithm that runs a trained policy (a
+      function from observation to directions) inside a normal Simulation.
+
+An observation is a flat list of ints, built the same way in all three:
+    [people waiting on floor f, for each floor f]
+    + [location of elevator e, for each elevator e]
+    + [number of passengers on elevator e, for each elevator e]
+    + [number of passengers heading to floor f, for each floor f]
+
+The reward of a step is minus the number of people who were waiting or riding
+during it, i.e. minus the wait time added by that round, so maximizing the
+total reward minimizes the total wait time.
+
+Resetting an environment reuses its simulation's elevators, waiting lists and
+observation list instead of building new ones. The list returned as the
+observation is overwritten by the next step; copy it to keep it.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from algorithms import Direction, MovingAlgorithm
+from entities import Elevator, Person
+from simulation import Simulation
+
+# A policy maps an observation to one direction per elevator.
+Policy = Callable[[List[int]], List[Direction]]
+
+
+def observe(elevators: List[Elevator], waiting: Dict[int, List[Person]],
+            num_floors: int, out: Optional[List[int]] = None) -> List[int]:
+    """Return the observation of the given state, written into <out> if it is
+    given (it must then have the right length)."""
+    size = 2 * num_floors + 2 * len(elevators)
+    if out is None:
+        out = [0] * size
+    for floor in range(1, num_floors + 1):
+        out[floor - 1] = len(waiting[floor])
+        out[num_floors + 2 * len(elevators) + floor - 1] = 0
+    base = num_floors
+    for e, elevator in enumerate(elevators):
+        out[base + e] = elevator.location
+        out[base + len(elevators) + e] = len(elevator.passengers)
+    base = num_floors + 2 * len(elevators) - 1
+    for elevator in elevators:
+        for passenger in elevator.passengers:
+            if 1 <= passenger.target <= num_floors:
+                out[base + passenger.target] += 1
+    return out
+
+
+class _ActionAlgorithm(MovingAlgorithm):
+    """Moves the elevators in the directions given to the last step."""
+    actions: List[Direction]
+
+    def __init__(self) -> None:
+        """Initialize a new algorithm with no actions."""
+        self.actions = []
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return the last actions, with moves past the first or top floor
+        replaced by Direction.STAY."""
+        res = []
+        for elevator, action in zip(elevators, self.actions):
+            action = Direction(action)
+            if (action == Direction.DOWN and elevator.location == 1) or \
+                    (action == Direction.UP and elevator.location == max_floor):
+                action = Direction.STAY
+            res.append(action)
+        return res
+
+
+class ElevatorEnv:
+    """A gym-style environment in which a policy moves the elevators.
+
+    === Attributes ===
+    simulation: the simulation being controlled.
+    max_rounds: the number of rounds in an episode.
+    round_num: the round the next step will finish.
+
+    === Representation invariants ===
+    max_rounds >= 1
+    """
+    simulation: Simulation
+    max_rounds: int
+    round_num: int
+    _actions: _ActionAlgorithm
+    _observation: List[int]
+
+    def __init__(self, config: Dict[str, Any], max_rounds: int) -> None:
+        """Initialize a new environment for the simulation configuration
+        <config>, whose moving algorithm is ignored."""
+        config = dict(config)
+        config['visualize'] = False
+        self._actions = _ActionAlgorithm()
+        config['moving_algorithm'] = self._actions
+        self.simulation = Simulation(config)
+        self.max_rounds = max_rounds
+        self.round_num = 0
+        self._observation = observe(self.simulation.elevators,
+                                    self.simulation.waiting,
+                                    self.simulation.num_floors)
+
+    def reset(self) -> List[int]:
+        """Start a new episode and return its first observation."""
+        self.simulation.reset()
+        self.round_num = 0
+        self._begin_round()
+        return self._observation
+
+    def step(self, actions: List[Direction]
+             ) -> Tuple[List[int], float, bool, Dict[str, Any]]:
+        """Move each elevator in the direction given by <actions> and run
+        the simulation until the next decision.
+
+        Return the next observation, the reward, whether the episode is over,
+        and (once it is over) the statistics of the episode under 'stats'.
+        """
+        sim = self.simulation
+        self._actions.actions = actions
+        sim.end_round()
+        reward = -self._num_people_in_system()
+        self.round_num = sim.rounds_run
+        done = self.round_num >= self.max_rounds
+        info = {}
+        if done:
+            info['stats'] = sim.stats()
+        else:
+            self._begin_round()
+        return self._observation, reward, done, info
+
+    def _begin_round(self) -> None:
+        """Run the stages of the current round before the elevators move,
+        and update the observation."""
+        sim = self.simulation
+        sim.begin_round()
+        observe(sim.elevators, sim.waiting, sim.num_floors, self._observation)
+
+    def _num_people_in_system(self) -> int:
+        """Return the number of people waiting or riding."""
+        sim = self.simulation
+        total = sim.waiting.total
+        for elevator in sim.elevators:
+            total += len(elevator.passengers)
+        return total
+
+
+class VectorElevatorEnv:
+    """Many ElevatorEnvs stepped together.
+
+    === Attributes ===
+    envs: the environments.
+    """
+    envs: List[ElevatorEnv]
+
+    def __init__(self, envs: List[ElevatorEnv]) -> None:
+        """Initialize a vector of the given environments."""
+        self.envs = envs
+
+    def reset(self) -> List[List[int]]:
+        """Start a new episode in every environment and return the first
+        observations."""
+        return [env.reset() for env in self.envs]
+
+    def step(self, actions: List[List[Direction]]
+             ) -> Tuple[List[List[int]], List[float], List[bool],
+                        List[Dict[str, Any]]]:
+        """Step environment i with actions[i], and return the observations,
+        rewards, done flags and infos of all of them.
+
+        An environment whose episode ended is reset, and its observation is
+        the first one of its next episode.
+        """
+        observations = []
+        rewards = []
+        dones = []
+        infos = []
+        for env, env_actions in zip(self.envs, actions):
+            observation, reward, done, info = env.step(env_actions)
+            if done:
+                observation = env.reset()
+            observations.append(observation)
+            rewards.append(reward)
+            dones.append(done)
+            infos.append(info)
+        return observations, rewards, dones, infos
+
+
+class PolicyAlgorithm(MovingAlgorithm):
+    """A moving algorithm that asks a policy for the elevators' directions.
+
+    === Attributes ===
+    policy: maps an observation to one direction per elevator.
+    """
+    policy: Policy
+    _observation: Optional[List[int]]
+
+    def __init__(self, policy: Policy) -> None:
+        """Initialize a new algorithm running <policy>."""
+        self.policy = policy
+        self._observation = None
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return the policy's directions for the current state, with moves
+        past the first or top floor replaced by Direction.STAY."""
+        size = 2 * max_floor + 2 * len(elevators)
+        if self._observation is None or len(self._observation) != size:
+            self._observation = [0] * size
+        observe(elevators, waiting, max_floor, self._observation)
+        clipper = _ActionAlgorithm()
+        clipper.actions = self.policy(self._observation)
+        return clipper.move_elevators(elevators, waiting, max_floor)
@@ -10,23 +10,26 @@ people and elevators. We have provided basic outlines of these two classes
 for you; you are responsible for implementing these two classes so that they
 work with the rest of the simulation.
 
-You may NOT change any existing attributes, or the interface for any public
-methods we have provided. However, you can (and should) add new attributes,
-and of course you'll have to implement the methods we've provided, as well
-as add your own methods to complete this assignment.
-
-Finally, note that Person and Elevator each inherit from a kind of sprite found
-in sprites.py; this is to enable their instances to be visualized properly.
-You may not change sprites.py, but are responsible for reading the documentation
-to understand these classes, as well as the abstract methods your classes must
-implement.
+The public attributes and methods of Person and Elevator are used throughout
+the simulation, so new ones may be added but existing ones should keep their
+meaning. Their instances are visualized with the sprites found in
+sprites.py, which may not be changed; read its documentation to understand
+the methods the sprites call (such as fullness and get_anger_level).
+
+Importing sprites.py loads pygame, which headless runs do not need, so
+Person and Elevator do not inherit from the sprites themselves. Instead,
+sprite_classes returns subclasses of them that also inherit from the sprites
+of sprites.py, which it imports the first time it is called. Visualized runs
+create their elevators from these classes, and make every arriving person
+drawable in place with make_drawable, so each person stays the same object
+for the whole run.
 """
 from __future__ import annotations
-from typing import List
-from sprites import PersonSprite, ElevatorSprite
+import math
+from typing import List, Optional, Tuple
 
 
-class Elevator(ElevatorSprite):
+class Elevator:
     """An elevator in the elevator simulation.
 
     Remember to add additional documentation to this class docstring
@@ -36,29 +39,158 @@ class Elevator(ElevatorSprite):
     passengers: A list of the people currently on this elevator
     capacity: the maximum number of people this elevator is able to carry
     location: the floor this elevator is currently on
+    speed: the maximum number of floors this elevator moves in one round
+    acceleration: how much this elevator's velocity can grow each round, or
+                  None if it reaches full speed immediately
+    dwell_time: the number of rounds the doors stay open at a stop where
+                people board or leave
+    boarding_time: the number of rounds each person boarding or leaving adds
+                   to a stop
+    velocity: the number of floors this elevator moved in the last round
+    direction: the direction this elevator moved in the last round: 1 for
+               up, -1 for down, or 0 if it did not move
+    hold: the number of rounds this elevator must still stay where it is
 
     === Representation invariants ===
     capacity >= 1
     location >= 1
+    speed >= 1
+    acceleration is None or acceleration >= 1
+    dwell_time >= 0
+    boarding_time >= 0
+    0 <= velocity <= speed
+    direction in (-1, 0, 1), and direction == 0 if velocity == 0
+    hold >= 0
     """
     passengers: List[Person]
     capacity: int
     location: int
+    speed: int
+    acceleration: Optional[int]
+    dwell_time: int
+    boarding_time: float
+    velocity: int
+    direction: int
+    hold: int
+
+    def __init__(self, capacity: int, speed: int = 1,
+                 acceleration: Optional[int] = None, dwell_time: int = 0,
+                 boarding_time: float = 0) -> None:
+        """Initialize a new Elevator.
 
-    def __init__(self, capacity: int) -> None:
-        """Initialize a new Elevator."""
+        With the default speed, acceleration, dwell_time and boarding_time,
+        the elevator moves one floor per round and stops are free.
+        """
         self.passengers = []
         self.capacity = capacity
         self.location = 1
-        ElevatorSprite.__init__(self)
+        self.speed = speed
+        self.acceleration = acceleration
+        self.dwell_time = dwell_time
+        self.boarding_time = boarding_time
+        self.velocity = 0
+        self.direction = 0
+        self.hold = 0
+        super().__init__()
 
     def fullness(self) -> float:
         """Return a float that represents the ratio of number of passengers on
         the elevator and the capacity of the elevator"""
         return float(len(self.passengers) / self.capacity)
 
+    def remaining_capacity(self) -> int:
+        """Return the number of people who can still board this elevator."""
+        return self.capacity - len(self.passengers)
+
+    def stop(self, num_people: int) -> None:
+        """Record that <num_people> boarded or left this elevator at its
+        current floor, and hold it there for the time that takes."""
+        if num_people > 0:
+            rounds = math.ceil(self.dwell_time
+                               + self.boarding_time * num_people)
+            self.hold = max(self.hold, rounds)
+            self.velocity = 0
+            self.direction = 0
+
+    def move_towards(self, floor: int) -> int:
+        """Move this elevator for one round towards <floor>, without passing
+        it, and return the (signed) number of floors it moved.
+
+        The elevator does not move while it is held at a stop. With an
+        acceleration, it starts from rest when it turns around, and slows
+        down in time to stop at <floor> (see _next_velocity).
+        """
+        if self.hold > 0:
+            self.hold -= 1
+            return 0
+        direction = (floor > self.location) - (floor < self.location)
+        step = self._next_velocity(self._velocity_towards(direction),
+                                   abs(floor - self.location))
+        self.velocity = step
+        self.direction = direction if step != 0 else 0
+        self.location += direction * step
+        return direction * step
+
+    def rounds_to(self, floor: int) -> int:
+        """Return the number of rounds this elevator needs to reach <floor>
+        if it heads straight there, including any rounds it is held."""
+        distance = abs(floor - self.location)
+        rounds = self.hold
+        if self.acceleration is None:
+            return rounds + math.ceil(distance / self.speed)
+        direction = (floor > self.location) - (floor < self.location)
+        velocity = self._velocity_towards(direction)
+        while distance > 0:
+            velocity = self._next_velocity(velocity, distance)
+            distance -= velocity
+            rounds += 1
+        return rounds
+
+    def _velocity_towards(self, direction: int) -> int:
+        """Return the velocity this elevator has towards <direction>: its
+        velocity if it last moved that way, and 0 if it has to turn
+        around."""
+        if direction == self.direction:
+            return self.velocity
+        return 0
+
+    def _next_velocity(self, velocity: int, distance: int) -> int:
+        """Return the number of floors this elevator moves in a round that
+        starts at <velocity>, towards a floor <distance> floors away.
+
+        With an acceleration, the velocity changes by at most acceleration
+        per round, and stays low enough to slow down to a stop at the floor:
+        a car can stop after any round where it moves at most acceleration
+        floors. If the floor is too close to stop at from <velocity>, the car
+        brakes harder rather than passing it.
+        """
+        if self.acceleration is None:
+            return min(self.speed, distance)
+        step = min(self.speed, velocity + self.acceleration, distance)
+        while step > self.acceleration \
+                and step + self._braking_distance(step) > distance:
+            step -= 1
+        return step
+
+    def _braking_distance(self, velocity: int) -> int:
+        """Return the number of floors this elevator travels while slowing
+        down to a stop after a round where it moved <velocity> floors."""
+        res = 0
+        velocity -= self.acceleration
+        while velocity > 0:
+            res += velocity
+            velocity -= self.acceleration
+        return res
+
+
+# The wait time at which each anger level starts.
+ANGER_THRESHOLDS = (0, 3, 5, 7, 9)
+
+# The anger level of each wait time below the last threshold.
+_ANGER_LEVELS = (0, 0, 0, 1, 1, 2, 2, 3, 3)
 
-class Person(PersonSprite):
+
+class Person:
     """A person in the elevator simulation.
 
     === Attributes ===
@@ -80,7 +212,7 @@ class Person(PersonSprite):
         self.start = start
         self.target = target
         self.wait_time = 0
-        PersonSprite.__init__(self)
+        super().__init__()
 
     def get_anger_level(self) -> int:
         """Return this person's anger level.
@@ -93,21 +225,56 @@ class Person(PersonSprite):
             - Level 3: waiting 7-8 rounds
             - Level 4: waiting >= 9 rounds
         """
-        if self.wait_time <= 2:
-            return 0
-        elif self.wait_time <= 4:
-            return 1
-        elif self.wait_time <= 6:
-            return 2
-        elif self.wait_time <= 8:
-            return 3
-        else:
-            return 4
+        if self.wait_time < len(_ANGER_LEVELS):
+            return _ANGER_LEVELS[self.wait_time]
+        return len(ANGER_THRESHOLDS) - 1
+
+
+# The sprite versions of Elevator and Person, once sprite_classes made them.
+_sprite_classes: Optional[Tuple[type, type]] = None
+
+
+def sprites_enabled() -> bool:
+    """Return whether the sprite versions of Person and Elevator were made.
+    """
+    return _sprite_classes is not None
+
+
+def sprite_classes() -> Tuple[type, type]:
+    """Return the subclasses of Elevator and Person that are also the
+    sprites of sprites.py, importing sprites.py (and pygame) the first time
+    this is called."""
+    global _sprite_classes
+    if _sprite_classes is None:
+        import sprites
+
+        class ElevatorSprite(Elevator, sprites.ElevatorSprite):
+            """An elevator that can be drawn."""
+
+        class PersonSprite(Person, sprites.PersonSprite):
+            """A person who can be drawn."""
+
+        _sprite_classes = (ElevatorSprite, PersonSprite)
+    return _sprite_classes
+
+
+def make_drawable(person: Person) -> None:
+    """Make <person> a person who can be drawn, in place, so that they keep
+    their identity and attributes.
+
+    Only people whose class is Person are changed: people who can already be
+    drawn, and people of other subclasses of Person, are left as they are.
+    """
+    if type(person) is Person:
+        person.__class__ = sprite_classes()[1]
+        # Initialize the sprite part, as Person.__init__ does for a person
+        # created as a sprite.
+        super(Person, person).__init__()
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['sprites'],
+        'extra-imports': ['sprites', 'math'],
         'max-nested-blocks': 4
     })
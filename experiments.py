@@ -0,0 +1,290 @@
+"""CSC148 Assignment 1 - Experiments
+
+=== Module Description ===
+A single run of a simulation that uses RandomArrivals or RandomAlgorithm is
+just one sample. This module runs many seeded replications of the same
+configuration, in parallel worker processes, and reports the mean and a
+confidence interval of the statistics returned by Simulation.run.
+
+Replications are run in batches, and once a minimum number of replications
+has been run, the runner stops as soon as every confidence interval is
+narrower than a requested width (sequential stopping), or when the maximum
+number of replications has been run.
+
+The configuration is sent to each worker once, when the worker starts, so
+inputs that were already parsed in the parent process (such as the arrivals
+of a FileArrivals) are not parsed again for every run. Each replication runs
+on its own copy of the configuration, so no state kept by an algorithm
+carries over from one replication to the next. The arrival generator is not
+copied: generators only read the arrivals they were built with, so every
+replication shares the parsed arrivals.
+
+The configuration may also be a spec (see registry.py), which is cheaper to
+send: each replication then builds its own algorithms, and each worker parses
+the files the spec names once. The replications of a spec can be stored in a
+ResultCache, so that running them again only reads their results.
+"""
+import copy
+import math
+import multiprocessing
+import random
+from statistics import NormalDist, mean, stdev
+from typing import Any, Dict, List, Optional
+
+from algorithms import ArrivalGenerator
+from registry import build_config
+from result_cache import ResultCache
+from simulation import Simulation
+
+# The statistics that are summarized across replications.
+METRICS = ['avg_time', 'max_time', 'people_completed']
+
+# The number of replications run before the intervals are checked, since the
+# standard deviation of a few replications can be small by chance.
+MIN_REPLICATIONS = 10
+
+# The 0.9, 0.95, 0.975, 0.99 and 0.995 quantiles of Student's t distribution
+# for 1 to 30 degrees of freedom.
+_T_PROBABILITIES = [0.9, 0.95, 0.975, 0.99, 0.995]
+_T_TABLE = [
+    [3.078, 6.314, 12.706, 31.821, 63.657],
+    [1.886, 2.920, 4.303, 6.965, 9.925],
+    [1.638, 2.353, 3.182, 4.541, 5.841],
+    [1.533, 2.132, 2.776, 3.747, 4.604],
+    [1.476, 2.015, 2.571, 3.365, 4.032],
+    [1.440, 1.943, 2.447, 3.143, 3.707],
+    [1.415, 1.895, 2.365, 2.998, 3.499],
+    [1.397, 1.860, 2.306, 2.896, 3.355],
+    [1.383, 1.833, 2.262, 2.821, 3.250],
+    [1.372, 1.812, 2.228, 2.764, 3.169],
+    [1.363, 1.796, 2.201, 2.718, 3.106],
+    [1.356, 1.782, 2.179, 2.681, 3.055],
+    [1.350, 1.771, 2.160, 2.650, 3.012],
+    [1.345, 1.761, 2.145, 2.624, 2.977],
+    [1.341, 1.753, 2.131, 2.602, 2.947],
+    [1.337, 1.746, 2.120, 2.583, 2.921],
+    [1.333, 1.740, 2.110, 2.567, 2.898],
+    [1.330, 1.734, 2.101, 2.552, 2.878],
+    [1.328, 1.729, 2.093, 2.539, 2.861],
+    [1.325, 1.725, 2.086, 2.528, 2.845],
+    [1.323, 1.721, 2.080, 2.518, 2.831],
+    [1.321, 1.717, 2.074, 2.508, 2.819],
+    [1.319, 1.714, 2.069, 2.500, 2.807],
+    [1.318, 1.711, 2.064, 2.492, 2.797],
+    [1.316, 1.708, 2.060, 2.485, 2.787],
+    [1.315, 1.706, 2.056, 2.479, 2.779],
+    [1.314, 1.703, 2.052, 2.473, 2.771],
+    [1.313, 1.701, 2.048, 2.467, 2.763],
+    [1.311, 1.699, 2.045, 2.462, 2.756],
+    [1.310, 1.697, 2.042, 2.457, 2.750]
+]
+
+# The configuration used by the replications of this (worker) process.
+_worker_config = None
+
+
+def run_replication(config: Dict[str, Any], num_rounds: int,
+                    seed: int,
+                    cache: Optional[ResultCache] = None) -> Dict[str, int]:
+    """Run one replication of <config> for <num_rounds> rounds, with the
+    random number generator seeded with <seed>, and return its statistics.
+
+    The replication is never visualized, and runs on a copy of <config>, so
+    the algorithms in <config> are left as they were. <config> may be a
+    spec, which is built after seeding. If <cache> is given, <config> must be
+    a spec, and the statistics are read from or stored in <cache>.
+    """
+    if cache is not None:
+        return cache.run(config, num_rounds, seed)
+    random.seed(seed)
+    config = build_config(_replication_config(config))
+    config['visualize'] = False
+    return Simulation(config).run(num_rounds)
+
+
+def _replication_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of <config> for one replication, which shares the
+    arrival generator of <config>."""
+    generator = config.get('arrival_generator')
+    memo = {}
+    if isinstance(generator, ArrivalGenerator):
+        memo[id(generator)] = generator
+    return copy.deepcopy(config, memo)
+
+
+def confidence_interval(values: List[float],
+                        confidence: float = 0.95) -> Dict[str, float]:
+    """Return the mean of <values> and the half-width of its <confidence>
+    confidence interval, using Student's t distribution.
+
+    Precondition: len(values) >= 1
+    """
+    if len(values) < 2:
+        return {'mean': float(values[0]), 'half_width': math.inf,
+                'n': len(values)}
+    quantile = _t_quantile((1 + confidence) / 2, len(values) - 1)
+    return {
+        'mean': mean(values),
+        'half_width': quantile * stdev(values) / math.sqrt(len(values)),
+        'n': len(values)
+    }
+
+
+def run_replications(config: Dict[str, Any],
+                     num_rounds: int,
+                     max_replications: int = 100,
+                     target_width: Optional[float] = None,
+                     confidence: float = 0.95,
+                     min_replications: int = MIN_REPLICATIONS,
+                     seed: int = 0,
+                     processes: Optional[int] = None,
+                     cache: Optional[ResultCache] = None) -> Dict[str, Any]:
+    """Run seeded replications of <config> and return the confidence interval
+    of each statistic in METRICS.
+
+    Replication i is seeded with <seed> + i, so its result does not depend
+    on which process runs it. Replications are run in batches of <processes>
+    (the number of CPUs by default). If <target_width> is given, the runner
+    stops after the first batch, once at least <min_replications> were run,
+    where every interval is at most <target_width> wide.
+
+    Runs where nobody completed their ride report -1 times; these runs are
+    left out of the avg_time and max_time intervals.
+
+    If <cache> is given, <config> must be a spec, and every replication is
+    read from or stored in <cache>.
+
+    Precondition: max_replications >= 1
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    results = []
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, _init_worker,
+                                    (config, num_rounds, cache))
+    try:
+        while len(results) < max_replications:
+            batch = range(seed + len(results),
+                          seed + min(len(results) + processes,
+                                     max_replications))
+            if pool is None:
+                results.extend(run_replication(config, num_rounds, s, cache)
+                               for s in batch)
+            else:
+                results.extend(pool.map(_run_worker_replication, batch))
+            summary = _summarize(results, confidence)
+            if target_width is not None \
+                    and len(results) >= min_replications \
+                    and _narrow_enough(summary, target_width):
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    summary['replications'] = len(results)
+    summary['stopped_early'] = len(results) < max_replications
+    return summary
+
+
+def _init_worker(config: Dict[str, Any], num_rounds: int,
+                 cache: Optional[ResultCache]) -> None:
+    """Remember the configuration shared by this worker's replications."""
+    global _worker_config
+    _worker_config = (config, num_rounds, cache)
+
+
+def _run_worker_replication(seed: int) -> Dict[str, int]:
+    """Run one replication of this worker's configuration."""
+    config, num_rounds, cache = _worker_config
+    return run_replication(config, num_rounds, seed, cache)
+
+
+def _summarize(results: List[Dict[str, int]],
+               confidence: float) -> Dict[str, Any]:
+    """Return the confidence interval of each metric over <results>."""
+    summary = {}
+    for metric in METRICS:
+        values = [stats[metric] for stats in results
+                  if metric == 'people_completed' or stats[metric] != -1]
+        if len(values) == 0:
+            summary[metric] = {'mean': -1, 'half_width': math.inf, 'n': 0}
+        else:
+            summary[metric] = confidence_interval(values, confidence)
+    return summary
+
+
+def _narrow_enough(summary: Dict[str, Any], target_width: float) -> bool:
+    """Return whether every interval in <summary> is at most <target_width>
+    wide."""
+    return all(2 * summary[metric]['half_width'] <= target_width
+               for metric in METRICS)
+
+
+def _t_quantile(p: float, df: int) -> float:
+    """Return the <p> quantile of Student's t distribution with <df> degrees
+    of freedom.
+
+    For up to 30 degrees of freedom, the quantile is read from _T_TABLE if
+    <p> is in it, and otherwise found by bisection on the exact distribution
+    function. For more, the Cornish-Fisher expansion around the normal
+    quantile is accurate to three decimals.
+
+    Precondition: 0.5 <= p < 1
+    """
+    if df <= len(_T_TABLE):
+        if p in _T_PROBABILITIES:
+            return _T_TABLE[df - 1][_T_PROBABILITIES.index(p)]
+        low, high = 0.0, 1.0
+        while _t_cdf(high, df) < p:
+            low, high = high, 2 * high
+        for _ in range(100):
+            middle = (low + high) / 2
+            if _t_cdf(middle, df) < p:
+                low = middle
+            else:
+                high = middle
+        return (low + high) / 2
+    z = NormalDist().inv_cdf(p)
+    return (z
+            + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z)
+            / (384 * df ** 3))
+
+
+def _t_cdf(t: float, df: int) -> float:
+    """Return the probability that a variable with Student's t distribution
+    with <df> degrees of freedom is at most <t> >= 0, using the finite series
+    for integer degrees of freedom (Abramowitz and Stegun 26.7.3 and 26.7.4).
+    """
+    theta = math.atan(t / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    if df % 2 == 1:
+        term, total = 1.0, 0.0
+        for k in range(1, (df - 1) // 2 + 1):
+            total += term
+            term *= cos2 * 2 * k / (2 * k + 1)
+        inside = 2 / math.pi * (theta + math.sin(theta) * math.cos(theta)
+                                * total)
+    else:
+        term, total = 1.0, 0.0
+        for k in range(1, df // 2 + 1):
+            total += term
+            term *= cos2 * (2 * k - 1) / (2 * k)
+        inside = math.sin(theta) * total
+    return (1 + inside) / 2
+
+
+if __name__ == '__main__':
+    sample_config = {
+        'num_floors': 6,
+        'num_elevators': 6,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': 'RandomArrivals',
+        'moving_algorithm': 'RandomAlgorithm',
+        'visualize': False
+    }
+    print(run_replications(sample_config, 100, max_replications=200,
+                           target_width=1.0))
@@ -0,0 +1,155 @@
+"""CSC148 Assignment 1 - Frame Skipping
+
+=== Module Description ===
+The Visualizer draws every arrival, boarding and disembarking as it happens,
+and Simulation.run waits a second after every round, so long runs cannot be
+watched. FrameSkippingVisualizer wraps a Visualizer and only draws some
+rounds (frames):
+
+    - every render_every-th round, or
+    - whenever 1 / target_fps seconds have passed since the last frame.
+
+Between frames, the simulation runs as fast as it can. At each frame, the
+wrapper forwards only the net changes since the last frame: someone who
+arrived and already left is never drawn, and someone who boarded since the
+last frame is drawn arriving and boarding once. The wrapped visualizer is
+then asked to show the latest elevator moves, and never to wait.
+
+A Simulation uses this wrapper when it is visualized and its configuration
+has the optional 'render_every' or 'target_fps' key.
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+from algorithms import Direction
+from entities import Elevator, Person
+
+# The state of a person who reached their target floor.
+_FINISHED = 'finished'
+# The state of a person waiting on their start floor.
+_WAITING = 'waiting'
+
+
+class FrameSkippingVisualizer:
+    """A visualizer that only draws some rounds of a simulation.
+
+    === Attributes ===
+    visualizer: the visualizer that draws the frames.
+    render_every: draw every render_every-th round, if target_fps is None.
+    target_fps: the number of frames to draw per second, or None.
+    frames: the number of frames drawn so far.
+
+    === Representation invariants ===
+    render_every >= 1
+    target_fps is None or target_fps > 0
+    """
+    visualizer: Any
+    render_every: int
+    target_fps: Optional[float]
+    frames: int
+    _round_num: int
+    _rounds: int
+    _last_frame: float
+    _shown: Dict[Person, Any]
+    _changed: Dict[Person, Any]
+    _rode: Dict[Person, Elevator]
+    _elevators: List[Elevator]
+    _directions: List[Direction]
+
+    def __init__(self, visualizer: Any, render_every: int = 1,
+                 target_fps: Optional[float] = None) -> None:
+        """Initialize a new wrapper around <visualizer>."""
+        self.visualizer = visualizer
+        self.render_every = render_every
+        self.target_fps = target_fps
+        self.frames = 0
+        self._round_num = 0
+        self._rounds = 0
+        self._last_frame = time.perf_counter()
+        # the state the wrapped visualizer is showing for each person:
+        # _WAITING or the elevator they are on
+        self._shown = {}
+        # the current state of each person whose state changed since the
+        # last frame: _WAITING, _FINISHED or their elevator
+        self._changed = {}
+        # the elevator each person who changed state since the last frame
+        # boarded
+        self._rode = {}
+        self._elevators = []
+        self._directions = []
+
+    def render_header(self, round_num: int) -> None:
+        """Remember the round being simulated."""
+        self._round_num = round_num
+
+    def show_arrivals(self, arrivals: Dict[int, List[Person]]) -> None:
+        """Remember the new arrivals."""
+        for people in arrivals.values():
+            for person in people:
+                self._changed[person] = _WAITING
+
+    def show_boarding(self, person: Person, elevator: Elevator) -> None:
+        """Remember that <person> boarded <elevator>."""
+        self._changed[person] = elevator
+        self._rode[person] = elevator
+
+    def show_disembarking(self, person: Person, elevator: Elevator) -> None:
+        """Remember that <person> left <elevator>."""
+        self._changed[person] = _FINISHED
+        self._rode[person] = elevator
+
+    def show_elevator_moves(self, elevators: List[Elevator],
+                            directions: List[Direction]) -> None:
+        """Remember the latest elevator moves."""
+        self._elevators = elevators
+        self._directions = directions
+
+    def wait(self, duration: float) -> None:
+        """Draw a frame if one is due, without waiting <duration>."""
+        self._rounds += 1
+        if self.target_fps is not None:
+            due = time.perf_counter() - self._last_frame \
+                >= 1 / self.target_fps
+        else:
+            due = self._rounds % self.render_every == 0
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Draw a frame showing the latest state."""
+        arrivals = {}
+        boardings = []
+        early_leavers = []
+        late_leavers = []
+        for person, state in self._changed.items():
+            before = self._shown.get(person)
+            if before is None:
+                if state == _FINISHED:
+                    continue
+                arrivals.setdefault(person.start, []).append(person)
+                before = _WAITING
+            if before == _WAITING and state != _WAITING:
+                boardings.append((person, self._rode[person]))
+                if state == _FINISHED:
+                    late_leavers.append((person, self._rode[person]))
+            elif before != _WAITING and state == _FINISHED:
+                early_leavers.append((person, before))
+            if state == _FINISHED:
+                self._shown.pop(person, None)
+            else:
+                self._shown[person] = state
+        visualizer = self.visualizer
+        visualizer.render_header(self._round_num)
+        visualizer.show_arrivals(arrivals)
+        for person, elevator in early_leavers:
+            visualizer.show_disembarking(person, elevator)
+        for person, elevator in boardings:
+            visualizer.show_boarding(person, elevator)
+        for person, elevator in late_leavers:
+            visualizer.show_disembarking(person, elevator)
+        visualizer.show_elevator_moves(self._elevators, self._directions)
+        visualizer.wait(0)
+        self._changed.clear()
+        self._rode.clear()
+        self.frames += 1
+        self._last_frame = time.perf_counter()
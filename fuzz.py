@@ -0,0 +1,391 @@
+"""CSC148 Assignment 1 - Differential Fuzzing
+
+=== Module Description ===
+Every faster way of running a simulation must behave exactly like
+Simulation.run with PushyPassenger or ShortSighted. This module generates
+random cases (a building, an algorithm and an arrival trace), runs each case
+on the reference Simulation and on every engine in ENGINES, and compares the
+state after every round (elevator locations, passenger targets and the
+targets of the people waiting on each floor) and the final statistics.
+
+The reference Simulation runs one round at a time and gets its directions
+from the algorithm's move_elevators, the per-elevator reference
+implementation, instead of the batched move_elevators_batch that every
+Simulation calls otherwise. Cases include people whose target is the floor
+they arrive on, who board and leave an elevator without it moving.
+
+When a case fails, it is shrunk: rounds, arrivals, elevators, floors and
+capacity are removed one at a time for as long as the case still fails, so
+the counterexample reported is small enough to debug by hand.
+
+Cases are checked in parallel worker processes. Case i of a run with seed s
+is generated from seed s + i, so any failure can be reproduced from its seed
+with random_case.
+
+Run this module to fuzz every engine:
+    python fuzz.py --cases 5000 --seed 0
+"""
+import multiprocessing
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from algorithms import ArrivalGenerator, CachedAlgorithm, Direction, \
+    FileArrivals, MovingAlgorithm, PushyPassenger, ShortSighted
+from entities import Elevator, Person
+from batch_simulation import BatchSimulation
+from simulation import Simulation
+
+# The elevator locations, the passengers' targets in each elevator, and the
+# targets of the people waiting on each non-empty floor (in floor order).
+Snapshot = Tuple[Tuple[int, ...], Tuple[Tuple[int, ...], ...],
+                 Tuple[Tuple[int, Tuple[int, ...]], ...]]
+
+# The snapshot after every round, and the final statistics.
+Trace = Tuple[List[Snapshot], Dict[str, int]]
+
+_ALGORITHMS = {'PushyPassenger': PushyPassenger,
+               'ShortSighted': ShortSighted}
+
+
+class Case:
+    """A simulation to run on every engine.
+
+    === Attributes ===
+    num_floors: the number of floors.
+    num_elevators: the number of elevators.
+    capacity: the capacity of each elevator.
+    algorithm: the name of the moving algorithm.
+    num_rounds: the number of rounds to run.
+    arrivals: the (start, target) floors of the people arriving in each
+              round that has arrivals.
+
+    === Representation invariants ===
+    num_floors >= 2
+    num_elevators >= 1
+    capacity >= 1
+    num_rounds >= 1
+    Every start and target is between 1 and num_floors.
+    """
+    num_floors: int
+    num_elevators: int
+    capacity: int
+    algorithm: str
+    num_rounds: int
+    arrivals: Dict[int, List[Tuple[int, int]]]
+
+    def __init__(self, num_floors: int, num_elevators: int, capacity: int,
+                 algorithm: str, num_rounds: int,
+                 arrivals: Dict[int, List[Tuple[int, int]]]) -> None:
+        """Initialize a new case."""
+        self.num_floors = num_floors
+        self.num_elevators = num_elevators
+        self.capacity = capacity
+        self.algorithm = algorithm
+        self.num_rounds = num_rounds
+        self.arrivals = arrivals
+
+    def __repr__(self) -> str:
+        """Return a string that rebuilds this case."""
+        return 'Case({}, {}, {}, {!r}, {}, {!r})'.format(
+            self.num_floors, self.num_elevators, self.capacity,
+            self.algorithm, self.num_rounds, self.arrivals)
+
+    def num_people(self) -> int:
+        """Return the number of people who arrive in this case."""
+        return sum(len(people) for people in self.arrivals.values())
+
+    def replace(self, **changes: Any) -> 'Case':
+        """Return a copy of this case with the attributes in <changes>."""
+        fields = dict(vars(self))
+        fields.update(changes)
+        return Case(**fields)
+
+    def config(self) -> Dict[str, Any]:
+        """Return a new Simulation configuration for this case."""
+        return {
+            'num_floors': self.num_floors,
+            'num_elevators': self.num_elevators,
+            'elevator_capacity': self.capacity,
+            'num_people_per_round': None,
+            'arrival_generator': TraceArrivals(self.num_floors,
+                                               self.arrivals),
+            'moving_algorithm': _ALGORITHMS[self.algorithm](),
+            'visualize': False
+        }
+
+
+class TraceArrivals(FileArrivals):
+    """Arrivals given as a dictionary instead of a file, read the same way as
+    FileArrivals."""
+
+    def __init__(self, max_floor: int,
+                 arrivals: Dict[int, List[Tuple[int, int]]]) -> None:
+        """Initialize a generator of <arrivals>."""
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.max_floor = max_floor
+        self.arrival_dict = {}
+        for round_num, people in arrivals.items():
+            self.arrival_dict[round_num] = [floor for person in people
+                                            for floor in person]
+
+
+class ReferenceAlgorithm(MovingAlgorithm):
+    """An algorithm that always decides with move_elevators of the algorithm
+    it wraps, even when the batched decisions are asked for.
+
+    === Attributes ===
+    algorithm: the wrapped algorithm.
+    """
+    algorithm: MovingAlgorithm
+
+    def __init__(self, algorithm: MovingAlgorithm) -> None:
+        """Initialize a reference version of <algorithm>."""
+        self.algorithm = algorithm
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return the directions of the wrapped algorithm's
+        move_elevators."""
+        return self.algorithm.move_elevators(elevators, waiting, max_floor)
+
+    def move_elevators_batch(self,
+                             elevators: List[Elevator],
+                             waiting: Dict[int, List[Person]],
+                             max_floor: int) -> List[Direction]:
+        """Return the directions of the wrapped algorithm's
+        move_elevators."""
+        return self.move_elevators(elevators, waiting, max_floor)
+
+
+def random_case(rng: random.Random, max_floors: int = 12,
+                max_elevators: int = 4, max_rounds: int = 40) -> Case:
+    """Return a random case drawn from <rng>."""
+    num_floors = rng.randint(2, max_floors)
+    num_rounds = rng.randint(1, max_rounds)
+    # Quiet cases, busy cases and bursts are all likely.
+    rate = rng.choice([0.2, 1, 3])
+    arrivals = {}
+    for round_num in range(num_rounds):
+        count = min(int(rng.expovariate(1 / rate)), 8)
+        if count != 0:
+            arrivals[round_num] = [_random_trip(rng, num_floors)
+                                   for _ in range(count)]
+    return Case(num_floors, rng.randint(1, max_elevators), rng.randint(1, 4),
+                rng.choice(sorted(_ALGORITHMS)), num_rounds, arrivals)
+
+
+def _random_trip(rng: random.Random, num_floors: int) -> Tuple[int, int]:
+    """Return the start and target floors of someone arriving, who now and
+    then wants to go to the floor they are on."""
+    if rng.random() < 0.1:
+        floor = rng.randint(1, num_floors)
+        return floor, floor
+    start, target = rng.sample(range(1, num_floors + 1), 2)
+    return start, target
+
+
+def run_reference(case: Case) -> Trace:
+    """Run <case> on Simulation, one round at a time, with the directions
+    of its algorithm's move_elevators."""
+    config = case.config()
+    config['moving_algorithm'] = ReferenceAlgorithm(config['moving_algorithm'])
+    return _run_rounds(case, config)
+
+
+def _run_rounds(case: Case, config: Dict[str, Any]) -> Trace:
+    """Run <case> on Simulation with <config>, one round at a time."""
+    sim = Simulation(config)
+    snapshots = []
+    stats = None
+    for _ in range(case.num_rounds):
+        stats = sim.run(1)
+        snapshots.append((
+            tuple(elevator.location for elevator in sim.elevators),
+            tuple(tuple(p.target for p in elevator.passengers)
+                  for elevator in sim.elevators),
+            tuple((floor, tuple(p.target for p in people))
+                  for floor, people in sorted(sim.waiting.items()))))
+    return snapshots, stats
+
+
+def run_simulation(case: Case) -> Trace:
+    """Run <case> on Simulation, with the directions of its algorithm's
+    move_elevators_batch."""
+    return _run_rounds(case, case.config())
+
+
+def run_batch(case: Case) -> Trace:
+    """Run <case> on BatchSimulation."""
+    batch = BatchSimulation([case.config()])
+    snapshots = []
+    for _ in range(case.num_rounds):
+        batch.step()
+        snapshots.append(batch.snapshot(0))
+    return snapshots, batch.stats(0)
+
+
+def run_cached(case: Case) -> Trace:
+    """Run <case> on Simulation with a CachedAlgorithm."""
+    config = case.config()
+    config['moving_algorithm'] = CachedAlgorithm(config['moving_algorithm'])
+    return _run_rounds(case, config)
+
+
+def run_histogram(case: Case) -> Trace:
+    """Run <case> on Simulation computing its statistics from a wait time
+    histogram instead of the finished people."""
+    config = case.config()
+    config['keep_finished'] = False
+    return _run_rounds(case, config)
+
+
+# The engines compared with the reference Simulation.
+ENGINES: Dict[str, Callable[[Case], Trace]] = {
+    'simulation': run_simulation,
+    'batch': run_batch,
+    'cached': run_cached,
+    'histogram': run_histogram
+}
+
+
+def check(case: Case,
+          engines: Optional[Dict[str, Callable[[Case], Trace]]] = None
+          ) -> Optional[str]:
+    """Return a description of the first difference between the reference
+    Simulation and the <engines> (ENGINES by default) on <case>, or None if
+    they all behave the same."""
+    if engines is None:
+        engines = ENGINES
+    expected_snapshots, expected_stats = run_reference(case)
+    for name, engine in engines.items():
+        try:
+            snapshots, stats = engine(case)
+        except Exception as error:
+            return '{}: raised {!r}'.format(name, error)
+        for round_num, (expected, actual) in enumerate(
+                zip(expected_snapshots, snapshots)):
+            if expected != actual:
+                return '{}: round {}: expected {}, got {}'.format(
+                    name, round_num, expected, actual)
+        if len(snapshots) != len(expected_snapshots):
+            return '{}: ran {} rounds instead of {}'.format(
+                name, len(snapshots), len(expected_snapshots))
+        if stats != expected_stats:
+            return '{}: expected stats {}, got {}'.format(
+                name, expected_stats, stats)
+    return None
+
+
+def shrink(case: Case, fails: Callable[[Case], bool]) -> Case:
+    """Return a case no larger than <case> for which <fails> is still true,
+    and that cannot be made smaller one change at a time.
+
+    Precondition: fails(case)
+    """
+    improved = True
+    while improved:
+        improved = False
+        for smaller in _smaller_cases(case):
+            if fails(smaller):
+                case = smaller
+                improved = True
+                break
+    return case
+
+
+def _smaller_cases(case: Case) -> List[Case]:
+    """Return the cases one change smaller than <case>, the ones that remove
+    the most first."""
+    res = []
+    last_arrival = max(case.arrivals, default=0)
+    for num_rounds in [last_arrival + 1, case.num_rounds // 2,
+                       case.num_rounds - 1]:
+        if 1 <= num_rounds < case.num_rounds:
+            res.append(case.replace(num_rounds=num_rounds, arrivals={
+                r: people for r, people in case.arrivals.items()
+                if r < num_rounds}))
+    for round_num in sorted(case.arrivals):
+        arrivals = dict(case.arrivals)
+        del arrivals[round_num]
+        res.append(case.replace(arrivals=arrivals))
+    for round_num, people in sorted(case.arrivals.items()):
+        if len(people) > 1:
+            for i in range(len(people)):
+                arrivals = dict(case.arrivals)
+                arrivals[round_num] = people[:i] + people[i + 1:]
+                res.append(case.replace(arrivals=arrivals))
+    for round_num in sorted(case.arrivals):
+        if round_num > 0 and round_num - 1 not in case.arrivals:
+            # Arriving earlier often makes for a shorter case.
+            arrivals = dict(case.arrivals)
+            arrivals[round_num - 1] = arrivals.pop(round_num)
+            res.append(case.replace(arrivals=arrivals))
+    if case.num_elevators > 1:
+        res.append(case.replace(num_elevators=case.num_elevators - 1))
+    if case.capacity > 1:
+        res.append(case.replace(capacity=case.capacity - 1))
+    highest = max((floor for people in case.arrivals.values()
+                   for person in people for floor in person), default=1)
+    if case.num_floors > max(2, highest):
+        res.append(case.replace(num_floors=max(2, highest)))
+    return res
+
+
+def fuzz(num_cases: int, seed: int = 0,
+         processes: Optional[int] = None,
+         engines: Optional[Dict[str, Callable[[Case], Trace]]] = None
+         ) -> Optional[Tuple[Case, str]]:
+    """Check <num_cases> random cases, generated from seeds <seed>,
+    <seed> + 1, ..., and return the shrunk counterexample of the first
+    failing case and its difference, or None if every case passed.
+
+    Cases are checked in <processes> worker processes (the number of CPUs by
+    default). Custom <engines> can only be checked in this process.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    seeds = range(seed, seed + num_cases)
+    if engines is not None or processes <= 1:
+        failures = (_check_seed(s, engines) for s in seeds)
+        failed = next((s for s in failures if s is not None), None)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            failures = pool.imap(_check_seed, seeds, chunksize=64)
+            failed = next((s for s in failures if s is not None), None)
+            pool.terminate()
+    if failed is None:
+        return None
+    case = shrink(random_case(random.Random(failed)),
+                  lambda c: check(c, engines) is not None)
+    return case, check(case, engines)
+
+
+def _check_seed(seed: int,
+                engines: Optional[Dict[str, Callable[[Case], Trace]]] = None
+                ) -> Optional[int]:
+    """Return <seed> if the case generated from it fails, or None."""
+    if check(random_case(random.Random(seed)), engines) is None:
+        return None
+    return seed
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description='Fuzz the simulation engines.')
+    parser.add_argument('--cases', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    result = fuzz(args.cases, args.seed, args.processes)
+    elapsed = time.perf_counter() - start
+    if result is None:
+        print('{} cases passed in {:.1f}s'.format(args.cases, elapsed))
+    else:
+        print('counterexample:', result[0])
+        print(result[1])
@@ -0,0 +1,297 @@
+"""CSC148 Assignment 1 - Arrival Trace Generator
+
+=== Module Description ===
+A command-line tool that writes large, reproducible arrival traces for
+FileArrivals. Each round, the number of arrivals is drawn from a Poisson
+distribution whose mean follows a piecewise-constant rate schedule, and the
+start and target floors are drawn from a floor distribution.
+
+Two output formats are supported:
+    csv     the format read by FileArrivals, one line per round with arrivals:
+            round, start, target, start, target, ...
+    binary  a compact format read by BinaryFileArrivals: the magic bytes
+            b'ELTR', then for every round with arrivals, a little-endian
+            uint32 round number and uint32 number of people, followed by
+            the start and target floor of each person as uint16s.
+
+Output is generated and written in chunks of rounds, so traces of millions of
+rounds use constant memory. Each chunk is drawn with a few calls to
+random.choices (the counts of its rounds, by inverting the Poisson
+distribution function, then the (start, target) pairs of all its people
+from a table of every pair) and encoded with a single join or array, which
+keeps the cost per person low.
+
+Binary traces store floors as uint16s, so they are limited to buildings of at
+most 65535 floors (MAX_BINARY_FLOOR); larger buildings must use the CSV
+format.
+
+Generation runs at roughly one million people per second, or about 5 to 8 MB
+of output per second, bounded by the pure-Python random draws. A trace of a
+gigabyte therefore takes minutes rather than seconds to write.
+
+Example:
+    python generate_trace.py trace.csv --rounds 1000000 --floors 50 \\
+        --rate 0:2,500000:8 --distribution lobby --seed 148
+"""
+import argparse
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, chain
+import math
+import random
+import struct
+import sys
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from algorithms import ArrivalGenerator, FileArrivals
+
+# The magic bytes at the start of every binary trace.
+BINARY_MAGIC = b'ELTR'
+
+# The number of rounds generated before each write to disk.
+CHUNK_ROUNDS = 16384
+
+# The largest building whose (start, target) pairs are drawn from a table of
+# every pair. Larger buildings draw each floor separately, since the table
+# grows with the square of the number of floors.
+PAIR_TABLE_FLOORS = 256
+
+# The rate above which Poisson counts use the normal approximation, and the
+# tail probability below which the distribution function is cut off.
+_NORMAL_RATE = 30
+_POISSON_TAIL = 1e-15
+
+# The fraction of people starting or ending their trip at floor 1 under the
+# 'lobby' floor distribution.
+LOBBY_SHARE = 0.5
+
+# The highest floor a binary trace can hold, since floors are uint16s.
+MAX_BINARY_FLOOR = 0xFFFF
+
+_ROUND_HEADER = struct.Struct('<II')
+
+
+class BinaryFileArrivals(FileArrivals):
+    """Generate arrivals from a binary trace written by generate_trace.py.
+
+    === Attributes ===
+    arrival_dict: maps each round with arrivals to the flat list
+                  [start, target, start, target, ...] of its people.
+    """
+
+    def __init__(self, max_floor: int, filename: str) -> None:
+        """Initialize a new BinaryFileArrivals from the given binary trace.
+
+        Precondition:
+            <filename> refers to a binary trace written by generate_trace.py.
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.max_floor = max_floor
+        self.arrival_dict = read_binary_trace(filename)
+
+
+def parse_rate_schedule(schedule: str) -> List[Tuple[int, float]]:
+    """Return the (first round, mean arrivals per round) pairs described by
+    <schedule>, a comma-separated list of round:rate entries such as
+    '0:2,1000:5.5'. A rate applies from its round until the next entry's.
+    """
+    steps = []
+    for entry in schedule.split(','):
+        first_round, rate = entry.split(':')
+        steps.append((int(first_round), float(rate)))
+    steps.sort()
+    if len(steps) == 0 or steps[0][0] != 0:
+        steps.insert(0, (0, 0.0))
+    return steps
+
+
+def floor_weights(num_floors: int, distribution: str) -> List[float]:
+    """Return the relative weight of each floor 1..num_floors under
+    <distribution>, either 'uniform' or 'lobby'."""
+    if distribution == 'uniform':
+        return [1.0] * num_floors
+    if distribution == 'lobby':
+        other = (1 - LOBBY_SHARE) / (num_floors - 1)
+        return [LOBBY_SHARE] + [other] * (num_floors - 1)
+    raise ValueError('unknown floor distribution: ' + distribution)
+
+
+def pair_table(weights: List[float]) -> Tuple[List[Tuple[int, int]],
+                                               List[float]]:
+    """Return every (start, target) pair of different floors, and their
+    cumulative weights when the start floor is drawn with <weights> and the
+    target floor with <weights> among the other floors."""
+    total = sum(weights)
+    pairs = []
+    pair_weights = []
+    for start, start_weight in enumerate(weights, 1):
+        for target, target_weight in enumerate(weights, 1):
+            if start != target:
+                pairs.append((start, target))
+                pair_weights.append(start_weight * target_weight
+                                    / (total - start_weight))
+    return pairs, list(accumulate(pair_weights))
+
+
+def generate_rounds(rng: random.Random, first_round: int, num_rounds: int,
+                    rate: float, cum_weights: List[float],
+                    pairs: Optional[Tuple[List[Tuple[int, int]],
+                                          List[float]]] = None
+                    ) -> List[Tuple[int, List[int]]]:
+    """Return the arrivals of rounds first_round..first_round+num_rounds-1,
+    as (round, [start, target, ...]) pairs for the rounds with arrivals.
+
+    The floors are drawn from the pair_table <pairs> if it is given, and
+    otherwise floor by floor with <cum_weights>.
+    """
+    counts = _poisson_counts(rng, rate, num_rounds)
+    num_people = sum(counts)
+    # Draw the floors of the whole chunk at once.
+    if pairs is not None:
+        floors = list(chain.from_iterable(
+            rng.choices(pairs[0], cum_weights=pairs[1], k=num_people)))
+    else:
+        floors = rng.choices(range(1, len(cum_weights) + 1),
+                             cum_weights=cum_weights, k=2 * num_people)
+        for i in range(0, len(floors), 2):
+            while floors[i] == floors[i + 1]:
+                floors[i + 1] = _pick(rng, cum_weights)
+    res = []
+    pos = 0
+    for offset, count in enumerate(counts):
+        if count != 0:
+            res.append((first_round + offset, floors[pos:pos + 2 * count]))
+            pos += 2 * count
+    return res
+
+
+def write_trace(out: BinaryIO, num_rounds: int, num_floors: int,
+                schedule: List[Tuple[int, float]], distribution: str,
+                seed: int, binary: bool) -> int:
+    """Write a trace of <num_rounds> rounds to <out> and return the number of
+    people generated.
+
+    Raise ValueError if <binary> is True and num_floors is greater than
+    MAX_BINARY_FLOOR, before anything is written.
+
+    Precondition: num_floors >= 2
+    """
+    if binary and num_floors > MAX_BINARY_FLOOR:
+        raise ValueError('binary traces hold at most {} floors'.format(
+            MAX_BINARY_FLOOR))
+    rng = random.Random(seed)
+    weights = floor_weights(num_floors, distribution)
+    cum_weights = list(accumulate(weights))
+    pairs = None
+    if num_floors <= PAIR_TABLE_FLOORS:
+        pairs = pair_table(weights)
+    names = [str(floor) for floor in range(num_floors + 1)]
+    total = 0
+    if binary:
+        out.write(BINARY_MAGIC)
+    for step, (first_round, rate) in enumerate(schedule):
+        end = num_rounds
+        if step + 1 < len(schedule):
+            end = min(num_rounds, schedule[step + 1][0])
+        for chunk_start in range(first_round, end, CHUNK_ROUNDS):
+            rounds = generate_rounds(rng, chunk_start,
+                                     min(CHUNK_ROUNDS, end - chunk_start),
+                                     rate, cum_weights, pairs)
+            for _, floors in rounds:
+                total += len(floors) // 2
+            if binary:
+                out.write(_encode_binary(rounds))
+            else:
+                out.write(''.join([
+                    '{}, {}\n'.format(round_num,
+                                      ', '.join([names[f] for f in floors]))
+                    for round_num, floors in rounds]).encode())
+    return total
+
+
+def read_binary_trace(filename: str) -> Dict[int, List[int]]:
+    """Return the arrivals of the binary trace <filename>, in the same form as
+    FileArrivals.arrival_dict."""
+    with open(filename, 'rb') as trace:
+        data = trace.read()
+    if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError(filename + ' is not a binary arrival trace')
+    arrival_dict = {}
+    pos = len(BINARY_MAGIC)
+    while pos < len(data):
+        round_num, count = _ROUND_HEADER.unpack_from(data, pos)
+        pos += _ROUND_HEADER.size
+        floors = array('H')
+        floors.frombytes(data[pos:pos + 4 * count])
+        if sys.byteorder == 'big':
+            floors.byteswap()
+        pos += 4 * count
+        arrival_dict[round_num] = floors.tolist()
+    return arrival_dict
+
+
+def _encode_binary(rounds: List[Tuple[int, List[int]]]) -> bytes:
+    """Return <rounds> encoded in the binary trace format."""
+    # Every field is written as little-endian uint16s, the uint32s of the
+    # round header as their low half followed by their high half.
+    packed = array('H')
+    for round_num, floors in rounds:
+        count = len(floors) // 2
+        packed.extend((round_num & 0xFFFF, round_num >> 16,
+                       count & 0xFFFF, count >> 16))
+        packed.extend(floors)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _pick(rng: random.Random, cum_weights: List[float]) -> int:
+    """Return one floor drawn with the given cumulative weights."""
+    return bisect_right(cum_weights, rng.random() * cum_weights[-1]) + 1
+
+
+def _poisson_counts(rng: random.Random, rate: float,
+                    num_rounds: int) -> List[int]:
+    """Return <num_rounds> Poisson-distributed counts with mean <rate>."""
+    if rate <= 0:
+        return [0] * num_rounds
+    if rate > _NORMAL_RATE:
+        # The normal approximation is accurate for large rates.
+        deviation = math.sqrt(rate)
+        return [max(0, round(rng.gauss(rate, deviation)))
+                for _ in range(num_rounds)]
+    # The distribution function, up to the count whose tail is negligible.
+    probability = math.exp(-rate)
+    cumulative = [probability]
+    while 1 - cumulative[-1] > _POISSON_TAIL:
+        probability *= rate / len(cumulative)
+        if probability == 0:
+            break
+        cumulative.append(cumulative[-1] + probability)
+    return rng.choices(range(len(cumulative)), cum_weights=cumulative,
+                       k=num_rounds)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Write an arrival trace for FileArrivals.')
+    parser.add_argument('output', help='the file to write')
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--floors', type=int, default=6)
+    parser.add_argument('--rate', default='0:2',
+                        help='round:mean arrivals per round, comma-separated')
+    parser.add_argument('--distribution', choices=['uniform', 'lobby'],
+                        default='uniform')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=['csv', 'binary'], default='csv')
+    args = parser.parse_args()
+    if args.format == 'binary' and args.floors > MAX_BINARY_FLOOR:
+        parser.error('--format binary supports at most {} floors'.format(
+            MAX_BINARY_FLOOR))
+    with open(args.output, 'wb', buffering=1 << 20) as output:
+        people = write_trace(output, args.rounds, args.floors,
+                             parse_rate_schedule(args.rate),
+                             args.distribution, args.seed,
+                             args.format == 'binary')
+    print('wrote {} people over {} rounds to {}'.format(
+        people, args.rounds, args.output))
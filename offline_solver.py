@@ -0,0 +1,497 @@
+"""CSC148 Assignment 1 - Offline Solver
+
+=== Module Description ===
+PushyPassenger and ShortSighted only see the people who have already arrived.
+This module searches for the best elevator moves when the whole FileArrivals
+trace is known up front, to measure how far the online algorithms are from
+optimal on small instances:
+
+    - solve() runs a beam search over the moves of every round and returns
+      the best Plan found. With beam_width=None the search keeps every state
+      that could still beat the best plan known, which finds an optimal plan
+      but is only practical for a few floors, elevators and rounds.
+    - PlanAlgorithm replays a Plan inside a normal Simulation.
+    - gap_report() compares the online algorithms with the best plan.
+
+The objective is either 'total', the sum of everyone's wait time, or 'max',
+the longest wait time. Unlike Simulation's statistics, both include the
+people who have not reached their target floor when the run ends, since a
+plan could otherwise do well by never delivering anyone.
+
+States that contain the same people in the same places are equivalent, so
+each one is expanded only once per round, from the cheapest way of reaching
+it. The states of a round are kept in a TranspositionTable of bounded size;
+when it overflows, the states with the highest cost bounds are dropped, and
+the plan found is no longer guaranteed to be optimal (Plan.optimal).
+
+The moves of the first round are split between worker processes, each of
+which searches the plans that start with its moves.
+"""
+import itertools
+import multiprocessing
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import algorithms
+from algorithms import Direction, FileArrivals, MovingAlgorithm
+from entities import Elevator, Person
+from simulation import Simulation
+
+# A person is a (target floor, arrival round) pair.
+_Person = Tuple[int, int]
+# An elevator is its location and its passengers, sorted.
+_Elevator = Tuple[int, Tuple[_Person, ...]]
+# A state is the elevators and the queue of people on each floor.
+_State = Tuple[Tuple[_Elevator, ...], Tuple[Tuple[_Person, ...], ...]]
+
+OBJECTIVES = ['total', 'max']
+
+
+class Plan:
+    """The moves of every elevator in every round of a run.
+
+    === Attributes ===
+    objective: the objective the plan was chosen for, 'total' or 'max'.
+    cost: the plan's total or maximum wait time.
+    moves: the direction of each elevator in each round.
+    optimal: whether the search that found the plan never dropped a state,
+             so that no plan has a lower cost.
+    """
+    objective: str
+    cost: int
+    moves: List[List[Direction]]
+    optimal: bool
+
+    def __init__(self, objective: str, cost: int,
+                 moves: List[List[Direction]], optimal: bool) -> None:
+        """Initialize a new plan."""
+        self.objective = objective
+        self.cost = cost
+        self.moves = moves
+        self.optimal = optimal
+
+
+class PlanAlgorithm(MovingAlgorithm):
+    """A moving algorithm that replays the moves of a Plan, one round per
+    call. Once the plan runs out, every elevator stays where it is.
+
+    === Attributes ===
+    plan: the plan being replayed.
+    round_num: the round of the next call.
+    """
+    plan: Plan
+    round_num: int
+
+    def __init__(self, plan: Plan) -> None:
+        """Initialize a new algorithm replaying <plan> from its first round.
+        """
+        self.plan = plan
+        self.round_num = 0
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return the plan's directions for this round."""
+        if self.round_num < len(self.plan.moves):
+            res = list(self.plan.moves[self.round_num])
+        else:
+            res = [Direction.STAY] * len(elevators)
+        self.round_num += 1
+        return res
+
+
+class TranspositionTable:
+    """The states reached in one round of the search, keeping only the
+    cheapest way of reaching each equivalent state.
+
+    At most about twice max_size states are stored: when there are more,
+    only the max_size with the lowest cost bound are kept.
+
+    === Attributes ===
+    max_size: the number of states kept when the table is pruned.
+    hits: the number of states that were already reached at no higher cost.
+    dropped: the number of states pruned, to stay within max_size or to
+             return at most the number of nodes asked for.
+
+    === Representation invariants ===
+    max_size >= 1
+    """
+    max_size: int
+    hits: int
+    dropped: int
+    _nodes: Dict[Hashable, '_Node']
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize a new, empty table."""
+        self.max_size = max_size
+        self.hits = 0
+        self.dropped = 0
+        self._nodes = {}
+
+    def offer(self, key: Hashable, node: '_Node') -> None:
+        """Store <node> under <key>, unless a node with an equal or lower
+        bound is already stored there."""
+        best = self._nodes.get(key)
+        if best is not None and best.rank <= node.rank:
+            self.hits += 1
+            return
+        self._nodes[key] = node
+        if len(self._nodes) > 2 * self.max_size:
+            self._prune()
+
+    def best(self, limit: Optional[int] = None) -> List['_Node']:
+        """Return the stored nodes with the lowest bounds, lowest first, at
+        most <limit> of them, and empty the table."""
+        self._prune()
+        nodes = sorted(self._nodes.values(), key=lambda n: n.rank)
+        self._nodes = {}
+        if limit is not None and len(nodes) > limit:
+            self.dropped += len(nodes) - limit
+            del nodes[limit:]
+        return nodes
+
+    def __len__(self) -> int:
+        """Return the number of states stored."""
+        return len(self._nodes)
+
+    def _prune(self) -> None:
+        """Keep only the max_size nodes with the lowest bounds."""
+        if len(self._nodes) <= self.max_size:
+            return
+        ranked = sorted(self._nodes.items(), key=lambda item: item[1].rank)
+        self.dropped += len(ranked) - self.max_size
+        self._nodes = dict(ranked[:self.max_size])
+
+
+class _Problem:
+    """An offline dispatch problem: a building, a trace and a horizon.
+
+    === Attributes ===
+    num_floors: the number of floors.
+    num_elevators: the number of elevators.
+    capacity: the capacity of each elevator.
+    num_rounds: the number of rounds in the run.
+    objective: 'total' or 'max'.
+    arrivals: the (start, target) pairs of the people arriving each round.
+    future_total: future_total[r] is a lower bound on the total wait time of
+                  the people arriving after round r.
+    future_max: future_max[r] is a lower bound on the wait time of the
+                people arriving after round r.
+    """
+    num_floors: int
+    num_elevators: int
+    capacity: int
+    num_rounds: int
+    objective: str
+    arrivals: Dict[int, List[Tuple[int, int]]]
+    future_total: List[int]
+    future_max: List[int]
+
+    def __init__(self, config: Dict[str, Any], num_rounds: int,
+                 objective: str) -> None:
+        """Initialize the problem of running <config> for <num_rounds>
+        rounds."""
+        if objective not in OBJECTIVES:
+            raise ValueError('unknown objective: ' + objective)
+        generator = config['arrival_generator']
+        if not isinstance(generator, FileArrivals):
+            raise ValueError('the offline solver needs a FileArrivals trace')
+        self.num_floors = config['num_floors']
+        self.num_elevators = config['num_elevators']
+        self.capacity = config['elevator_capacity']
+        self.num_rounds = num_rounds
+        self.objective = objective
+        self.arrivals = {}
+        for round_num, floors in generator.arrival_dict.items():
+            if round_num < num_rounds:
+                self.arrivals[round_num] = [(floors[i], floors[i + 1])
+                                            for i in range(0, len(floors), 2)]
+        self.future_total = [0] * (num_rounds + 1)
+        self.future_max = [0] * (num_rounds + 1)
+        for round_num in range(num_rounds - 1, -1, -1):
+            total = self.future_total[round_num + 1]
+            longest = self.future_max[round_num + 1]
+            for start, target in self.arrivals.get(round_num + 1, []):
+                bound = min(num_rounds - round_num - 1, abs(target - start))
+                total += bound
+                longest = max(longest, bound)
+            self.future_total[round_num] = total
+            self.future_max[round_num] = longest
+
+    def root(self) -> Tuple[_State, int]:
+        """Return the state once round 0's people have boarded, and the
+        longest wait of the people who have finished."""
+        elevators = tuple((1, ()) for _ in range(self.num_elevators))
+        waiting = tuple(() for _ in range(self.num_floors))
+        return self._begin_round((elevators, waiting), 0)
+
+    def actions(self, state: _State) -> List[Tuple[int, ...]]:
+        """Return every combination of valid moves in <state>."""
+        choices = []
+        for location, _ in state[0]:
+            choices.append([move for move in (-1, 0, 1)
+                            if 1 <= location + move <= self.num_floors])
+        return list(itertools.product(*choices))
+
+    def advance(self, state: _State, round_num: int,
+                moves: Tuple[int, ...]) -> Tuple[_State, int, int]:
+        """Return the state at the next decision after making <moves> in
+        round <round_num>, the wait time added, and the longest wait of the
+        people who finished."""
+        elevators = tuple((location + move, passengers)
+                          for (location, passengers), move
+                          in zip(state[0], moves))
+        in_system = sum(len(queue) for queue in state[1]) + \
+            sum(len(passengers) for _, passengers in elevators)
+        if round_num + 1 == self.num_rounds:
+            return (elevators, state[1]), in_system, -1
+        state, finished = self._begin_round((elevators, state[1]),
+                                            round_num + 1)
+        return state, in_system, finished
+
+    def _begin_round(self, state: _State,
+                     round_num: int) -> Tuple[_State, int]:
+        """Run the arrivals, leaving and boarding of round <round_num>."""
+        elevators, waiting = state
+        if round_num in self.arrivals:
+            queues = list(waiting)
+            for start, target in self.arrivals[round_num]:
+                queues[start - 1] = queues[start - 1] + ((target, round_num),)
+            waiting = tuple(queues)
+        finished = -1
+        res = []
+        for location, passengers in elevators:
+            staying = tuple(p for p in passengers if p[0] != location)
+            for target, arrival in passengers:
+                if target == location:
+                    finished = max(finished, round_num - arrival)
+            room = self.capacity - len(staying)
+            queue = waiting[location - 1]
+            if room > 0 and len(queue) > 0:
+                staying = tuple(sorted(staying + queue[:room]))
+                waiting = waiting[:location - 1] + (queue[room:],) + \
+                    waiting[location:]
+            res.append((location, staying))
+        return (tuple(res), waiting), finished
+
+    def key(self, state: _State, round_num: int) -> Hashable:
+        """Return a key shared by exactly the states with the same future
+        costs under this problem's objective."""
+        if self.objective == 'max':
+            return round_num, state
+        elevators = tuple((location, tuple(p[0] for p in passengers))
+                          for location, passengers in state[0])
+        waiting = tuple(tuple(p[0] for p in queue) for queue in state[1])
+        return round_num, elevators, waiting
+
+    def bound(self, state: _State, round_num: int, total: int,
+              longest: int) -> Tuple[int, ...]:
+        """Return a lower bound on the cost of every plan through <state>,
+        where <total> and <longest> are the total wait so far and the longest
+        finished wait. Bounds are compared as tuples; the first entry is the
+        objective."""
+        remaining = self.num_rounds - round_num
+        total += self.future_total[round_num]
+        longest = max(longest, self.future_max[round_num])
+        for location, passengers in state[0]:
+            for target, arrival in passengers:
+                rest = min(remaining, abs(target - location))
+                total += rest
+                longest = max(longest, round_num - arrival + rest)
+        for floor, queue in enumerate(state[1], 1):
+            for target, arrival in queue:
+                rest = min(remaining, abs(target - floor))
+                total += rest
+                longest = max(longest, round_num - arrival + rest)
+        if self.objective == 'max':
+            return longest, total
+        return (total,)
+
+
+class _Node:
+    """A state reached by the search, with the moves that led to it."""
+    state: _State
+    total: int
+    longest: int
+    rank: Tuple[int, ...]
+    moves: Optional[Tuple[Any, Tuple[int, ...]]]
+
+    def __init__(self, state: _State, total: int, longest: int,
+                 rank: Tuple[int, ...],
+                 moves: Optional[Tuple[Any, Tuple[int, ...]]]) -> None:
+        """Initialize a new node. <moves> is a (previous moves, last moves)
+        pair, or None at the root."""
+        self.state = state
+        self.total = total
+        self.longest = longest
+        self.rank = rank
+        self.moves = moves
+
+
+def solve(config: Dict[str, Any],
+          num_rounds: int,
+          objective: str = 'total',
+          beam_width: Optional[int] = 1000,
+          table_size: int = 1 << 20,
+          processes: Optional[int] = None) -> Plan:
+    """Return the best plan found for running <config> for <num_rounds>
+    rounds.
+
+    <config> is a Simulation configuration whose arrival generator is a
+    FileArrivals; its moving algorithm is ignored. At most <beam_width>
+    states, those with the lowest cost bound, are kept each round, or every
+    state that could still beat the best plan known if <beam_width> is None.
+    Each worker process keeps at most about <table_size> states per round.
+    <processes> defaults to the number of CPUs.
+
+    Precondition: num_rounds >= 1
+    """
+    problem = _Problem(config, num_rounds, objective)
+    incumbent = None
+    if beam_width is None:
+        # A greedy plan gives the exhaustive search a cost to beat.
+        incumbent = _search(problem, None, 1, table_size, None)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    root, _ = problem.root()
+    first_moves = problem.actions(root)
+    if processes <= 1 or len(first_moves) == 1:
+        best = _search(problem, None, beam_width, table_size, incumbent)
+    else:
+        with multiprocessing.Pool(min(processes, len(first_moves)),
+                                  _init_worker,
+                                  (problem, beam_width, table_size,
+                                   incumbent)) as pool:
+            plans = pool.map(_search_worker, first_moves)
+        best = min(plans, key=lambda plan: plan.cost)
+        best.optimal = all(plan.optimal for plan in plans)
+    return best
+
+
+def wait_cost(sim: Simulation, objective: str = 'total') -> int:
+    """Return the total or maximum wait time of everyone in <sim>, including
+    the people still waiting or riding."""
+    times = [person.wait_time for person in sim.all_finished]
+    for people in sim.waiting.values():
+        times.extend(person.wait_time for person in people)
+    for elevator in sim.elevators:
+        times.extend(passenger.wait_time for passenger in elevator.passengers)
+    if objective == 'max':
+        return max(times, default=0)
+    return sum(times)
+
+
+def gap_report(config: Dict[str, Any],
+               num_rounds: int,
+               objective: str = 'total',
+               online: Optional[Dict[str, MovingAlgorithm]] = None,
+               **solver_options: Any) -> Dict[str, Any]:
+    """Return the cost of the best plan found for <config> and, for each
+    online algorithm, its cost and how much higher it is than the plan's
+    (the gap; its 'ratio' is None when the plan's cost is 0).
+
+    <online> maps names to algorithms, PushyPassenger and ShortSighted by
+    default. <solver_options> are passed on to solve().
+    """
+    if online is None:
+        online = {'PushyPassenger': algorithms.PushyPassenger(),
+                  'ShortSighted': algorithms.ShortSighted()}
+    plan = solve(config, num_rounds, objective, **solver_options)
+    report = {'objective': objective, 'best': plan.cost, 'online': {}}
+    for name, algorithm in online.items():
+        run_config = dict(config)
+        run_config['moving_algorithm'] = algorithm
+        run_config['visualize'] = False
+        sim = Simulation(run_config)
+        sim.run(num_rounds)
+        cost = wait_cost(sim, objective)
+        ratio = None
+        if plan.cost != 0:
+            ratio = (cost - plan.cost) / plan.cost
+        report['online'][name] = {'cost': cost, 'gap': cost - plan.cost,
+                                  'ratio': ratio}
+    return report
+
+
+# The problem searched by this worker process, and its search options.
+_worker_search = None
+
+
+def _init_worker(problem: _Problem, beam_width: Optional[int],
+                 table_size: int, incumbent: Optional[Plan]) -> None:
+    """Remember the problem shared by this worker's searches."""
+    global _worker_search
+    _worker_search = (problem, beam_width, table_size, incumbent)
+
+
+def _search_worker(first: Tuple[int, ...]) -> Plan:
+    """Search this worker's problem for plans starting with <first>."""
+    problem, beam_width, table_size, incumbent = _worker_search
+    return _search(problem, first, beam_width, table_size, incumbent)
+
+
+def _search(problem: _Problem, first: Optional[Tuple[int, ...]],
+            beam_width: Optional[int], table_size: int,
+            incumbent: Optional[Plan]) -> Plan:
+    """Return the best plan for <problem> found by a beam search, restricted
+    to plans whose first moves are <first> if it is given.
+
+    If <incumbent> is given, only plans that beat it are searched for, and
+    <incumbent> is returned if there are none.
+    """
+    table = TranspositionTable(table_size)
+    state, longest = problem.root()
+    layer = [_Node(state, 0, longest,
+                   problem.bound(state, 0, 0, longest), None)]
+    for round_num in range(problem.num_rounds):
+        for node in layer:
+            actions = problem.actions(node.state)
+            if round_num == 0 and first is not None:
+                actions = [first]
+            for moves in actions:
+                state, added, finished = problem.advance(node.state,
+                                                         round_num, moves)
+                total = node.total + added
+                longest = max(node.longest, finished)
+                rank = problem.bound(state, round_num + 1, total, longest)
+                if incumbent is not None and rank[0] >= incumbent.cost:
+                    continue
+                table.offer(problem.key(state, round_num + 1),
+                            _Node(state, total, longest, rank,
+                                  (node.moves, moves)))
+        layer = table.best(beam_width)
+    if len(layer) == 0:
+        return Plan(problem.objective, incumbent.cost, incumbent.moves,
+                    table.dropped == 0)
+    best = layer[0]
+    return Plan(problem.objective, best.rank[0], _unwind(best.moves),
+                table.dropped == 0)
+
+
+def _unwind(moves: Optional[Tuple[Any, Tuple[int, ...]]]
+            ) -> List[List[Direction]]:
+    """Return the moves of every round from a chain of (previous, last)
+    pairs."""
+    res = []
+    while moves is not None:
+        moves, last = moves
+        res.append([Direction(move) for move in last])
+    res.reverse()
+    return res
+
+
+if __name__ == '__main__':
+    import sys
+
+    trace = sys.argv[1] if len(sys.argv) > 1 else 'short_sighted_3.csv'
+    sample_config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': FileArrivals(5, trace),
+        'moving_algorithm': None,
+        'visualize': False
+    }
+    for goal in OBJECTIVES:
+        print(gap_report(sample_config, 12, goal))
@@ -0,0 +1,267 @@
+"""CSC148 Assignment 1 - Algorithm Registry
+
+=== Module Description ===
+Configurations built in code hold ArrivalGenerator and MovingAlgorithm
+objects, which are costly to send to worker processes and cannot be written
+in a job file. This module names every arrival generator and moving
+algorithm, so that a configuration can instead be described by a spec: a
+plain dictionary that can be loaded from JSON or TOML, pickled cheaply, and
+turned into a configuration by build_config in the process that runs it.
+
+In a spec, 'arrival_generator' and 'moving_algorithm' are either a name, or a
+dictionary with a 'name' and the algorithm's parameters, e.g.
+
+    {"num_floors": 6, "num_elevators": 2, "elevator_capacity": 3,
+     "num_people_per_round": 2, "visualize": false,
+     "arrival_generator": {"name": "FileArrivals",
+                           "filename": "sample_arrivals.csv"},
+     "moving_algorithm": {"name": "CachedAlgorithm",
+                          "algorithm": "ShortSighted"}}
+
+Every other key is copied to the configuration as it is. Arrival generators
+always get the spec's num_floors as their max_floor.
+
+Some moving algorithms only work inside a Simulation, which keeps the
+objects they share with it (a dispatcher, a demand estimator, an anger index
+or a zone table) up to date. They are registered with needs_simulation=True,
+and build_moving_algorithm refuses to build them, or any algorithm around
+them, for anything but a Simulation.
+
+Each process keeps the FileArrivals and BinaryFileArrivals it builds, keyed
+by file name and modification time, so a trace is only parsed once per
+process however many configurations use it.
+
+Run this module to run the spec in a JSON or TOML file:
+    python registry.py job.json
+"""
+import json
+import os
+from typing import Any, Callable, Dict, Tuple, Union
+
+import algorithms
+from anger import AngerIndex, AngriestFirst
+from demand import DemandEstimator, ParkingAlgorithm
+from destination_dispatch import DestinationDispatch, DestinationDispatcher
+from zones import ZonedPushyPassenger, ZonedShortSighted, ZoneTable
+
+# A name, or a dictionary with a 'name' and parameters.
+Spec = Union[str, Dict[str, Any]]
+
+# A factory builds an algorithm from the configuration being built and the
+# algorithm's parameters. It may add the objects the algorithm shares with
+# the simulation to the configuration.
+Factory = Callable[..., Any]
+
+ARRIVAL_GENERATORS: Dict[str, Factory] = {}
+MOVING_ALGORITHMS: Dict[str, Factory] = {}
+
+# The names of the moving algorithms that only work inside a Simulation.
+SIMULATION_ONLY = set()
+
+# (class name, max_floor, file name, modification time) -> arrival generator
+_parsed_files: Dict[Tuple[str, int, str, float], Any] = {}
+
+
+def register_arrival_generator(name: str, factory: Factory) -> None:
+    """Make the arrival generator built by <factory> available as <name>."""
+    ARRIVAL_GENERATORS[name] = factory
+
+
+def register_moving_algorithm(name: str, factory: Factory,
+                              needs_simulation: bool = False) -> None:
+    """Make the moving algorithm built by <factory> available as <name>.
+
+    If <needs_simulation> is True, the algorithm relies on objects that only
+    a Simulation keeps up to date.
+    """
+    MOVING_ALGORITHMS[name] = factory
+    if needs_simulation:
+        SIMULATION_ONLY.add(name)
+    else:
+        SIMULATION_ONLY.discard(name)
+
+
+def build_arrival_generator(spec: Spec, config: Dict[str, Any]
+                            ) -> algorithms.ArrivalGenerator:
+    """Return the arrival generator described by <spec> for <config>."""
+    name, params = _split(spec)
+    if name not in ARRIVAL_GENERATORS:
+        raise ValueError('unknown arrival generator: ' + name)
+    return ARRIVAL_GENERATORS[name](config, **params)
+
+
+def build_moving_algorithm(spec: Spec, config: Dict[str, Any],
+                           in_simulation: bool = True
+                           ) -> algorithms.MovingAlgorithm:
+    """Return the moving algorithm described by <spec> for <config>.
+
+    Raise ValueError if <spec> needs a Simulation (see needs_simulation) and
+    <in_simulation> is False.
+    """
+    name, params = _split(spec)
+    if name not in MOVING_ALGORITHMS:
+        raise ValueError('unknown moving algorithm: ' + name)
+    if not in_simulation and needs_simulation(spec):
+        raise ValueError('{} only works inside a Simulation'.format(name))
+    return MOVING_ALGORITHMS[name](config, **params)
+
+
+def needs_simulation(spec: Spec) -> bool:
+    """Return whether the moving algorithm described by <spec>, or an
+    algorithm it is built around, only works inside a Simulation."""
+    name, params = _split(spec)
+    inner = params.get('algorithm')
+    return name in SIMULATION_ONLY \
+        or (_is_spec(inner) and needs_simulation(inner))
+
+
+def build_config(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the Simulation configuration described by <spec>.
+
+    Algorithms that are already objects are kept as they are, so building a
+    configuration twice gives the same configuration.
+    """
+    config = dict(spec)
+    if _is_spec(config.get('arrival_generator')):
+        config['arrival_generator'] = build_arrival_generator(
+            config['arrival_generator'], config)
+    if _is_spec(config.get('moving_algorithm')):
+        config['moving_algorithm'] = build_moving_algorithm(
+            config['moving_algorithm'], config)
+    return config
+
+
+def load_spec(filename: str) -> Dict[str, Any]:
+    """Return the spec in the JSON or TOML file <filename>."""
+    if filename.endswith('.toml'):
+        import tomllib
+        with open(filename, 'rb') as spec_file:
+            return tomllib.load(spec_file)
+    with open(filename) as spec_file:
+        return json.load(spec_file)
+
+
+def _is_spec(value: Any) -> bool:
+    """Return whether <value> describes an algorithm instead of being one."""
+    return isinstance(value, (str, dict))
+
+
+def _split(spec: Spec) -> Tuple[str, Dict[str, Any]]:
+    """Return the name and parameters of <spec>."""
+    if isinstance(spec, str):
+        return spec, {}
+    params = dict(spec)
+    return params.pop('name'), params
+
+
+def _random_arrivals(config: Dict[str, Any],
+                     num_people: Any = None) -> algorithms.RandomArrivals:
+    """Return RandomArrivals for <config>, with num_people_per_round people
+    per round unless <num_people> is given."""
+    if num_people is None:
+        num_people = config.get('num_people_per_round')
+    return algorithms.RandomArrivals(config['num_floors'], num_people)
+
+
+def _file_arrivals(cls: type) -> Factory:
+    """Return a factory for the file-based arrival generator <cls> that
+    parses each file once per process."""
+    def factory(config: Dict[str, Any],
+                filename: str) -> algorithms.ArrivalGenerator:
+        """Return <cls> for <filename>, parsed already if possible."""
+        key = (cls.__name__, config['num_floors'], os.path.abspath(filename),
+               os.path.getmtime(filename))
+        if key not in _parsed_files:
+            _parsed_files[key] = cls(config['num_floors'], filename)
+        return _parsed_files[key]
+    return factory
+
+
+def _plain(cls: type) -> Factory:
+    """Return a factory that calls <cls> with the spec's parameters."""
+    def factory(config: Dict[str, Any], **params: Any) -> Any:
+        """Return a new <cls>."""
+        return cls(**params)
+    return factory
+
+
+def _cached_algorithm(config: Dict[str, Any], algorithm: Spec,
+                      max_size: int = 4096) -> algorithms.CachedAlgorithm:
+    """Return a CachedAlgorithm around the algorithm <algorithm>."""
+    return algorithms.CachedAlgorithm(
+        build_moving_algorithm(algorithm, config), max_size)
+
+
+def _destination_dispatch(config: Dict[str, Any]) -> DestinationDispatch:
+    """Return DestinationDispatch, adding its dispatcher to <config>."""
+    if config.get('dispatcher') is None:
+        config['dispatcher'] = DestinationDispatcher()
+    return DestinationDispatch(config['dispatcher'])
+
+
+def _parking_algorithm(config: Dict[str, Any], algorithm: Spec,
+                       **estimator: Any) -> ParkingAlgorithm:
+    """Return a ParkingAlgorithm around <algorithm>, adding its demand
+    estimator, built with the <estimator> parameters, to <config>."""
+    if config.get('demand_estimator') is None:
+        config['demand_estimator'] = DemandEstimator(**estimator)
+    return ParkingAlgorithm(build_moving_algorithm(algorithm, config),
+                            config['demand_estimator'])
+
+
+def _angriest_first(config: Dict[str, Any],
+                    min_level: int = 1) -> AngriestFirst:
+    """Return AngriestFirst, adding its anger index to <config>."""
+    if config.get('anger_index') is None:
+        config['anger_index'] = AngerIndex()
+    return AngriestFirst(config['anger_index'], min_level)
+
+
+def _zoned(cls: type) -> Factory:
+    """Return a factory for the zoned algorithm <cls> that turns the
+    config's 'zones' into a ZoneTable shared with the simulation."""
+    def factory(config: Dict[str, Any]) -> Any:
+        """Return a new <cls> for the zones of <config>."""
+        if not isinstance(config['zones'], ZoneTable):
+            config['zones'] = ZoneTable(config['zones'],
+                                        config['num_floors'])
+        return cls(config['zones'])
+    return factory
+
+
+def _binary_file_arrivals(config: Dict[str, Any],
+                          filename: str) -> algorithms.ArrivalGenerator:
+    """Return BinaryFileArrivals for <filename>, parsed once per process."""
+    from generate_trace import BinaryFileArrivals
+    return _file_arrivals(BinaryFileArrivals)(config, filename)
+
+
+register_arrival_generator('RandomArrivals', _random_arrivals)
+register_arrival_generator('FileArrivals',
+                           _file_arrivals(algorithms.FileArrivals))
+register_arrival_generator('BinaryFileArrivals', _binary_file_arrivals)
+
+register_moving_algorithm('RandomAlgorithm',
+                          _plain(algorithms.RandomAlgorithm))
+register_moving_algorithm('PushyPassenger', _plain(algorithms.PushyPassenger))
+register_moving_algorithm('ShortSighted', _plain(algorithms.ShortSighted))
+register_moving_algorithm('CachedAlgorithm', _cached_algorithm)
+register_moving_algorithm('DestinationDispatch', _destination_dispatch,
+                          needs_simulation=True)
+register_moving_algorithm('ParkingAlgorithm', _parking_algorithm,
+                          needs_simulation=True)
+register_moving_algorithm('AngriestFirst', _angriest_first,
+                          needs_simulation=True)
+register_moving_algorithm('ZonedPushyPassenger', _zoned(ZonedPushyPassenger),
+                          needs_simulation=True)
+register_moving_algorithm('ZonedShortSighted', _zoned(ZonedShortSighted),
+                          needs_simulation=True)
+
+
+if __name__ == '__main__':
+    import sys
+    from simulation import Simulation
+
+    job = load_spec(sys.argv[1])
+    num_rounds = job.pop('num_rounds', 100)
+    print(Simulation(build_config(job)).run(num_rounds))
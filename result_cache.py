@@ -0,0 +1,316 @@
+"""CSC148 Assignment 1 - Result Cache
+
+=== Module Description ===
+Running the same spec (see registry.py) with the same seed for the same
+number of rounds always gives the same statistics. ResultCache keeps those
+statistics in a directory on disk, so that repeated requests are answered
+without running the simulation again.
+
+An entry's key is the SHA-256 hash of:
+    - the spec, as canonical JSON, with each arrival trace file replaced by
+      the hash of its contents (so renaming a trace keeps its entries, and
+      editing it does not reuse them),
+    - the number of rounds, the seed and the names of the extra metrics.
+
+Entries live in a subdirectory named after the code version, a hash of the
+source files of the modules a simulation runs (simulation.py, registry.py,
+this module and every module of this directory they import). When that code
+changes, a new subdirectory is used. The entries of other code versions are
+kept, since another checkout may share the cache directory, until prune is
+called or they are evicted.
+
+Several processes may share a cache directory. Entries are written to a
+temporary file and renamed into place, so a reader never sees half an entry,
+and two processes storing the same entry both store the same result. When
+the cache grows beyond max_bytes, the least recently used entries are
+deleted; reading an entry marks it as used by updating its modification
+time. The size of the cache includes the entries of every code version, and
+entries of other versions are evicted before any entry of the current one.
+
+Each process keeps a running total of the size of the cache, which does not
+see the entries other processes store. The total is recounted from disk
+before deciding to evict, and after every RECOUNT_EVERY entries stored, so
+a shared cache only grows beyond max_bytes by the entries the other
+processes stored since the last recount.
+"""
+import ast
+import glob
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from registry import build_config
+from simulation import Simulation
+
+# A metric computes an extra result from a simulation once its run is over.
+Metric = Callable[[Simulation], Any]
+
+# The fraction of max_bytes the cache is trimmed to when it is too large.
+TRIM_TO = 0.9
+
+# The number of entries a process stores between recounts of the size of the
+# cache on disk.
+RECOUNT_EVERY = 256
+
+# The directory of the simulator's source files.
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The modules whose imports make up the code a simulation runs.
+_ROOT_MODULES = ['simulation', 'registry', 'result_cache']
+
+_code_version = None
+
+# (path, modification time, size) -> SHA-256 of the file's contents
+_file_hashes: Dict[Tuple[str, float, int], str] = {}
+
+
+class ResultCache:
+    """Simulation results cached in a directory.
+
+    === Attributes ===
+    root: the directory of the cache, with a subdirectory per code version.
+    directory: the directory of the entries for the current code version.
+    max_bytes: the size the entries of every code version may take up
+               before some are evicted.
+    hits: the number of results read from the cache by this object.
+    misses: the number of results this object had to compute.
+
+    === Representation invariants ===
+    max_bytes >= 0
+    """
+    root: str
+    directory: str
+    max_bytes: int
+    hits: int
+    misses: int
+    _size: int
+    _stored_since_count: int
+
+    def __init__(self, root: str, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """Initialize a cache stored under the directory <root>."""
+        version = code_version()
+        self.root = root
+        self.directory = os.path.join(root, 'v-' + version[:16])
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._recount()
+
+    def run(self, spec: Dict[str, Any], num_rounds: int, seed: int,
+            metrics: Optional[Dict[str, Metric]] = None) -> Dict[str, Any]:
+        """Return the statistics of running <spec> for <num_rounds> rounds
+        with the random number generator seeded with <seed>, from the cache
+        if possible.
+
+        The statistics are those returned by Simulation.run, plus the value
+        of each metric in <metrics> under its name. Metrics are identified by
+        name only.
+        """
+        if metrics is None:
+            metrics = {}
+        key = self.key(spec, num_rounds, seed, sorted(metrics))
+        res = self.get(key)
+        if res is not None:
+            self.hits += 1
+            return res
+        self.misses += 1
+        random.seed(seed)
+        config = build_config(spec)
+        config['visualize'] = False
+        sim = Simulation(config)
+        res = sim.run(num_rounds)
+        for name, metric in metrics.items():
+            res[name] = metric(sim)
+        self.put(key, res)
+        return res
+
+    def key(self, spec: Dict[str, Any], num_rounds: int, seed: int,
+            metric_names: List[str]) -> str:
+        """Return the key of a run.
+
+        Raise ValueError if <spec> contains anything but JSON values, such as
+        algorithm objects.
+        """
+        normalized = {
+            'spec': _normalize(spec),
+            'num_rounds': num_rounds,
+            'seed': seed,
+            'metrics': metric_names
+        }
+        try:
+            text = json.dumps(normalized, sort_keys=True,
+                              separators=(',', ':'))
+        except TypeError:
+            raise ValueError('only specs of JSON values can be cached')
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the result stored under <key>, or None if there is none."""
+        path = self._path(key)
+        try:
+            with open(path) as entry:
+                res = json.load(entry)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return res
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store <result> under <key>, evicting old entries if the cache is
+        too large."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    suffix='.tmp')
+        with os.fdopen(fd, 'w') as entry:
+            json.dump(result, entry)
+        size = os.path.getsize(temp)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(temp, path)
+        self._size += size - replaced
+        self._stored_since_count += 1
+        if self._size > self.max_bytes \
+                or self._stored_since_count >= RECOUNT_EVERY:
+            # Other processes may have stored or evicted entries since.
+            self._recount()
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def evict(self) -> None:
+        """Delete the entries of other code versions, then the least
+        recently used entries, until the cache takes up at most TRIM_TO of
+        max_bytes."""
+        entries = sorted(self._entries(True))
+        size = sum(entry[3] for entry in entries)
+        for _, _, path, entry_size in entries:
+            if size <= TRIM_TO * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process evicted it already.
+                pass
+            size -= entry_size
+        self._size = size
+        self._stored_since_count = 0
+
+    def prune(self) -> None:
+        """Delete the entries of every other code version."""
+        for other in glob.glob(os.path.join(self.root, 'v-*')):
+            if os.path.abspath(other) != os.path.abspath(self.directory):
+                shutil.rmtree(other, ignore_errors=True)
+        self._recount()
+
+    def clear(self) -> None:
+        """Delete every entry of the current code version."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self._recount()
+
+    def __len__(self) -> int:
+        """Return the number of entries of the current code version."""
+        return len(self._entries())
+
+    def _recount(self) -> None:
+        """Set the size of the cache to the size of its entries on disk."""
+        self._size = sum(size for _, _, _, size in self._entries(True))
+        self._stored_since_count = 0
+
+    def _path(self, key: str) -> str:
+        """Return the file of the entry <key>."""
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _entries(self, all_versions: bool = False
+                 ) -> List[Tuple[bool, float, str, int]]:
+        """Return whether each entry is of the current code version, and its
+        modification time, path and size, for the entries of the current
+        code version, or of every version if <all_versions> is True."""
+        res = []
+        directories = [self.directory]
+        if all_versions:
+            directories = glob.glob(os.path.join(self.root, 'v-*'))
+        current = os.path.abspath(self.directory)
+        for directory in directories:
+            is_current = os.path.abspath(directory) == current
+            for path in glob.glob(os.path.join(directory, '*', '*.json')):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                res.append((is_current, stat.st_mtime, path, stat.st_size))
+        return res
+
+
+def code_version() -> str:
+    """Return the hash of the source files of the modules a simulation runs
+    (see simulator_modules)."""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for path in simulator_modules():
+            name = os.path.basename(path)
+            digest.update(name.encode())
+            with open(path, 'rb') as source:
+                digest.update(hashlib.sha256(source.read()).digest())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def simulator_modules() -> List[str]:
+    """Return the sorted paths of the modules in this directory that
+    simulation.py, registry.py and this module import, directly or not,
+    including the imports inside functions."""
+    found = set()
+    to_visit = list(_ROOT_MODULES)
+    while len(to_visit) > 0:
+        name = to_visit.pop()
+        path = os.path.join(_SOURCE_DIR, name + '.py')
+        if name in found or not os.path.isfile(path):
+            continue
+        found.add(name)
+        with open(path, 'rb') as source:
+            tree = ast.parse(source.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                to_visit.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                to_visit.append(node.module)
+    return sorted(os.path.join(_SOURCE_DIR, name + '.py') for name in found)
+
+
+def file_hash(filename: str) -> str:
+    """Return the SHA-256 hash of the contents of <filename>, computed once
+    per process for each version of the file."""
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime, stat.st_size)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as data:
+            for block in iter(lambda: data.read(1 << 20), b''):
+                digest.update(block)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+def _normalize(value: Any) -> Any:
+    """Return <value> with every 'filename' entry replaced by a hash of the
+    file's contents, and 'visualize' entries removed."""
+    if isinstance(value, dict):
+        res = {}
+        for key, item in value.items():
+            if key == 'filename':
+                res['file_sha256'] = file_hash(item)
+            elif key != 'visualize':
+                res[key] = _normalize(item)
+        return res
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
@@ -0,0 +1,544 @@
+"""CSC148 Assignment 1 - Run Logs
+
+=== Module Description ===
+A run log records everything that happens in a Simulation run, so that the
+run can be watched again or analyzed without running any algorithm:
+
+    - RunLogWriter is given to a Simulation under the optional 'run_log'
+      configuration key, and writes the log while the simulation runs.
+    - RunLog reads a log, and Replay rebuilds the simulation state from it,
+      round by round, optionally showing each round on a Visualizer.
+
+Run this module to replay a log:
+    python run_log.py run.log --speed 4 --start 100
+    python run_log.py run.log --stats
+
+=== Format ===
+All numbers are unsigned LEB128 varints; signed numbers are zigzag-encoded
+first. Every person is identified by the order of their arrival (their id).
+
+    header    b'ELRL', version, num_floors, num_elevators, capacity,
+              keyframe_interval
+    records   one per round, preceded every keyframe_interval rounds by a
+              keyframe record
+    index     the number of rounds, the number of keyframes, and the round
+              and file offset of each keyframe
+    trailer   the offset of the index as a little-endian uint64, then b'ELRX'
+
+A round record is the byte 0 followed by the round's arrivals (a count, then
+each person's start and target floor, in the order they joined the queues),
+its disembarkings and its boardings (a count, then each person's elevator
+index and the signed difference between their id and the previous id in the
+list), and the signed change in the location of each elevator.
+
+A keyframe record is the byte 1 followed by the state at the start of its
+round: the round, the next id, the count, total, minimum + 1 and maximum + 1
+of the finished wait times, then the queue of each floor and the passengers
+of each elevator (each a location for elevators, a count, then each person's
+id, start floor, target floor and wait time).
+"""
+import struct
+import time
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from algorithms import Direction
+from entities import Elevator, Person, sprite_classes
+
+MAGIC = b'ELRL'
+INDEX_MAGIC = b'ELRX'
+VERSION = 1
+
+_ROUND = 0
+_KEYFRAME = 1
+_TRAILER = struct.Struct('<Q')
+
+
+class RunLogWriter:
+    """Writes the log of a Simulation run.
+
+    The simulation calls begin_round, arrive, leave, board and end_round as
+    each round happens. Call close once the run is over, or use the writer in
+    a with statement.
+
+    === Attributes ===
+    keyframe_interval: the number of rounds between keyframes.
+    rounds_written: the number of rounds logged so far.
+
+    === Representation invariants ===
+    keyframe_interval >= 1
+    """
+    keyframe_interval: int
+    rounds_written: int
+    _out: BinaryIO
+    _owns_file: bool
+    _ids: Dict[Person, int]
+    _next_id: int
+    _elevators: Dict[Elevator, int]
+    _locations: List[int]
+    _finished: List[int]
+    _keyframes: List[Tuple[int, int]]
+    _offset: int
+    _arrivals: List[Person]
+    _leaving: List[Tuple[int, int]]
+    _boarding: List[Tuple[int, int]]
+
+    def __init__(self, out: Any, keyframe_interval: int = 100) -> None:
+        """Initialize a new writer to the file name or binary file <out>."""
+        self._owns_file = isinstance(out, str)
+        if self._owns_file:
+            out = open(out, 'wb', buffering=1 << 16)
+        self._out = out
+        self.keyframe_interval = keyframe_interval
+        self.rounds_written = 0
+        self._ids = {}
+        self._next_id = 0
+        self._elevators = {}
+        self._locations = []
+        # count, total, minimum and maximum of the finished wait times
+        self._finished = [0, 0, -1, -1]
+        # (round, offset) of every keyframe
+        self._keyframes = []
+        self._offset = 0
+        self._arrivals = []
+        self._leaving = []
+        self._boarding = []
+
+    def begin_round(self, round_num: int, elevators: List[Elevator],
+                    waiting: Dict[int, List[Person]], num_floors: int,
+                    capacity: int) -> None:
+        """Start logging round <round_num> of a simulation with the given
+        state, writing a keyframe if one is due."""
+        if len(self._elevators) == 0:
+            self._elevators = {e: i for i, e in enumerate(elevators)}
+            self._locations = [e.location for e in elevators]
+            header = bytearray(MAGIC)
+            for number in (VERSION, num_floors, len(elevators), capacity,
+                           self.keyframe_interval):
+                _write_varint(header, number)
+            self._write(header)
+        if round_num % self.keyframe_interval == 0:
+            self._keyframes.append((round_num, self._offset))
+            self._write(self._keyframe(round_num, elevators, waiting,
+                                       num_floors))
+
+    def arrive(self, arrivals: Dict[int, List[Person]]) -> None:
+        """Log the arrivals of this round."""
+        for floor in sorted(arrivals):
+            for person in arrivals[floor]:
+                self._ids[person] = self._next_id
+                self._next_id += 1
+                self._arrivals.append(person)
+
+    def leave(self, person: Person, elevator: Elevator) -> None:
+        """Log that <person> left <elevator> at their target floor."""
+        self._leaving.append((self._elevators[elevator],
+                              self._ids.pop(person)))
+        finished = self._finished
+        finished[0] += 1
+        finished[1] += person.wait_time
+        if finished[2] == -1 or person.wait_time < finished[2]:
+            finished[2] = person.wait_time
+        finished[3] = max(finished[3], person.wait_time)
+
+    def board(self, person: Person, elevator: Elevator) -> None:
+        """Log that <person> boarded <elevator>."""
+        self._boarding.append((self._elevators[elevator], self._ids[person]))
+
+    def end_round(self, elevators: List[Elevator]) -> None:
+        """Log the elevators' moves and finish logging this round."""
+        record = bytearray((_ROUND,))
+        _write_varint(record, len(self._arrivals))
+        for person in self._arrivals:
+            _write_varint(record, person.start)
+            _write_varint(record, person.target)
+        for events in (self._leaving, self._boarding):
+            _write_varint(record, len(events))
+            previous = 0
+            for index, person_id in events:
+                _write_varint(record, index)
+                _write_varint(record, _zigzag(person_id - previous))
+                previous = person_id
+        for i, elevator in enumerate(elevators):
+            _write_varint(record, _zigzag(elevator.location
+                                          - self._locations[i]))
+            self._locations[i] = elevator.location
+        self._write(record)
+        self._arrivals.clear()
+        self._leaving.clear()
+        self._boarding.clear()
+        self.rounds_written += 1
+
+    def close(self) -> None:
+        """Write the keyframe index and close the log.
+
+        A log closed before any round began gets a header of zeros, so that
+        it can still be read as a log of no rounds.
+        """
+        if self._offset == 0:
+            header = bytearray(MAGIC)
+            for number in (VERSION, 0, 0, 0, self.keyframe_interval):
+                _write_varint(header, number)
+            self._write(header)
+        index = bytearray()
+        _write_varint(index, self.rounds_written)
+        _write_varint(index, len(self._keyframes))
+        for round_num, offset in self._keyframes:
+            _write_varint(index, round_num)
+            _write_varint(index, offset)
+        start = self._offset
+        self._write(index + _TRAILER.pack(start) + INDEX_MAGIC)
+        if self._owns_file:
+            self._out.close()
+        else:
+            self._out.flush()
+
+    def __enter__(self) -> 'RunLogWriter':
+        """Return this writer."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close this writer."""
+        self.close()
+
+    def _keyframe(self, round_num: int, elevators: List[Elevator],
+                  waiting: Dict[int, List[Person]],
+                  num_floors: int) -> bytearray:
+        """Return a keyframe of the state at the start of <round_num>."""
+        record = bytearray((_KEYFRAME,))
+        count, total, minimum, maximum = self._finished
+        for number in (round_num, self._next_id, count, total, minimum + 1,
+                       maximum + 1):
+            _write_varint(record, number)
+        for floor in range(1, num_floors + 1):
+            self._write_people(record, waiting[floor])
+        for elevator in elevators:
+            _write_varint(record, elevator.location)
+            self._write_people(record, elevator.passengers)
+        return record
+
+    def _write_people(self, record: bytearray, people: List[Person]) -> None:
+        """Append the count, ids, floors and wait times of <people>."""
+        _write_varint(record, len(people))
+        for person in people:
+            for number in (self._ids[person], person.start, person.target,
+                           person.wait_time):
+                _write_varint(record, number)
+
+    def _write(self, data: bytes) -> None:
+        """Write <data> to the log."""
+        self._out.write(data)
+        self._offset += len(data)
+
+
+class RunLog:
+    """A run log read into memory.
+
+    === Attributes ===
+    num_floors: the number of floors of the logged simulation.
+    num_elevators: the number of elevators.
+    capacity: the capacity of each elevator.
+    keyframe_interval: the number of rounds between keyframes.
+    num_rounds: the number of rounds logged.
+    keyframes: the round and offset of each keyframe, by round.
+    """
+    num_floors: int
+    num_elevators: int
+    capacity: int
+    keyframe_interval: int
+    num_rounds: int
+    keyframes: List[Tuple[int, int]]
+    _data: bytes
+
+    def __init__(self, filename: str) -> None:
+        """Read the run log <filename>."""
+        with open(filename, 'rb') as log:
+            self._data = log.read()
+        data = self._data
+        if data[:len(MAGIC)] != MAGIC \
+                or data[-len(INDEX_MAGIC):] != INDEX_MAGIC:
+            raise ValueError(filename + ' is not a complete run log')
+        version, pos = _read_varint(data, len(MAGIC))
+        if version != VERSION:
+            raise ValueError('unsupported run log version: ' + str(version))
+        header = []
+        for _ in range(4):
+            number, pos = _read_varint(data, pos)
+            header.append(number)
+        self.num_floors, self.num_elevators, self.capacity, \
+            self.keyframe_interval = header
+        pos = _TRAILER.unpack_from(data, len(data) - len(INDEX_MAGIC)
+                                   - _TRAILER.size)[0]
+        self.num_rounds, pos = _read_varint(data, pos)
+        num_keyframes, pos = _read_varint(data, pos)
+        self.keyframes = []
+        for _ in range(num_keyframes):
+            round_num, pos = _read_varint(data, pos)
+            offset, pos = _read_varint(data, pos)
+            self.keyframes.append((round_num, offset))
+
+    def replay(self, round_num: int = 0, drawable: bool = False) -> 'Replay':
+        """Return a replay positioned at the start of round <round_num>,
+        whose elevators and people are sprites if <drawable> is True."""
+        return Replay(self, round_num, drawable)
+
+
+class Replay:
+    """A simulation state rebuilt from a run log.
+
+    === Attributes ===
+    log: the log being replayed.
+    round_num: the round that the next step replays.
+    elevators: the elevators, as in the logged simulation.
+    waiting: the people waiting on each floor.
+    """
+    log: RunLog
+    round_num: int
+    elevators: List[Elevator]
+    waiting: Dict[int, List[Person]]
+    _people: Dict[int, Person]
+    _next_id: int
+    _finished: List[int]
+    _pos: int
+    _elevator_class: type
+    _person_class: type
+
+    def __init__(self, log: RunLog, round_num: int = 0,
+                 drawable: bool = False) -> None:
+        """Initialize a replay of <log> at the start of <round_num>, starting
+        from the last keyframe at or before it. If <drawable> is True, its
+        elevators and people are sprites, so that it can be visualized.
+
+        Raise ValueError if <log> has no rounds, since there is then no
+        state to replay.
+
+        Precondition: 0 <= round_num <= log.num_rounds
+        """
+        if len(log.keyframes) == 0:
+            raise ValueError('the run log has no rounds to replay')
+        self.log = log
+        self._elevator_class, self._person_class = Elevator, Person
+        if drawable:
+            self._elevator_class, self._person_class = sprite_classes()
+        start, offset = log.keyframes[0]
+        for keyframe in log.keyframes:
+            if keyframe[0] <= round_num:
+                start, offset = keyframe
+        self._pos = offset
+        self._read_keyframe()
+        while self.round_num < round_num:
+            self.step()
+
+    def step(self, visualizer: Any = None) -> None:
+        """Replay one round, showing it on <visualizer> if it is given."""
+        data = self.log._data
+        if data[self._pos] == _KEYFRAME:
+            self._skip_keyframe()
+        pos = self._pos + 1
+        if visualizer is not None:
+            visualizer.render_header(self.round_num)
+        # Stage 1: arrivals
+        count, pos = _read_varint(data, pos)
+        arrivals = {}
+        for _ in range(count):
+            start, pos = _read_varint(data, pos)
+            target, pos = _read_varint(data, pos)
+            person = self._person_class(start, target)
+            self._people[self._next_id] = person
+            self._next_id += 1
+            arrivals.setdefault(start, []).append(person)
+            self.waiting[start].append(person)
+        if visualizer is not None:
+            visualizer.show_arrivals(arrivals)
+        # Stage 2: disembarking
+        events, pos = _read_events(data, pos)
+        for index, person_id in events:
+            elevator = self.elevators[index]
+            person = self._people.pop(person_id)
+            elevator.passengers.remove(person)
+            self._finish(person)
+            if visualizer is not None:
+                visualizer.show_disembarking(person, elevator)
+        # Stage 3: boarding
+        events, pos = _read_events(data, pos)
+        for index, person_id in events:
+            elevator = self.elevators[index]
+            person = self._people[person_id]
+            self.waiting[person.start].remove(person)
+            elevator.passengers.append(person)
+            if visualizer is not None:
+                visualizer.show_boarding(person, elevator)
+        # Stage 4: moves
+        directions = []
+        for elevator in self.elevators:
+            change, pos = _read_varint(data, pos)
+            change = _unzigzag(change)
+            elevator.location += change
+            directions.append(Direction((change > 0) - (change < 0)))
+        if visualizer is not None:
+            visualizer.show_elevator_moves(self.elevators, directions)
+        for person in self._people.values():
+            person.wait_time += 1
+        self._pos = pos
+        self.round_num += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return the statistics Simulation.run would have returned after
+        the rounds replayed so far."""
+        count, total, minimum, maximum = self._finished
+        avg = -1
+        if count > 0:
+            avg = int(total / count)
+        return {
+            'num_iterations': self.round_num,
+            'total_people': count + len(self._people),
+            'people_completed': count,
+            'max_time': maximum,
+            'min_time': minimum,
+            'avg_time': avg
+        }
+
+    def _finish(self, person: Person) -> None:
+        """Record that <person> reached their target floor."""
+        finished = self._finished
+        finished[0] += 1
+        finished[1] += person.wait_time
+        if finished[2] == -1 or person.wait_time < finished[2]:
+            finished[2] = person.wait_time
+        finished[3] = max(finished[3], person.wait_time)
+
+    def _read_keyframe(self) -> None:
+        """Rebuild the state from the keyframe at the current position."""
+        data = self.log._data
+        pos = self._pos + 1
+        header = []
+        for _ in range(6):
+            number, pos = _read_varint(data, pos)
+            header.append(number)
+        self.round_num, self._next_id = header[0], header[1]
+        self._finished = [header[2], header[3], header[4] - 1, header[5] - 1]
+        self._people = {}
+        self.waiting = {}
+        for floor in range(1, self.log.num_floors + 1):
+            self.waiting[floor], pos = self._read_people(data, pos)
+        self.elevators = []
+        for _ in range(self.log.num_elevators):
+            elevator = self._elevator_class(self.log.capacity)
+            elevator.location, pos = _read_varint(data, pos)
+            elevator.passengers, pos = self._read_people(data, pos)
+            self.elevators.append(elevator)
+        self._pos = pos
+
+    def _skip_keyframe(self) -> None:
+        """Move past the keyframe at the current position, whose state is
+        the one already replayed."""
+        data = self.log._data
+        pos = self._pos + 1
+        for _ in range(6):
+            _, pos = _read_varint(data, pos)
+        for group in range(self.log.num_floors + self.log.num_elevators):
+            if group >= self.log.num_floors:
+                _, pos = _read_varint(data, pos)
+            count, pos = _read_varint(data, pos)
+            for _ in range(4 * count):
+                _, pos = _read_varint(data, pos)
+        self._pos = pos
+
+    def _read_people(self, data: bytes, pos: int) -> Tuple[List[Person], int]:
+        """Read a list of people from a keyframe."""
+        count, pos = _read_varint(data, pos)
+        res = []
+        for _ in range(count):
+            numbers = []
+            for _ in range(4):
+                number, pos = _read_varint(data, pos)
+                numbers.append(number)
+            person = self._person_class(numbers[1], numbers[2])
+            person.wait_time = numbers[3]
+            self._people[numbers[0]] = person
+            res.append(person)
+        return res, pos
+
+
+def _read_events(data: bytes, pos: int) -> Tuple[List[Tuple[int, int]], int]:
+    """Read a list of (elevator index, person id) events."""
+    count, pos = _read_varint(data, pos)
+    res = []
+    person_id = 0
+    for _ in range(count):
+        index, pos = _read_varint(data, pos)
+        change, pos = _read_varint(data, pos)
+        person_id += _unzigzag(change)
+        res.append((index, person_id))
+    return res, pos
+
+
+def _write_varint(out: bytearray, number: int) -> None:
+    """Append the non-negative <number> to <out> as a varint."""
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Return the varint at <pos> in <data> and the position after it."""
+    number = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, pos
+        shift += 7
+
+
+def _zigzag(number: int) -> int:
+    """Return <number> mapped to a non-negative int: 0, -1, 1, -2, ... become
+    0, 1, 2, 3, ..."""
+    return number * 2 if number >= 0 else -number * 2 - 1
+
+
+def _unzigzag(number: int) -> int:
+    """Return the inverse of _zigzag."""
+    return number // 2 if number % 2 == 0 else -(number + 1) // 2
+
+
+def play(log: RunLog, start: int = 0, stop: Optional[int] = None,
+         speed: float = 1.0) -> Dict[str, int]:
+    """Show rounds <start> to <stop> of <log> on a Visualizer, at <speed>
+    rounds per second (as fast as possible if <speed> is 0), and return the
+    statistics at the end."""
+    from visualizer import Visualizer
+    replay = log.replay(start, drawable=True)
+    visualizer = Visualizer(replay.elevators, log.num_floors, True)
+    if stop is None:
+        stop = log.num_rounds
+    while replay.round_num < stop:
+        replay.step(visualizer)
+        if speed > 0:
+            visualizer.wait(1 / speed)
+    return replay.stats()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay a run log.')
+    parser.add_argument('log', help='the run log to replay')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--stop', type=int, default=None)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='rounds per second, or 0 for no delay')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the statistics instead of visualizing')
+    args = parser.parse_args()
+    run_log = RunLog(args.log)
+    if args.stats:
+        began = time.perf_counter()
+        headless = run_log.replay(args.stop if args.stop is not None
+                                  else run_log.num_rounds)
+        print(headless.stats())
+        print('replayed in {:.3f} s'.format(time.perf_counter() - began))
+    else:
+        print(play(run_log, args.start, args.stop, args.speed))
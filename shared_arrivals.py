@@ -0,0 +1,146 @@
+"""CSC148 Assignment 1 - Shared Arrivals
+
+=== Module Description ===
+This module contains SharedFileArrivals, an arrival generator that reads the
+same CSV files as FileArrivals, but keeps the parsed arrivals in a shared
+memory segment instead of a dictionary.
+
+The file is parsed once, by the process that creates the generator. When the
+generator is sent to worker processes (for example as part of a simulation
+configuration passed to a multiprocessing pool), only the name of the segment
+is pickled, and every worker reads the arrivals from the same memory without
+copying them. Memory use therefore stays the same as workers are added.
+
+The segment holds an array of C ints:
+    [num_rounds, offsets[0], ..., offsets[num_rounds], pairs...]
+where the arrivals of round r are the (start, target) pairs stored between
+positions offsets[r] and offsets[r + 1] of the pairs.
+
+A segment cannot be closed while a view of its memory is alive. Every
+process that attaches to the segment registers a finalizer that releases
+the view and then closes the segment. The finalizer runs when the generator
+is closed or garbage collected, or when the process (such as a pool worker)
+exits.
+"""
+from array import array
+from multiprocessing import shared_memory, util
+from typing import Any, Dict, List, Optional
+
+from algorithms import ArrivalGenerator, FileArrivals
+from entities import Person
+
+
+class SharedFileArrivals(ArrivalGenerator):
+    """Generate arrivals from a CSV file parsed once into shared memory.
+
+    The process that creates a SharedFileArrivals owns the segment, and should
+    call unlink() once every worker is done with it.
+
+    === Attributes ===
+    max_floor: The maximum floor number for the building.
+    num_people: Always None, since the number of arrivals depends on the file.
+    name: The name of the shared memory segment holding the arrivals.
+    """
+    name: str
+    _shm: Optional[shared_memory.SharedMemory]
+    _ints: Optional[memoryview]
+    _num_rounds: int
+    _finalizer: Optional[util.Finalize]
+
+    def __init__(self, max_floor: int, filename: str) -> None:
+        """Initialize a new SharedFileArrivals from the given file.
+
+        Precondition:
+            <filename> refers to a valid CSV file, following the specified
+            format and restrictions from the assignment handout.
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        arrival_dict = FileArrivals(max_floor, filename).arrival_dict
+        self._num_rounds = max(arrival_dict, default=-1) + 1
+        offsets = [0]
+        pairs = []
+        for round_num in range(self._num_rounds):
+            pairs.extend(arrival_dict.get(round_num, []))
+            offsets.append(len(pairs))
+        values = [self._num_rounds] + offsets + pairs
+        self._open(shared_memory.SharedMemory(
+            create=True, size=len(values) * array('i').itemsize))
+        self._ints[:len(values)] = array('i', values)
+        self.name = self._shm.name
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle only the segment name, not the arrivals themselves."""
+        return {'max_floor': self.max_floor, 'num_people': self.num_people,
+                'name': self.name, '_num_rounds': self._num_rounds}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore a generator that attaches to the segment when first used.
+        """
+        self.__dict__.update(state)
+        self._shm = None
+        self._ints = None
+        self._finalizer = None
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Generate a Dict in which each floor index is corresponding to a list
+        of person that arrived at this floor with the given file.
+
+        Floors where nobody arrived are left out.
+        """
+        res = {}
+        if round_num < 0 or round_num >= self._num_rounds:
+            return res
+        ints = self._attach()
+        base = self._num_rounds + 2
+        for i in range(base + ints[1 + round_num],
+                       base + ints[2 + round_num], 2):
+            start = ints[i]
+            res.setdefault(start, []).append(Person(start, ints[i + 1]))
+        return res
+
+    def close(self) -> None:
+        """Detach this process from the segment."""
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+            self._ints = None
+            self._shm = None
+
+    def unlink(self) -> None:
+        """Detach from and destroy the segment. Only the process that created
+        this generator should call this.
+        """
+        self.close()
+        segment = shared_memory.SharedMemory(name=self.name)
+        segment.close()
+        segment.unlink()
+
+    def _attach(self) -> memoryview:
+        """Return the ints of the segment, attaching to it if needed."""
+        if self._ints is None:
+            self._open(shared_memory.SharedMemory(name=self.name))
+        return self._ints
+
+    def _open(self, segment: shared_memory.SharedMemory) -> None:
+        """Use <segment>, and register the finalizer that detaches from it.
+        """
+        self._shm = segment
+        self._ints = segment.buf.cast('i')
+        self._finalizer = util.Finalize(self, _detach,
+                                        args=(segment, self._ints),
+                                        exitpriority=0)
+
+
+def _detach(segment: shared_memory.SharedMemory, ints: memoryview) -> None:
+    """Release <ints>, the view of <segment>, and close <segment>."""
+    ints.release()
+    segment.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['algorithms', 'entities', 'array',
+                          'multiprocessing'],
+        'max-nested-blocks': 4
+    })
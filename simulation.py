@@ -16,11 +16,23 @@ remove any of the existing attributes.
 """
 # You may import more things from these modules (e.g., additional types from
 # typing), but you may not import from any other modules.
-from typing import Dict, List, Any
+from __future__ import annotations
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
 
 import algorithms
-from entities import Person, Elevator
-from visualizer import Visualizer
+from anger import AngerIndex
+from demand import DemandEstimator
+from destination_dispatch import DestinationDispatcher
+from entities import Person, Elevator, make_drawable, sprite_classes
+from frame_skip import FrameSkippingVisualizer
+from registry import build_config
+from run_log import RunLogWriter
+from wait_stats import WaitHistogram
+from waiting import WaitingQueues
+from zones import ZonedAlgorithm, ZoneTable
+
+if TYPE_CHECKING:
+    from visualizer import Visualizer
 
 
 class Simulation:
@@ -31,11 +43,17 @@ class Simulation:
     elevators: a list of the elevators in the simulation.
     moving_algorithm: the algorithm used to decide how to move elevators.
     num_floors: the number of floors.
-    visualizer: the Pygame visualizer used to visualize this simulation.
+    visualizer: the Pygame visualizer used to visualize this simulation
+                (wrapped in a FrameSkippingVisualizer if only some rounds
+                are drawn), or a visualizer that draws nothing if it is not
+                visualized.
     waiting: a dictionary of people waiting for an elevator.
              (keys are floor numbers, values are the list of waiting people)
+             Only the floors where someone is waiting are stored (see
+             WaitingQueues).
     all_finished: a list of all passengers reached their target floor in
-                  this simulation.
+                  this simulation (empty if finished people are not kept).
+    rounds_run: the number of rounds run so far.
 
     === Representation invariants ===
     num_floors >= 2
@@ -46,26 +64,144 @@ class Simulation:
     moving_algorithm: algorithms.MovingAlgorithm
     num_floors: int
     visualizer: Visualizer
-    waiting: Dict[int, List[Person]]
+    waiting: WaitingQueues
     all_finished: List[Person]
+    rounds_run: int
+    _drawable: bool
+    _kinematic: bool
+    _balanced_boarding: bool
+    _dispatcher: Optional[DestinationDispatcher]
+    _demand_estimator: Optional[DemandEstimator]
+    _anger_index: Optional[AngerIndex]
+    _run_log: Optional[RunLogWriter]
+    _wait_histogram: Optional[WaitHistogram]
+    _keep_finished: bool
+    _zones: Optional[ZoneTable]
 
     def __init__(self,
                  config: Dict[str, Any]) -> None:
-        """Initialize a new simulation using the given configuration."""
+        """Initialize a new simulation using the given configuration.
+
+        The optional keys 'elevator_speed', 'elevator_acceleration',
+        'door_dwell' and 'boarding_time' give the elevators a travel-time and
+        dwell model (see Elevator). When any of them is set, elevators head
+        for the floors chosen by the moving algorithm's target_floors and can
+        move several floors per round.
+
+        If the optional key 'boarding' is 'balanced', people waiting on a
+        floor with several elevators are spread over those elevators by
+        direction of travel instead of all boarding the first one.
+
+        If the optional key 'dispatcher' is a DestinationDispatcher, every
+        arrival is assigned an elevator, and people only board the elevator
+        they were assigned.
+
+        If the optional key 'demand_estimator' is a DemandEstimator, it
+        observes every round's arrivals.
+
+        If the optional key 'anger_index' is an AngerIndex, it is kept up to
+        date with the anger level of everyone in the simulation.
+
+        If the optional key 'run_log' is a RunLogWriter, every round is
+        written to it; the caller closes it once the run is over.
+
+        If the optional key 'wait_histogram' is a WaitHistogram, the wait
+        time of everyone who reaches their target floor is recorded in it.
+        If the optional key 'keep_finished' is False, finished people are
+        not kept in all_finished, and the statistics are computed from the
+        wait histogram (a new one if none is given).
+
+        The optional keys 'backlog_threshold', 'balk_at' and 'patience' turn
+        on overload mode (see WaitingQueues): long queues are kept as counts,
+        and people balk or abandon their queue. The statistics then also
+        count the people who balked ('people_balked') or abandoned their
+        queue ('people_abandoned'), and total_people includes them. Overload
+        mode cannot be combined with visualization, a dispatcher, an anger
+        index or a run log, which follow every person.
+
+        If the optional key 'zones' is a ZoneTable, or a list of the floors
+        served by each elevator, people only board elevators that serve
+        their trip, or take them to a transfer floor (see ZoneTable). The
+        moving algorithm must then be a ZonedAlgorithm for the same zones,
+        since other algorithms send elevators to floors they do not serve.
+        Zones cannot be combined with a dispatcher, balanced boarding, an
+        anger index or a run log, which do not handle transfers.
+
+        If the simulation is visualized and the optional key 'render_every'
+        or 'target_fps' is set, only every render_every-th round, or
+        target_fps rounds per second, are drawn (see FrameSkippingVisualizer)
+        and the simulation runs as fast as it can in between.
+        """
 
+        # Visualized runs draw sprite versions of the elevators and people.
+        self._drawable = bool(config['visualize'])
+        elevator_class = Elevator
+        if self._drawable:
+            elevator_class = sprite_classes()[0]
         self.num_floors = config['num_floors']
         self.elevators = []
+        speed = config.get('elevator_speed', 1)
+        acceleration = config.get('elevator_acceleration')
+        dwell_time = config.get('door_dwell', 0)
+        boarding_time = config.get('boarding_time', 0)
         for _ in range(config['num_elevators']):
-            self.elevators.append(Elevator(config['elevator_capacity']))
+            self.elevators.append(elevator_class(config['elevator_capacity'],
+                                                 speed, acceleration,
+                                                 dwell_time, boarding_time))
+        self._kinematic = (speed != 1 or acceleration is not None
+                           or dwell_time != 0 or boarding_time != 0)
+        self._balanced_boarding = config.get('boarding') == 'balanced'
+        self._dispatcher = config.get('dispatcher')
+        self._demand_estimator = config.get('demand_estimator')
+        self._anger_index = config.get('anger_index')
+        self._run_log = config.get('run_log')
+        self._wait_histogram = config.get('wait_histogram')
+        self._keep_finished = config.get('keep_finished', True)
+        if self._wait_histogram is None and not self._keep_finished:
+            self._wait_histogram = WaitHistogram()
         self.moving_algorithm = (config['moving_algorithm'])
         self.arrival_generator = (config['arrival_generator'])
-        self.waiting = {}
-        for floor in range(1, self.num_floors + 1):
-            self.waiting[floor] = []
+        overload = {key: config.get(key) for key in
+                    ['backlog_threshold', 'balk_at', 'patience']}
+        if any(value is not None for value in overload.values()) and (
+                config['visualize'] or self._dispatcher is not None
+                or self._anger_index is not None
+                or self._run_log is not None):
+            raise ValueError('overload mode cannot be combined with '
+                             'visualization, a dispatcher, an anger index '
+                             'or a run log')
+        self.waiting = WaitingQueues(**overload)
+        self._zones = config.get('zones')
+        if self._zones is not None:
+            if not isinstance(self._zones, ZoneTable):
+                self._zones = ZoneTable(self._zones, self.num_floors)
+            if len(self._zones.served) != len(self.elevators):
+                raise ValueError('zones must list the floors served by '
+                                 'each elevator')
+            if not isinstance(self.moving_algorithm, ZonedAlgorithm) \
+                    or self.moving_algorithm.table.served \
+                    != self._zones.served:
+                raise ValueError('zones need a ZonedAlgorithm for the same '
+                                 'zones')
+            if self._dispatcher is not None or self._balanced_boarding \
+                    or self._anger_index is not None \
+                    or self._run_log is not None:
+                raise ValueError('zones cannot be combined with a '
+                                 'dispatcher, balanced boarding, an anger '
+                                 'index or a run log')
         self.all_finished = []
-        self.visualizer = Visualizer(self.elevators,
-                                     self.num_floors,
-                                     config['visualize'])
+        self.rounds_run = 0
+        if config['visualize']:
+            from visualizer import Visualizer
+            self.visualizer = Visualizer(self.elevators,
+                                         self.num_floors,
+                                         config['visualize'])
+            if 'render_every' in config or 'target_fps' in config:
+                self.visualizer = FrameSkippingVisualizer(
+                    self.visualizer, config.get('render_every', 1),
+                    config.get('target_fps'))
+        else:
+            self.visualizer = _HeadlessVisualizer()
 
     ############################################################################
     # Handle rounds of simulation.
@@ -78,79 +214,312 @@ class Simulation:
 
         Precondition: num_rounds >= 1.
 
-        Note: each run of the simulation starts from the same initial state
-        (no people, all elevators are empty and start at floor 1).
+        Note: the first run of the simulation starts from the initial state
+        (no people, all elevators are empty and start at floor 1). Each later
+        run continues where the previous one stopped, so running 10 rounds
+        and then 5 more gives the same statistics as running 15 rounds.
         """
-        for i in range(num_rounds):
+        for _ in range(num_rounds):
+            self.begin_round()
+            self.end_round()
 
-            self.visualizer.render_header(i)
+        if isinstance(self.visualizer, FrameSkippingVisualizer):
+            # Draw the final state, even if no frame was due.
+            self.visualizer.flush()
+        return self.stats()
 
-            # Stage 1: generate new arrivals
-            self._generate_arrivals(i)
+    def begin_round(self) -> None:
+        """Run the stages of the next round that come before the elevators
+        move: new arrivals, leaving and boarding.
 
-            # Stage 2: leave elevators
-            self._handle_leaving()
+        The caller then finishes the round with end_round.
+        """
+        self.visualizer.render_header(self.rounds_run)
 
-            # Stage 3: board elevators
-            self._handle_boarding()
+        # Stage 1: generate new arrivals
+        self._generate_arrivals(self.rounds_run)
 
-            # Stage 4: move the elevators using the moving algorithm
-            self._move_elevators()
+        # Stage 2: leave elevators
+        self._handle_leaving()
 
-            for floor in range(1, self.num_floors + 1):
-                for person in self.waiting[floor]:
-                    person.wait_time += 1
-            for elevator in self.elevators:
-                for passenger in elevator.passengers:
-                    passenger.wait_time += 1
+        # Stage 3: board elevators
+        self._handle_boarding()
+
+    def end_round(self) -> None:
+        """Finish the round started by begin_round: move the elevators using
+        the moving algorithm, and add the round to everyone's wait time."""
+        # Stage 4: move the elevators using the moving algorithm
+        self._move_elevators()
+
+        self._increase_wait_times()
+
+        # Pause for 1 second
+        self.visualizer.wait(1)
+        self.rounds_run += 1
+
+    def run_checkpoints(self, checkpoints: List[int]
+                        ) -> Dict[int, Dict[str, int]]:
+        """Run the simulation until the last of <checkpoints>, and return the
+        statistics after each checkpoint's total number of rounds.
+
+        Precondition: every checkpoint is greater than the number of rounds
+        already run.
+        """
+        res = {}
+        for checkpoint in sorted(set(checkpoints)):
+            res[checkpoint] = self.run(checkpoint - self.rounds_run)
+        return res
 
-            # Pause for 1 second
-            self.visualizer.wait(1)
+    def stats(self) -> Dict[str, int]:
+        """Return the statistics of every round run so far."""
+        return self._calculate_stats(self.rounds_run)
 
-        return self._calculate_stats(num_rounds)
+    def reset(self) -> None:
+        """Go back to the initial state, as if no round had been run, keeping
+        the elevators, the waiting queues and the objects of the
+        configuration.
+
+        The dispatcher, demand estimator, anger index, wait histogram and the
+        decisions of a CachedAlgorithm are cleared too.
+
+        Raise ValueError if this simulation writes a run log, which holds a
+        single run.
+        """
+        if self._run_log is not None:
+            raise ValueError('a simulation writing a run log cannot be reset')
+        for elevator in self.elevators:
+            elevator.passengers.clear()
+            elevator.location = 1
+            elevator.velocity = 0
+            elevator.direction = 0
+            elevator.hold = 0
+        self.waiting.clear()
+        self.all_finished.clear()
+        self.rounds_run = 0
+        for state in [self._wait_histogram, self._dispatcher,
+                      self._demand_estimator, self._anger_index]:
+            if state is not None:
+                state.clear()
+        if isinstance(self.moving_algorithm, algorithms.CachedAlgorithm):
+            self.moving_algorithm.clear()
+
+    def _increase_wait_times(self) -> None:
+        """Add a round to the wait time of everyone who has not yet reached
+        their target floor."""
+        for people in self.waiting.values():
+            for person in people:
+                person.wait_time += 1
+        self.waiting.advance()
+        for elevator in self.elevators:
+            for passenger in elevator.passengers:
+                passenger.wait_time += 1
+        if self._anger_index is not None:
+            self._anger_index.advance()
 
     def _generate_arrivals(self, round_num: int) -> None:
         """Generate and visualize new arrivals."""
+        if self._run_log is not None:
+            self._run_log.begin_round(round_num, self.elevators, self.waiting,
+                                      self.num_floors,
+                                      self.elevators[0].capacity)
         new_arrival = self.arrival_generator.generate(round_num)
-        for floor in range(1, self.num_floors + 1):
-            self.waiting[floor] = self.waiting[floor] + \
-                                  new_arrival.get(floor, [])
+        if self._drawable:
+            for people in new_arrival.values():
+                for person in people:
+                    make_drawable(person)
+        for floor in sorted(new_arrival):
+            people = new_arrival[floor]
+            if len(people) == 0:
+                continue
+            self.waiting.add(floor, people)
+            if self._dispatcher is not None:
+                self._dispatcher.register(people, self.elevators)
+            if self._anger_index is not None:
+                self._anger_index.arrive(people)
+        if self._demand_estimator is not None:
+            self._demand_estimator.observe(round_num, new_arrival)
+        if self._run_log is not None:
+            self._run_log.arrive(new_arrival)
         self.visualizer.show_arrivals(new_arrival)
 
     def _handle_leaving(self) -> None:
         """Handle people leaving elevators."""
-        for elevator in self.elevators:
+        for index, elevator in enumerate(self.elevators):
             remove_lst = []
             for passenger in elevator.passengers:
                 if passenger.target == elevator.location:
-                    self.all_finished.append(passenger)
+                    if self._keep_finished:
+                        self.all_finished.append(passenger)
+                    if self._wait_histogram is not None:
+                        self._wait_histogram.record(
+                            passenger.start, passenger.target, index,
+                            passenger.wait_time)
+                    if self._anger_index is not None:
+                        self._anger_index.leave(passenger)
+                    if self._run_log is not None:
+                        self._run_log.leave(passenger, elevator)
                     self.visualizer.show_disembarking(passenger, elevator)
                     remove_lst.append(passenger)
+                elif self._is_transfer(index, passenger):
+                    self._transfer(passenger, elevator)
+                    remove_lst.append(passenger)
             for passenger in remove_lst:
                 elevator.passengers.remove(passenger)
+            elevator.stop(len(remove_lst))
+
+    def _is_transfer(self, index: int, passenger: Person) -> bool:
+        """Return whether <passenger> of elevator number <index> changes
+        elevators at its current floor."""
+        return self._zones is not None and self._zones.destination(
+            index, passenger.target) == self.elevators[index].location
+
+    def _transfer(self, passenger: Person, elevator: Elevator) -> None:
+        """Move <passenger> from <elevator> to the queue on its floor, to
+        wait for an elevator that serves their target floor."""
+        self.visualizer.show_disembarking(passenger, elevator)
+        self.waiting.add(elevator.location, [passenger])
+        self.visualizer.show_arrivals({elevator.location: [passenger]})
 
     def _handle_boarding(self) -> None:
         """Handle boarding of people and visualize."""
+        if self._zones is not None:
+            self._handle_zoned_boarding()
+            return
+        if self._dispatcher is not None:
+            self._handle_assigned_boarding()
+            return
+        if self._balanced_boarding:
+            self._handle_balanced_boarding()
+            return
         for elevator in self.elevators:
-            has_people = len(self.waiting[elevator.location]) > 0
-            while elevator.fullness() < 1 and has_people:
-                first_waiting = self.waiting[elevator.location][0]
-                self.visualizer.show_boarding(first_waiting, elevator)
-                elevator.passengers.append(first_waiting)
-                self.waiting[elevator.location].pop(0)
-                has_people = len(self.waiting[elevator.location]) > 0
+            boarding = self.waiting.take(elevator.location,
+                                         elevator.remaining_capacity())
+            for person in boarding:
+                self._board(person, elevator)
+            elevator.stop(len(boarding))
+
+    def _board(self, person: Person, elevator: Elevator) -> None:
+        """Move <person> onto <elevator>, and visualize and record it.
+
+        The caller removes <person> from the waiting lists.
+        """
+        self.visualizer.show_boarding(person, elevator)
+        elevator.passengers.append(person)
+        if self._anger_index is not None:
+            self._anger_index.board(person)
+        if self._run_log is not None:
+            self._run_log.board(person, elevator)
+
+    def _handle_assigned_boarding(self) -> None:
+        """Handle boarding of people onto the elevators they were assigned
+        by the destination dispatcher, and visualize."""
+        for index, elevator in enumerate(self.elevators):
+            queue = self.waiting[elevator.location]
+            still_waiting = []
+            for person in queue:
+                if elevator.remaining_capacity() > 0 \
+                        and self._dispatcher.assigned_to(person) == index:
+                    self._board(person, elevator)
+                    self._dispatcher.board(person)
+                else:
+                    still_waiting.append(person)
+            elevator.stop(len(queue) - len(still_waiting))
+            self.waiting[elevator.location] = still_waiting
+        self._dispatcher.reassign_left_behind(self.elevators)
+
+    def _handle_zoned_boarding(self) -> None:
+        """Handle boarding of people onto the elevators that serve their
+        trip, in order of arrival, and visualize."""
+        for index, elevator in enumerate(self.elevators):
+            floor = elevator.location
+            if floor not in self.waiting \
+                    or floor not in self._zones.served[index]:
+                elevator.stop(0)
+                continue
+            still_waiting = []
+            num_boarded = 0
+            for person in self.waiting[floor]:
+                if elevator.remaining_capacity() > 0 \
+                        and self._zones.can_board(index, person, floor):
+                    self._board(person, elevator)
+                    num_boarded += 1
+                else:
+                    still_waiting.append(person)
+            self.waiting[floor] = still_waiting
+            elevator.stop(num_boarded)
+
+    def _handle_balanced_boarding(self) -> None:
+        """Handle boarding of people, spreading them over the elevators on
+        their floor by direction of travel, and visualize.
+
+        Each waiting person, in order of arrival, boards an elevator with room
+        that is already heading their way, or else an empty elevator (which
+        then heads their way), or else any elevator with room. An elevator
+        heads the way most of its passengers are going, as in _heading.
+        """
+        at_floor = {}
+        for elevator in self.elevators:
+            at_floor.setdefault(elevator.location, []).append(elevator)
+        for floor, elevators in at_floor.items():
+            queue = self.waiting[floor]
+            if len(queue) == 0:
+                continue
+            heading = {}
+            boarded = {}
+            for elevator in elevators:
+                heading[elevator] = _heading(elevator.passengers, floor)
+                boarded[elevator] = 0
+            still_waiting = []
+            for person in queue:
+                direction = _sign(person.target - floor)
+                chosen = None
+                for elevator in elevators:
+                    if elevator.remaining_capacity() <= 0:
+                        continue
+                    if heading[elevator] == direction:
+                        chosen = elevator
+                        break
+                    if chosen is None or (heading[chosen] != 0
+                                          and heading[elevator] == 0):
+                        chosen = elevator
+                if chosen is None:
+                    still_waiting.append(person)
+                    continue
+                self._board(person, chosen)
+                boarded[chosen] += 1
+                if heading[chosen] == 0:
+                    heading[chosen] = direction
+            self.waiting[floor] = still_waiting
+            for elevator in elevators:
+                elevator.stop(boarded[elevator])
 
     def _move_elevators(self) -> None:
         """Move the elevators in this simulation.
 
         Use this simulation's moving algorithm to move the elevators.
         """
-        round_move = self.moving_algorithm.move_elevators(self.elevators,
-                                                          self.waiting,
-                                                          self.num_floors)
-        for elevator in range(len(round_move)):
-            self.elevators[elevator].location += round_move[elevator].value
+        if self._kinematic:
+            round_move = self._move_elevators_to_targets()
+        else:
+            round_move = self.moving_algorithm.move_elevators_batch(
+                self.elevators, self.waiting, self.num_floors)
+            for elevator in range(len(round_move)):
+                self.elevators[elevator].location += round_move[elevator].value
         self.visualizer.show_elevator_moves(self.elevators, round_move)
+        if self._run_log is not None:
+            self._run_log.end_round(self.elevators)
+
+    def _move_elevators_to_targets(self) -> List[algorithms.Direction]:
+        """Move each elevator as far towards its target floor as its speed
+        allows this round, and return the direction each one moved in."""
+        targets = self.moving_algorithm.target_floors(self.elevators,
+                                                      self.waiting,
+                                                      self.num_floors)
+        round_move = []
+        for elevator, target in zip(self.elevators, targets):
+            step = elevator.move_towards(target)
+            round_move.append(algorithms.Direction((step > 0) - (step < 0)))
+        return round_move
 
     ############################################################################
     # Statistics calculations
@@ -158,6 +527,24 @@ class Simulation:
     def _calculate_stats(self, num_rounds: int) -> Dict[str, int]:
         """Report the statistics for the current run of this simulation.
         """
+        res = self._calculate_wait_stats(num_rounds)
+        if self.waiting.balk_at is not None:
+            res['total_people'] += self.waiting.balked
+            res['people_balked'] = self.waiting.balked
+        if self.waiting.patience is not None:
+            res['total_people'] += self.waiting.abandoned
+            res['people_abandoned'] = self.waiting.abandoned
+        return res
+
+    def _calculate_wait_stats(self, num_rounds: int) -> Dict[str, int]:
+        """Report the statistics of the people who did not leave early."""
+        if not self._keep_finished:
+            num_passengers = self._wait_histogram.count + self.waiting.total
+            for elevator in self.elevators:
+                num_passengers += len(elevator.passengers)
+            return {'num_iterations': num_rounds,
+                    'total_people': num_passengers,
+                    **self._wait_histogram.stats()}
         wait_time_lst = []
         total = 0
         for passenger in self.all_finished:
@@ -167,10 +554,7 @@ class Simulation:
             avg = int(total / len(self.all_finished))
         elif len(self.all_finished) == 0:
             avg = -1
-        waiting = 0
-        for floor in range(1, self.num_floors + 1):
-            waiting += len(self.waiting[floor])
-        num_passengers = len(self.all_finished) + waiting
+        num_passengers = len(self.all_finished) + self.waiting.total
         for elevator in self.elevators:
             num_passengers += len(elevator.passengers)
         if len(wait_time_lst) == 0:
@@ -185,6 +569,50 @@ class Simulation:
         }
 
 
+class _HeadlessVisualizer:
+    """A visualizer that draws nothing, so that headless runs never import
+    pygame."""
+
+    def render_header(self, round_num: int) -> None:
+        """Draw nothing."""
+
+    def show_arrivals(self, arrivals: Dict[int, List[Person]]) -> None:
+        """Draw nothing."""
+
+    def show_boarding(self, person: Person, elevator: Elevator) -> None:
+        """Draw nothing."""
+
+    def show_disembarking(self, person: Person, elevator: Elevator) -> None:
+        """Draw nothing."""
+
+    def show_elevator_moves(self, elevators: List[Elevator],
+                            directions: List[algorithms.Direction]) -> None:
+        """Draw nothing."""
+
+    def wait(self, duration: float) -> None:
+        """Return immediately."""
+
+
+def _sign(number: int) -> int:
+    """Return 1, 0 or -1 depending on the sign of <number>."""
+    return (number > 0) - (number < 0)
+
+
+def _heading(passengers: List[Person], floor: int) -> int:
+    """Return the direction from <floor> most of <passengers> are going in:
+    1 for up, -1 for down, or 0 if there are no passengers.
+
+    If as many go up as down, return the direction of the closest target.
+    """
+    if len(passengers) == 0:
+        return 0
+    balance = sum(_sign(p.target - floor) for p in passengers)
+    if balance != 0:
+        return _sign(balance)
+    closest = min(passengers, key=lambda p: (abs(p.target - floor), p.target))
+    return _sign(closest.target - floor)
+
+
 def sample_run() -> Dict[str, int]:
     """Run a sample simulation, and return the simulation statistics."""
     config = {
@@ -192,13 +620,14 @@ def sample_run() -> Dict[str, int]:
         'num_elevators': 6,
         'elevator_capacity': 3,
         'num_people_per_round': 2,
-        # Random arrival generator with 6 max floors and 2 arrivals per round.
-        'arrival_generator': algorithms.FileArrivals(6, 'sample_arrivals.csv'),
-        'moving_algorithm': algorithms.RandomAlgorithm(),
+        # Arrivals from sample_arrivals.csv, for a building with 6 floors.
+        'arrival_generator': {'name': 'FileArrivals',
+                              'filename': 'sample_arrivals.csv'},
+        'moving_algorithm': 'RandomAlgorithm',
         'visualize': True
     }
 
-    sim = Simulation(config)
+    sim = Simulation(build_config(config))
     stats = sim.run(8)
     return stats
 
@@ -0,0 +1,68 @@
+"""CSC148 Assignment 1 - Startup Benchmark
+
+=== Module Description ===
+Measures how long a fresh process takes to import simulation and to run its
+first round, which is what every worker of a process-pool sweep pays before
+doing useful work. Each measurement runs in a new interpreter, so nothing is
+already imported or cached.
+
+Example:
+    python startup_benchmark.py --runs 20
+    python startup_benchmark.py --visualize
+"""
+import argparse
+import json
+from statistics import median
+import subprocess
+import sys
+from typing import Dict, List
+
+# The script run in each fresh interpreter. It prints its timings as JSON.
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import simulation
+import algorithms
+imported = time.perf_counter()
+config = {{
+    'num_floors': 6,
+    'num_elevators': 6,
+    'elevator_capacity': 3,
+    'num_people_per_round': 2,
+    'arrival_generator': algorithms.RandomArrivals(6, 2),
+    'moving_algorithm': algorithms.ShortSighted(),
+    'visualize': {visualize}
+}}
+sim = simulation.Simulation(config)
+sim.run(1)
+first_round = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start,
+    'first_round': first_round - imported,
+    'pygame_loaded': 'pygame' in sys.modules
+}}))
+'''
+
+
+def measure(runs: int, visualize: bool) -> List[Dict[str, float]]:
+    """Return the timings of <runs> fresh processes."""
+    probe = _PROBE.format(visualize=visualize)
+    res = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', probe],
+                                capture_output=True, text=True, check=True)
+        res.append(json.loads(output.stdout.splitlines()[-1]))
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time importing simulation and its first round.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--visualize', action='store_true')
+    args = parser.parse_args()
+    timings = measure(args.runs, args.visualize)
+    for key in ['import', 'first_round']:
+        print('{}: median {:.1f} ms over {} runs'.format(
+            key, 1000 * median(t[key] for t in timings), args.runs))
+    print('pygame loaded:', any(t['pygame_loaded'] for t in timings))
@@ -0,0 +1,182 @@
+"""CSC148 Assignment 1 - Wait Time Histograms
+
+=== Module Description ===
+Simulation.run only reports the minimum, maximum and (truncated) average
+wait time, and finding anything else means keeping every finished Person.
+WaitHistogram records the wait time of everyone who reaches their target
+floor as a count per wait time, keyed by start floor, target floor and the
+elevator they rode. Wait times are whole rounds, so bucket w of a histogram
+counts exactly the people who waited w rounds, and every statistic,
+including any percentile, is exact.
+
+Histograms take space proportional to the number of distinct keys and wait
+times, not to the number of people. Histograms of different runs can be
+merged, e.g. to combine the replications run by several worker processes.
+
+A Simulation records into the histogram given by the optional
+'wait_histogram' configuration key. If the optional key 'keep_finished' is
+False, it then stops keeping finished people in all_finished, and computes
+its statistics from the histogram.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (start floor, target floor, elevator index)
+Key = Tuple[int, int, int]
+
+
+class WaitHistogram:
+    """The wait times of the people who reached their target floors.
+
+    === Attributes ===
+    count: the number of people recorded.
+    total: the sum of their wait times.
+
+    === Representation invariants ===
+    count == the sum of every bucket of every key
+    total == the sum of every wait time times its bucket
+    """
+    count: int
+    total: int
+    _buckets: Dict[Key, List[int]]
+
+    def __init__(self) -> None:
+        """Initialize a new, empty histogram."""
+        self.count = 0
+        self.total = 0
+        # key -> the number of people of that key who waited w rounds, at
+        # index w
+        self._buckets = {}
+
+    def record(self, start: int, target: int, elevator: int,
+               wait_time: int) -> None:
+        """Record that someone rode elevator number <elevator> from <start>
+        to <target> after waiting <wait_time> rounds in total."""
+        buckets = self._buckets.setdefault((start, target, elevator), [])
+        if wait_time >= len(buckets):
+            buckets.extend([0] * (wait_time + 1 - len(buckets)))
+        buckets[wait_time] += 1
+        self.count += 1
+        self.total += wait_time
+
+    def merge(self, other: 'WaitHistogram') -> None:
+        """Add everyone recorded in <other> to this histogram."""
+        for key, other_buckets in other._buckets.items():
+            buckets = self._buckets.setdefault(key, [])
+            if len(other_buckets) > len(buckets):
+                buckets.extend([0] * (len(other_buckets) - len(buckets)))
+            for wait_time, num_people in enumerate(other_buckets):
+                buckets[wait_time] += num_people
+        self.count += other.count
+        self.total += other.total
+
+    def clear(self) -> None:
+        """Forget everyone recorded."""
+        self._buckets.clear()
+        self.count = 0
+        self.total = 0
+
+    def keys(self) -> List[Key]:
+        """Return the (start, target, elevator) keys with people recorded,
+        in sorted order."""
+        return sorted(self._buckets)
+
+    def counts(self, start: Optional[int] = None,
+               target: Optional[int] = None,
+               elevator: Optional[int] = None) -> List[int]:
+        """Return the number of people who waited w rounds, at index w, among
+        the people who started at <start>, went to <target> and rode
+        <elevator> (any, for the ones that are None)."""
+        res = []
+        for key in self._matching(start, target, elevator):
+            buckets = self._buckets[key]
+            if len(buckets) > len(res):
+                res.extend([0] * (len(buckets) - len(res)))
+            for wait_time, num_people in enumerate(buckets):
+                res[wait_time] += num_people
+        return res
+
+    def percentile(self, p: float, start: Optional[int] = None,
+                   target: Optional[int] = None,
+                   elevator: Optional[int] = None) -> int:
+        """Return the <p>th percentile (nearest rank) of the wait times of
+        the people selected as in counts, or -1 if there are none.
+
+        The 0th percentile is the minimum, and the 100th the maximum.
+
+        Precondition: 0 <= p <= 100
+        """
+        counts = self.counts(start, target, elevator)
+        rank = max(1, math.ceil(p / 100 * sum(counts)))
+        seen = 0
+        for wait_time, num_people in enumerate(counts):
+            seen += num_people
+            if seen >= rank:
+                return wait_time
+        return -1
+
+    def breakdown(self, by: str, p: float = 50
+                  ) -> Dict[Tuple[int, ...], Dict[str, float]]:
+        """Return the number of people, mean and <p>th percentile wait time
+        for each group of people, grouped by 'start', 'target', 'trip'
+        (start and target) or 'elevator'."""
+        fields = {'start': (0,), 'target': (1,), 'trip': (0, 1),
+                  'elevator': (2,)}[by]
+        groups = {}
+        for key in self._buckets:
+            groups.setdefault(tuple(key[i] for i in fields), []).append(key)
+        res = {}
+        for group, keys in sorted(groups.items()):
+            selected = WaitHistogram()
+            for key in keys:
+                selected._add(key, self._buckets[key])
+            res[group] = {
+                'count': selected.count,
+                'mean': selected.total / selected.count,
+                'percentile': selected.percentile(p)
+            }
+        return res
+
+    def stats(self) -> Dict[str, int]:
+        """Return the people_completed, max_time, min_time and avg_time
+        statistics of Simulation.run for the people recorded."""
+        if self.count == 0:
+            return {'people_completed': 0, 'max_time': -1, 'min_time': -1,
+                    'avg_time': -1}
+        return {
+            'people_completed': self.count,
+            'max_time': self.percentile(100),
+            'min_time': self.percentile(0),
+            'avg_time': int(self.total / self.count)
+        }
+
+    def _matching(self, start: Optional[int], target: Optional[int],
+                  elevator: Optional[int]) -> List[Key]:
+        """Return the keys that match the given fields."""
+        return [key for key in self._buckets
+                if (start is None or key[0] == start)
+                and (target is None or key[1] == target)
+                and (elevator is None or key[2] == elevator)]
+
+    def _add(self, key: Key, buckets: List[int]) -> None:
+        """Add the people in <buckets> under <key>."""
+        other = WaitHistogram()
+        other._buckets[key] = buckets
+        other.count = sum(buckets)
+        other.total = sum(w * n for w, n in enumerate(buckets))
+        self.merge(other)
+
+
+def merge_all(histograms: Iterable[WaitHistogram]) -> WaitHistogram:
+    """Return a new histogram of everyone recorded in <histograms>."""
+    res = WaitHistogram()
+    for histogram in histograms:
+        res.merge(histogram)
+    return res
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-nested-blocks': 4
+    })
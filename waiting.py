@@ -0,0 +1,322 @@
+"""CSC148 Assignment 1 - Waiting Queues
+
+=== Module Description ===
+A Simulation used to keep a list of waiting people for every floor, and
+scanned every floor several times per round. In very tall buildings, where
+people only arrive at a few floors, that is mostly scanning empty lists.
+
+WaitingQueues is a dictionary from floor number to the people waiting on
+that floor that only stores the floors where someone is waiting, and keeps
+count of everyone waiting as people are added and removed. Moving algorithms
+read it like the dictionary they always got:
+
+    - waiting[floor] is the list of people waiting on <floor>, or a new empty
+      list if nobody is waiting there,
+    - iterating over it only visits the floors where someone is waiting.
+
+The lists are WaitingQueues' own list type, which tells the queues whenever
+people are added to or removed from it. So people may also be added by
+appending to waiting[floor], even for an empty floor (whose list is stored
+once someone is added to it), and total is always exact. A floor whose list
+becomes empty is removed.
+
+=== Overload mode ===
+When more people arrive than the elevators can carry, the queues grow
+without bound. Three options keep them in check:
+
+    - backlog_threshold: only the first backlog_threshold people of a queue
+      are Person objects (the list waiting[floor]). The people behind them
+      are kept as counts by arrival round and target floor (the backlog),
+      and a new Person is made for each one when they move up to the front
+      part of the queue. People who arrived in the same round leave the
+      backlog in order of target floor.
+    - balk_at: people who arrive at a floor where balk_at people are already
+      waiting leave at once (they balk).
+    - patience: people who have waited patience rounds without boarding
+      leave the queue (they abandon it).
+
+balked and abandoned count the people who left. With patience or balk_at
+set, the backlog of each floor holds a bounded number of counts, so the
+memory used by the queues no longer grows with the length of a run.
+"""
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, \
+    Tuple
+
+from entities import Person
+
+
+class _Queue(list):
+    """The list of people waiting on one floor, which reports every change
+    in its length to the WaitingQueues it belongs to.
+
+    === Attributes ===
+    owner: the queues this list belongs to, or None once it was replaced.
+    floor: the floor of this list.
+    """
+    owner: Optional['WaitingQueues']
+    floor: int
+
+    def __init__(self, owner: 'WaitingQueues', floor: int,
+                 people: Iterable[Person] = ()) -> None:
+        """Initialize the list of <floor> in <owner> with <people>."""
+        list.__init__(self, people)
+        self.owner = owner
+        self.floor = floor
+
+
+def _tracked(name: str) -> Callable[..., Any]:
+    """Return the list method <name>, changed to report the change in length
+    to the list's owner."""
+    method = getattr(list, name)
+
+    def wrapper(self: _Queue, *args: Any) -> Any:
+        before = len(self)
+        res = method(self, *args)
+        if self.owner is not None and len(self) != before:
+            self.owner._resized(self, before)
+        return res
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ['append', 'extend', 'insert', 'pop', 'remove', 'clear',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__']:
+    setattr(_Queue, _name, _tracked(_name))
+
+
+class WaitingQueues(dict):
+    """The people waiting on each floor of a building.
+
+    === Attributes ===
+    total: the number of people waiting on all floors, including the
+           backlog.
+    round_num: the number of rounds the queues have been advanced.
+    backlog_threshold: the number of people on a floor kept as Person
+                       objects, or None to keep everyone.
+    balk_at: the queue length at which arrivals balk, or None.
+    patience: the number of rounds after which waiting people abandon the
+              queue, or None.
+    balked: the number of people who balked.
+    abandoned: the number of people who abandoned a queue.
+
+    === Representation invariants ===
+    Every stored list is non-empty, and owned by these queues.
+    A floor only has a backlog if its list has backlog_threshold people.
+    total is the sum of the lengths of the stored lists and backlogs.
+    """
+    total: int
+    round_num: int
+    backlog_threshold: Optional[int]
+    balk_at: Optional[int]
+    patience: Optional[int]
+    balked: int
+    abandoned: int
+    _backlog: Dict[int, Deque[Tuple[int, Dict[int, int]]]]
+    _backlog_size: Dict[int, int]
+
+    def __init__(self, backlog_threshold: Optional[int] = None,
+                 balk_at: Optional[int] = None,
+                 patience: Optional[int] = None) -> None:
+        """Initialize a building with nobody waiting.
+
+        Precondition: each option is None or at least 1.
+        """
+        dict.__init__(self)
+        self.total = 0
+        self.round_num = 0
+        self.backlog_threshold = backlog_threshold
+        self.balk_at = balk_at
+        self.patience = patience
+        self.balked = 0
+        self.abandoned = 0
+        # floor -> (arrival round, target floor -> number of people), in
+        # order of arrival
+        self._backlog = {}
+        self._backlog_size = {}
+
+    def __missing__(self, floor: int) -> List[Person]:
+        """Return a new empty list for a floor where nobody is waiting, which
+        is stored once someone is added to it."""
+        return _Queue(self, floor)
+
+    def __setitem__(self, floor: int, people: List[Person]) -> None:
+        """Make <people> the people waiting on <floor> in front of its
+        backlog."""
+        old = dict.get(self, floor)
+        if people is old:
+            return
+        if old is not None:
+            self._release(old)
+        queue = _Queue(self, floor, people)
+        if len(queue) != 0:
+            dict.__setitem__(self, floor, queue)
+            self.total += len(queue)
+        self._refill(floor)
+
+    def __delitem__(self, floor: int) -> None:
+        """Remove everyone waiting on <floor>."""
+        self.pop(floor)
+
+    def size(self, floor: int) -> int:
+        """Return the number of people waiting on <floor>, including the
+        backlog."""
+        return len(self.get(floor, ())) + self._backlog_size.get(floor, 0)
+
+    def add(self, floor: int, people: Iterable[Person]) -> None:
+        """Add <people> to the end of the queue on <floor>, except for the
+        people who balk."""
+        queue = self[floor]
+        for person in people:
+            if self.balk_at is not None and self.size(floor) >= self.balk_at:
+                self.balked += 1
+            elif self.backlog_threshold is None \
+                    or len(queue) < self.backlog_threshold:
+                queue.append(person)
+            else:
+                self._push_backlog(floor, person.target)
+                self.total += 1
+
+    def take(self, floor: int, count: int) -> List[Person]:
+        """Remove and return the first <count> people waiting on <floor>, or
+        everyone waiting there if there are fewer."""
+        res = []
+        while len(res) < count and floor in self:
+            queue = dict.__getitem__(self, floor)
+            boarding = queue[:count - len(res)]
+            res.extend(boarding)
+            del queue[:len(boarding)]
+        return res
+
+    def pop(self, floor: int, *default: List[Person]) -> List[Person]:
+        """Remove everyone waiting on <floor>, and return the people in
+        front of its backlog."""
+        if floor not in self:
+            return dict.pop(self, floor, *default)
+        res = dict.__getitem__(self, floor)
+        self._release(res)
+        self.total -= self._backlog_size.pop(floor, 0)
+        self._backlog.pop(floor, None)
+        return res
+
+    def clear(self) -> None:
+        """Remove everyone waiting on every floor, and reset the round and
+        the number of people who left."""
+        for queue in dict.values(self):
+            queue.owner = None
+        dict.clear(self)
+        self._backlog.clear()
+        self._backlog_size.clear()
+        self.total = 0
+        self.round_num = 0
+        self.balked = 0
+        self.abandoned = 0
+
+    def advance(self) -> None:
+        """Start the next round, after the wait time of everyone in the
+        lists was increased, and let the people who ran out of patience
+        abandon their queues."""
+        self.round_num += 1
+        if self.patience is None:
+            return
+        for floor in list(self):
+            queue = dict.__getitem__(self, floor)
+            leaving = 0
+            while leaving < len(queue) \
+                    and queue[leaving].wait_time >= self.patience:
+                leaving += 1
+            if leaving == len(queue):
+                # Everyone behind them arrived later.
+                self._abandon_backlog(floor)
+            if leaving > 0:
+                self.abandoned += leaving
+                del queue[:leaving]
+
+    def _resized(self, queue: _Queue, before: int) -> None:
+        """Record that the length of <queue> changed from <before>."""
+        floor = queue.floor
+        stored = dict.get(self, floor)
+        if len(queue) > before and stored is not queue and stored is not None:
+            # An empty list handed out earlier, while another list was
+            # stored: move its new people to the stored list.
+            people = queue[before:]
+            queue.owner = None
+            del queue[before:]
+            stored.extend(people)
+            return
+        self.total += len(queue) - before
+        if stored is None and len(queue) > 0:
+            dict.__setitem__(self, floor, queue)
+        elif stored is queue and len(queue) == 0:
+            dict.__delitem__(self, floor)
+        if len(queue) < before:
+            self._refill(floor)
+
+    def _release(self, queue: _Queue) -> None:
+        """Remove the stored <queue>, which no longer belongs to these
+        queues."""
+        dict.__delitem__(self, queue.floor)
+        queue.owner = None
+        self.total -= len(queue)
+
+    def _push_backlog(self, floor: int, target: int) -> None:
+        """Add someone going to <target> who arrived this round to the
+        backlog of <floor>."""
+        backlog = self._backlog.setdefault(floor, deque())
+        if len(backlog) == 0 or backlog[-1][0] != self.round_num:
+            backlog.append((self.round_num, {}))
+        targets = backlog[-1][1]
+        targets[target] = targets.get(target, 0) + 1
+        self._backlog_size[floor] = self._backlog_size.get(floor, 0) + 1
+
+    def _refill(self, floor: int) -> None:
+        """Move people from the backlog of <floor> to its list until the list
+        is full or the backlog is empty."""
+        backlog = self._backlog.get(floor)
+        if backlog is None:
+            return
+        queue = self[floor]
+        people = []
+        while len(queue) + len(people) < self.backlog_threshold \
+                and len(backlog) > 0:
+            arrived, targets = backlog[0]
+            target = min(targets)
+            person = Person(floor, target)
+            person.wait_time = self.round_num - arrived
+            people.append(person)
+            targets[target] -= 1
+            if targets[target] == 0:
+                del targets[target]
+                if len(targets) == 0:
+                    backlog.popleft()
+        self._backlog_size[floor] -= len(people)
+        self.total -= len(people)
+        if len(backlog) == 0:
+            del self._backlog[floor]
+            del self._backlog_size[floor]
+        queue.extend(people)
+
+    def _abandon_backlog(self, floor: int) -> None:
+        """Remove the people in the backlog of <floor> who ran out of
+        patience."""
+        backlog = self._backlog.get(floor)
+        if backlog is None:
+            return
+        while len(backlog) > 0 \
+                and self.round_num - backlog[0][0] >= self.patience:
+            leaving = sum(backlog.popleft()[1].values())
+            self.abandoned += leaving
+            self.total -= leaving
+            self._backlog_size[floor] -= leaving
+        if len(backlog) == 0:
+            del self._backlog[floor]
+            del self._backlog_size[floor]
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['entities', 'collections'],
+        'max-nested-blocks': 4
+    })
@@ -0,0 +1,253 @@
+"""CSC148 Assignment 1 - Zones
+
+=== Module Description ===
+In tall buildings, elevators are split into banks that each serve a zone: a
+set of floors, such as the lobby and the low-rise floors. This module
+contains:
+
+    - ZoneTable, which holds the floors each elevator serves, and tables,
+      computed once, of the elevators that serve each floor and of the floor
+      each zone takes someone to on their way to any target floor.
+    - ZonedAlgorithm, the base of the moving algorithms that know about
+      zones. A Simulation with zones only accepts these algorithms.
+    - ZonedPushyPassenger and ZonedShortSighted, the PushyPassenger and
+      ShortSighted algorithms for zoned elevators. An empty elevator only
+      heads for floors where someone is waiting who would board it, so it
+      never waits for people it cannot take.
+
+People only board an elevator that serves both their floor and their target
+floor. If no elevator serving their floor serves their target floor, they
+board one that takes them to a transfer floor: a floor its zone shares with
+a zone that serves their target floor, as close as possible to it. There they
+wait again for an elevator that serves their target floor, so nobody makes
+more than one transfer. Their wait time keeps growing while they transfer.
+
+A Simulation uses zones when its configuration has the optional 'zones' key:
+a ZoneTable, or a list with the floors served by each elevator.
+"""
+from typing import Collection, Dict, FrozenSet, List, Tuple
+
+from algorithms import Direction, MovingAlgorithm, _direction_to, \
+    _nearest_floor
+from entities import Elevator, Person
+
+
+class ZoneTable:
+    """The floors served by each elevator of a building.
+
+    === Attributes ===
+    num_floors: the number of floors.
+    served: the floors served by each elevator.
+    zones: the distinct sets of served floors, sorted.
+    zone_of: the index in zones of the floors served by each elevator.
+    candidates: the elevators that serve each floor, at the index of the
+                floor (index 0 is unused).
+
+    === Representation invariants ===
+    Every floor is served by at least one elevator.
+    Every two zones share at least one floor.
+    """
+    num_floors: int
+    served: List[FrozenSet[int]]
+    zones: List[Tuple[int, ...]]
+    zone_of: List[int]
+    candidates: List[Tuple[int, ...]]
+    _destinations: List[List[int]]
+    _boarders: Dict[Tuple[int, int], FrozenSet[int]]
+    _zone_floors: List[FrozenSet[int]]
+    _first_elevator: List[int]
+
+    def __init__(self, served: List[Collection[int]],
+                 num_floors: int) -> None:
+        """Initialize the tables of a building with <num_floors> floors,
+        where elevator i serves the floors served[i].
+
+        Raise ValueError if a floor is not served by any elevator, or two
+        zones share no floor (so that some trips would need more than one
+        transfer).
+        """
+        self.num_floors = num_floors
+        self.served = [frozenset(floors) for floors in served]
+        zone_index = {}
+        self.zones = []
+        self.zone_of = []
+        for floors in self.served:
+            if floors not in zone_index:
+                zone_index[floors] = len(self.zones)
+                self.zones.append(tuple(sorted(floors)))
+            self.zone_of.append(zone_index[floors])
+        zone_sets = list(zone_index)
+        self._zone_floors = zone_sets
+        self._first_elevator = [self.zone_of.index(z)
+                                for z in range(len(self.zones))]
+        self.candidates = [()]
+        zones_at = [[]]
+        for floor in range(1, num_floors + 1):
+            self.candidates.append(tuple(
+                e for e, floors in enumerate(self.served) if floor in floors))
+            zones_at.append([z for z, floors in enumerate(zone_sets)
+                             if floor in floors])
+            if len(self.candidates[floor]) == 0:
+                raise ValueError('floor {} is not served'.format(floor))
+        shared = [[sorted(mine & other) for other in zone_sets]
+                  for mine in zone_sets]
+        if any(len(floors) == 0 for row in shared for floors in row):
+            raise ValueError('every two zones must share a floor')
+        # zone -> target floor -> the floor the zone takes people going to
+        # the target floor to
+        self._destinations = []
+        for z in range(len(self.zones)):
+            row = [0]
+            for target in range(1, num_floors + 1):
+                transfers = [floor for w in zones_at[target]
+                             for floor in shared[z][w]]
+                row.append(min(transfers,
+                               key=lambda f, t=target: (abs(f - t), f)))
+            self._destinations.append(row)
+        # (floor, target floor) -> the elevators people on the floor going
+        # to the target floor board, filled in as they are needed
+        self._boarders = {}
+
+    def destination(self, elevator: int, target: int) -> int:
+        """Return the floor elevator number <elevator> takes someone going to
+        <target>: <target> itself, or a transfer floor."""
+        return self._destinations[self.zone_of[elevator]][target]
+
+    def boarders(self, floor: int, target: int) -> FrozenSet[int]:
+        """Return the elevators that people waiting on <floor> to go to
+        <target> board."""
+        key = (floor, target)
+        if key not in self._boarders:
+            direct = frozenset(e for e in self.candidates[floor]
+                               if target in self.served[e])
+            if len(direct) == 0:
+                direct = frozenset(e for e in self.candidates[floor]
+                                   if self.destination(e, target) != floor)
+            self._boarders[key] = direct
+        return self._boarders[key]
+
+    def can_board(self, elevator: int, person: Person, floor: int) -> bool:
+        """Return whether <person>, waiting on <floor>, boards elevator
+        number <elevator>."""
+        return elevator in self.boarders(floor, person.target)
+
+    def pickup_floors(self, num_elevators: int,
+                      waiting: Dict[int, List[Person]]) -> List[List[int]]:
+        """Return, for each elevator, the sorted floors where someone is
+        waiting who would board it.
+
+        Elevators of the same zone board the same people, so the floors are
+        found once per zone, and shared by its elevators. Each zone only
+        looks at its own floors, or at the floors where someone is waiting if
+        there are fewer of those, and the targets of the people on a floor
+        are collected once however many zones serve it.
+        """
+        targets = {}
+        found = []
+        for z, floors in enumerate(self.zones):
+            elevator = self._first_elevator[z]
+            if len(waiting) < len(floors):
+                zone_floors = self._zone_floors[z]
+                candidates = sorted(floor for floor in waiting
+                                    if floor in zone_floors)
+            else:
+                candidates = [floor for floor in floors if floor in waiting]
+            pickups = []
+            for floor in candidates:
+                if floor not in targets:
+                    targets[floor] = {p.target for p in waiting[floor]}
+                if any(elevator in self.boarders(floor, target)
+                       for target in targets[floor]):
+                    pickups.append(floor)
+            found.append(pickups)
+        return [found[self.zone_of[e]] for e in range(num_elevators)]
+
+
+class ZonedAlgorithm(MovingAlgorithm):
+    """A moving algorithm for elevators that serve zones.
+
+    === Attributes ===
+    table: the zones of the building.
+    """
+    table: ZoneTable
+
+    def __init__(self, table: ZoneTable) -> None:
+        """Initialize a new algorithm for the zones in <table>."""
+        self.table = table
+
+    def move_elevators(self,
+                       elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]],
+                       max_floor: int) -> List[Direction]:
+        """Return a list of directions for each elevator to move to."""
+        targets = self.target_floors(elevators, waiting, max_floor)
+        return [_direction_to(elevator.location, target)
+                for elevator, target in zip(elevators, targets)]
+
+
+class ZonedPushyPassenger(ZonedAlgorithm):
+    """PushyPassenger for zoned elevators.
+
+    If the elevator is empty, it moves towards the lowest floor where someone
+    is waiting who would board it, or stays still if there is none.
+
+    If the elevator isn't empty, it moves towards the floor it takes its
+    first passenger to.
+    """
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the floor each elevator takes its first passenger to, or
+        the lowest floor it can pick someone up from for empty elevators."""
+        pickups = self.table.pickup_floors(len(elevators), waiting)
+        res = []
+        for index, elevator in enumerate(elevators):
+            if len(elevator.passengers) != 0:
+                res.append(self.table.destination(
+                    index, elevator.passengers[0].target))
+            elif len(pickups[index]) != 0:
+                res.append(pickups[index][0])
+            else:
+                res.append(elevator.location)
+        return res
+
+
+class ZonedShortSighted(ZonedAlgorithm):
+    """ShortSighted for zoned elevators.
+
+    If the elevator is empty, it moves towards the closest floor where
+    someone is waiting who would board it, or stays still if there is none.
+
+    If the elevator isn't empty, it moves towards the closest floor it takes
+    one of its passengers to.
+    """
+
+    def target_floors(self,
+                      elevators: List[Elevator],
+                      waiting: Dict[int, List[Person]],
+                      max_floor: int) -> List[int]:
+        """Return the closest floor each elevator takes a passenger to, or
+        the closest floor it can pick someone up from for empty elevators."""
+        pickups = self.table.pickup_floors(len(elevators), waiting)
+        res = []
+        for index, elevator in enumerate(elevators):
+            location = elevator.location
+            if len(elevator.passengers) != 0:
+                stops = {self.table.destination(index, p.target)
+                         for p in elevator.passengers}
+                res.append(min(stops, key=lambda f: (abs(f - location), f)))
+            elif len(pickups[index]) != 0:
+                res.append(_nearest_floor(location, pickups[index]))
+            else:
+                res.append(location)
+        return res
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['algorithms', 'entities'],
+        'max-nested-blocks': 4
+    })